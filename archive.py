@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Persistent download archive shared with yt-dlp's --download-archive format
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from url_router import route_url
+
+
+# Route kinds that resolve to exactly one media item
+SINGLE_ITEM_KINDS = {
+    'youtube': ('video', 'short'),
+    'instagram': ('post', 'reel', 'tv'),
+}
+
+
+def media_key_from_url(url):
+    """Return the (extractor, media id) a URL resolves to, if known without extraction"""
+    route = route_url(url)
+    if route.kind in SINGLE_ITEM_KINDS.get(route.platform, ()):
+        return (route.platform, route.id)
+    return None
+
+
+class DownloadArchive:
+    """Append-only log of downloaded media with an in-memory hash set
+
+    Each line is "<extractor> <media id>", the same format yt-dlp uses for
+    --download-archive, so the file can be handed straight to yt-dlp and
+    entries it records are picked up here as well.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        self._keys = set()
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._refresh()
+
+    @staticmethod
+    def make_key(extractor, media_id):
+        """Build an archive line key the way yt-dlp does"""
+        return f"{extractor.lower()} {media_id}"
+
+    def _refresh(self):
+        """Load lines appended since the last read (including by yt-dlp)"""
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Only consume complete lines; a partial write is picked up next time
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return
+        for line in data[:end].decode('utf-8', 'replace').splitlines():
+            line = line.strip()
+            if line:
+                self._keys.add(line)
+        self._offset += end
+
+    def has(self, extractor, media_id):
+        """Check whether a media item was already downloaded"""
+        key = self.make_key(extractor, media_id)
+        with self._lock:
+            if key in self._keys:
+                return True
+            self._refresh()
+            return key in self._keys
+
+    def add(self, extractor, media_id):
+        """Record a media item as downloaded"""
+        key = self.make_key(extractor, media_id)
+        with self._lock:
+            self._refresh()
+            if key in self._keys:
+                return
+            # A single O_APPEND write keeps lines intact alongside yt-dlp's own appends
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, f"{key}\n".encode('utf-8'))
+            finally:
+                os.close(fd)
+            self._keys.add(key)
+
+    def __contains__(self, item):
+        return self.has(*item)
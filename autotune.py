@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Per-host auto-tuning of yt-dlp's concurrent fragment downloads
+"""
+
+import json
+import os
+import threading
+import time
+
+from tools import CACHE_DIR
+
+
+TUNING_PATH = CACHE_DIR / "fragment-tuning.json"
+
+# Concurrency levels the tuner moves between
+LEVELS = (1, 2, 4, 8, 16)
+DEFAULT_LEVEL = 4
+
+# Fragments measured before a sample is recorded
+SAMPLE_FRAGMENTS = 8
+
+# Weight of a new sample in the per-level moving average
+SMOOTHING = 0.3
+
+
+class FragmentTuner:
+    """Choose a fragment concurrency level per host from measured throughput
+
+    Throughput for each (host, level) pair is kept as a moving average and
+    persisted across runs. New hosts start at DEFAULT_LEVEL; after that the
+    tuner climbs towards whichever neighbouring level is faster until both
+    neighbours have been measured slower than the current best.
+    """
+
+    def __init__(self, path=TUNING_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r') as f:
+                self._stats = json.load(f)
+        except (OSError, ValueError):
+            self._stats = {}
+
+    def choose(self, host):
+        """Return the concurrency level to use for the next download from host"""
+        with self._lock:
+            stats = {int(level): value for level, value in self._stats.get(host, {}).items()}
+        if not stats:
+            return DEFAULT_LEVEL
+
+        best = max(stats, key=lambda level: stats[level]['throughput'])
+        index = LEVELS.index(best) if best in LEVELS else LEVELS.index(DEFAULT_LEVEL)
+        # Explore an unmeasured neighbour of the best level, higher first
+        for neighbour in (index + 1, index - 1):
+            if 0 <= neighbour < len(LEVELS) and LEVELS[neighbour] not in stats:
+                return LEVELS[neighbour]
+        return best
+
+    def record(self, host, level, throughput):
+        """Add a throughput sample (bytes/s) for a host and level"""
+        with self._lock:
+            host_stats = self._stats.setdefault(host, {})
+            entry = host_stats.get(str(level))
+            if entry is None:
+                host_stats[str(level)] = {'throughput': throughput, 'samples': 1}
+            else:
+                entry['throughput'] += SMOOTHING * (throughput - entry['throughput'])
+                entry['samples'] += 1
+            self._save()
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(self._stats, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def probe(self, host, level):
+        """Status callback that measures the first fragments of a download"""
+        return ThroughputProbe(self, host, level)
+
+
+class ThroughputProbe:
+    """Measure bytes/s over the first SAMPLE_FRAGMENTS fragments of a download"""
+
+    def __init__(self, tuner, host, level):
+        self.tuner = tuner
+        self.host = host
+        self.level = level
+        self._start = None
+        self._done = False
+
+    def __call__(self, status, postprocess=False):
+        if self._done or postprocess or status.get('status') != 'downloading':
+            return
+        # Only fragmented (HLS/DASH) downloads are affected by the concurrency level
+        fragment_count = status.get('fragment_count')
+        downloaded = status.get('downloaded_bytes')
+        if not fragment_count or downloaded is None:
+            return
+
+        now = time.monotonic()
+        if self._start is None:
+            self._start = (now, downloaded)
+            return
+
+        fragment_index = status.get('fragment_index') or 0
+        if fragment_index >= min(SAMPLE_FRAGMENTS, fragment_count):
+            elapsed = now - self._start[0]
+            if elapsed > 0:
+                self.tuner.record(self.host, self.level, (downloaded - self._start[1]) / elapsed)
+            self._done = True
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Batch mode: run many URLs through a bounded pool of concurrent downloads
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from postprocess import StageMetrics
+from scheduler import DEFAULT_PRIORITY, ScheduledQueue, cap_rate_limit, priority_weight, upcoming_weight
+from units import format_bytes
+from url_router import route_url
+
+
+# Default number of parallel jobs per platform. Instagram throttles
+# aggressively, so it gets fewer slots than YouTube or generic sites.
+DEFAULT_PLATFORM_LIMITS = {
+    'youtube': 4,
+    'instagram': 2,
+    'generic': 4,
+}
+
+
+def parse_batch_line(line):
+    """(url, priority) for a batch file line: a URL, optionally followed by an integer priority"""
+    fields = line.split()
+    if len(fields) == 1:
+        return fields[0], DEFAULT_PRIORITY
+    if len(fields) == 2 and fields[1].lstrip('+-').isdigit():
+        return fields[0], int(fields[1])
+    raise ValueError(f"Invalid batch line '{line}', expected URL [PRIORITY]")
+
+
+def read_jobs(source):
+    """Read (url, priority) pairs from a file path, or from stdin when source is '-'"""
+    if source == '-':
+        lines = sys.stdin
+    else:
+        lines = open(source, 'r')
+    try:
+        jobs = []
+        for line in lines:
+            line = line.strip()
+            # Skip blank lines and comments
+            if not line or line.startswith('#'):
+                continue
+            jobs.append(parse_batch_line(line))
+        return jobs
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+def read_urls(source):
+    """Read URLs from a file path, or from stdin when source is '-'"""
+    return [url for url, _ in read_jobs(source)]
+
+
+def parse_platform_limits(values):
+    """Parse PLATFORM=N overrides into a limits dict"""
+    limits = dict(DEFAULT_PLATFORM_LIMITS)
+    for value in values or []:
+        platform, sep, count = value.partition('=')
+        if not sep or not count.isdigit() or int(count) < 1:
+            raise ValueError(f"Invalid platform limit '{value}', expected PLATFORM=N")
+        limits[platform.strip()] = int(count)
+    return limits
+
+
+def total_size(paths):
+    """Combined size of the files that still exist"""
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            # Converted and removed by the post-processing stage in the meantime
+            pass
+    return total
+
+
+class BatchResult:
+    """Outcome of a single URL in a batch run"""
+
+    def __init__(self, index, url, platform, priority=DEFAULT_PRIORITY):
+        self.index = index
+        self.url = url
+        self.platform = platform
+        self.priority = priority
+        # --limit-rate given to the download by the bandwidth budget, in bytes/s
+        self.rate_limit = None
+        self.status = 'pending'
+        self.error = None
+        self.elapsed = 0.0
+        self.files = []
+        self.bytes_written = 0
+
+
+class BatchRunner:
+    """Run URLs through a bounded worker pool with per-platform limits
+
+    Queued URLs start by priority (higher first), then, with a size
+    estimator, smallest expected download first, then in input order. With a
+    bandwidth budget each download is capped to its share of it.
+    """
+
+    def __init__(self, downloader, max_workers=4, platform_limits=None, budget=None, estimator=None):
+        self.downloader = downloader
+        self.max_workers = max_workers
+        self.platform_limits = platform_limits or dict(DEFAULT_PLATFORM_LIMITS)
+        self.budget = budget
+        self.estimator = estimator
+        self.metrics = StageMetrics('download', max_workers)
+
+    def _limit_for(self, platform):
+        return self.platform_limits.get(platform, self.max_workers)
+
+    @staticmethod
+    def _is_probed(result):
+        """Single videos are worth probing for their size; playlists and profiles are not"""
+        route = route_url(result.url)
+        return route.platform == 'youtube' and route.kind in ('video', 'short')
+
+    @staticmethod
+    def _is_capped(result):
+        """Whether the download runs through yt-dlp, which takes a --limit-rate"""
+        route = route_url(result.url)
+        return not (route.platform == 'instagram' and route.kind == 'profile')
+
+    def run(self, urls, platform=None, extra_args=None, priorities=None, **download_kwargs):
+        """Download all URLs and return a list of BatchResult in input order
+
+        priorities, if given, holds one priority per URL.
+        """
+        # Plain FIFO queues unless priorities or sizes can change the order
+        scheduled = bool(self.estimator or any(p != DEFAULT_PRIORITY for p in priorities or []))
+        results = []
+        queues = {}
+        # Queued jobs by URL, to re-key them as the estimator learns sizes
+        waiting = {}
+        # Queued jobs by priority, for the bandwidth share of the ones about to start
+        queued = Counter()
+        for index, url in enumerate(urls):
+            url_platform = platform or self.downloader.detect_platform(url)
+            priority = priorities[index] if priorities else DEFAULT_PRIORITY
+            result = BatchResult(index, url, url_platform, priority)
+            results.append(result)
+            queued[priority] += 1
+            if scheduled:
+                queues.setdefault(url_platform, ScheduledQueue(self.estimator)).push(result)
+            else:
+                queues.setdefault(url_platform, deque()).append(result)
+            self.metrics.queued()
+            if self.estimator and self._is_probed(result):
+                waiting.setdefault(url, []).append(result)
+                self.estimator.submit(url)
+
+        active = {name: 0 for name in queues}
+        state = {'running': 0}
+        cond = threading.Condition()
+
+        def finished(_future, job):
+            with cond:
+                active[job.platform] -= 1
+                state['running'] -= 1
+                if job.rate_limit:
+                    self.budget.release(job.rate_limit, priority_weight(job.priority))
+                cond.notify()
+
+        def next_job():
+            # Pick the first queued URL in schedule order whose platform still
+            # has a free slot, so a backlog on one platform never blocks the others
+            open_queues = [
+                name for name, queue in queues.items()
+                if queue and active[name] < self._limit_for(name)
+            ]
+            if not open_queues:
+                return None
+            if not scheduled:
+                name = min(open_queues, key=lambda name: queues[name][0].index)
+                return queues[name].popleft()
+            if self.estimator:
+                for url, size in self.estimator.take_learned():
+                    for job in waiting.get(url, ()):
+                        queues[job.platform].learn(job, size)
+            name = min(open_queues, key=lambda name: queues[name].peek())
+            job = queues[name].pop()
+            if job.url in waiting:
+                waiting[job.url].remove(job)
+            return job
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                with cond:
+                    while any(queues.values()):
+                        job = next_job() if state['running'] < self.max_workers else None
+                        if job is None:
+                            cond.wait()
+                            continue
+                        queued[job.priority] -= 1
+                        if self.estimator:
+                            self.estimator.discard(job.url)
+                        if self.budget and self._is_capped(job):
+                            # Queued jobs that will fill the free slots share the link with this one
+                            upcoming = upcoming_weight(queued, self.max_workers - state['running'] - 1)
+                            job.rate_limit = self.budget.allocate(priority_weight(job.priority), upcoming)
+                        active[job.platform] += 1
+                        state['running'] += 1
+                        future = pool.submit(self.run_one, job, extra_args, download_kwargs)
+                        future.add_done_callback(lambda f, job=job: finished(f, job))
+        finally:
+            if self.estimator:
+                self.estimator.close()
+
+        self._collect_postprocessing(results)
+        return results
+
+    def _collect_postprocessing(self, results):
+        """Wait for audio extraction handed off by the downloads and attribute its files"""
+        pool = getattr(self.downloader, 'postprocess_pool', None)
+        if not pool:
+            return
+        for result in results:
+            files = []
+            for path in result.files:
+                future = pool.take(path)
+                if future is None:
+                    files.append(path)
+                    continue
+                try:
+                    files.extend(future.result())
+                except Exception as e:
+                    result.status = 'failed'
+                    result.error = f"post-processing failed: {e}"
+            result.files = files
+            result.bytes_written = total_size(result.files)
+
+    def run_one(self, result, extra_args, download_kwargs):
+        """Download a single URL, recording status, timing and output files"""
+        fd, files_log = tempfile.mkstemp(prefix='media-downloader-', suffix='.files')
+        os.close(fd)
+        # Ask yt-dlp to log every final file path so bytes can be attributed per URL
+        args = list(extra_args or [])
+        args.extend(["--print-to-file", "after_move:filepath", files_log])
+        if result.rate_limit:
+            # A lower --limit-rate of the user's own stays in force
+            args = cap_rate_limit(args, result.rate_limit)
+
+        result.status = 'running'
+        self.metrics.started()
+        start = time.monotonic()
+        try:
+            self.downloader.download(result.url, platform=result.platform, extra_args=args, **download_kwargs)
+            result.status = 'ok'
+        except SystemExit:
+            # Downloaders exit on failure; contain it to this URL
+            result.status = 'failed'
+            result.error = 'download failed'
+        except Exception as e:
+            result.status = 'failed'
+            result.error = str(e)
+        finally:
+            result.elapsed = time.monotonic() - start
+            self.metrics.finished()
+            try:
+                with open(files_log, 'r') as f:
+                    result.files = [line.strip() for line in f if line.strip()]
+            finally:
+                os.unlink(files_log)
+            result.bytes_written = total_size(result.files)
+        return result
+
+
+def print_summary(results, wall_time, rates=None, stages=None):
+    """Print a per-URL status table, overall totals, the per-host request rates and stage load"""
+    print("\nBatch summary")
+    print("=" * 50)
+    print(f"{'STATUS':<8} {'TIME':>8} {'BYTES':>10}  URL")
+    for result in results:
+        line = f"{result.status:<8} {result.elapsed:>7.1f}s {format_bytes(result.bytes_written):>10}  {result.url}"
+        if result.error:
+            line += f"  ({result.error})"
+        print(line)
+
+    succeeded = sum(1 for r in results if r.status == 'ok')
+    failed = len(results) - succeeded
+    total_bytes = sum(r.bytes_written for r in results)
+    print("-" * 50)
+    print(f"{succeeded} succeeded, {failed} failed in {wall_time:.1f}s wall time, "
+          f"{format_bytes(total_bytes)} written")
+
+    if rates:
+        print(f"\n{'HOST':<28} {'RATE':>8} {'OK':>5} {'THROTTLED':>10}")
+        for host, stats in rates.items():
+            print(f"{host:<28} {stats['rate']:>6.2f}/s {stats['successes']:>5} {stats['throttles']:>10}")
+
+    if stages:
+        print(f"\n{'STAGE':<12} {'WORKERS':>7} {'JOBS':>5} {'MAX QUEUE':>9} {'AVG QUEUE':>9} {'BUSY':>6}")
+        for stage in stages:
+            stats = stage.report()
+            print(f"{stage.name:<12} {stats['workers']:>7} {stats['jobs']:>5} {stats['max_depth']:>9} "
+                  f"{stats['avg_depth']:>9.1f} {stats['utilization']:>6.0%}")
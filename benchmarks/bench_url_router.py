@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: URL classification with the router vs the old regex lists
+
+The legacy functions below are the per-downloader checks the router
+replaced (is_youtube_url, is_instagram_url, is_profile_url,
+extract_username), chained the way UniversalDownloader and
+InstagramDownloader used them.
+
+Usage:
+  python benchmarks/bench_url_router.py [-n URLS] [-r REPEAT]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from url_router import route_url
+
+
+def legacy_is_youtube_url(url):
+    patterns = [
+        r'(https?://)?(www\.)?(youtube\.com|youtu\.be)',
+        r'(https?://)?(www\.)?youtube\.com/watch\?v=',
+        r'(https?://)?(www\.)?youtu\.be/'
+    ]
+    return any(re.match(pattern, url) for pattern in patterns)
+
+
+def legacy_is_instagram_url(url):
+    patterns = [
+        r'(https?://)?(www\.)?instagram\.com/p/',
+        r'(https?://)?(www\.)?instagram\.com/reel/',
+        r'(https?://)?(www\.)?instagram\.com/tv/',
+        r'(https?://)?(www\.)?instagram\.com/stories/',
+        r'(https?://)?(www\.)?instagram\.com/[^/]+/?$'
+    ]
+    return any(re.match(pattern, url) for pattern in patterns)
+
+
+def legacy_is_profile_url(url):
+    match = re.match(r'^(https?://)?(www\.)?instagram\.com/([^/]+)/?$', url)
+    if match:
+        special_pages = ['p', 'reel', 'tv', 'stories', 'explore', 'accounts', 'about', 'legal', 'privacy']
+        return match.group(3) not in special_pages
+    return False
+
+
+def legacy_extract_username(url):
+    match = re.match(r'^(https?://)?(www\.)?instagram\.com/([^/]+)/?$', url)
+    return match.group(3) if match else None
+
+
+def legacy_classify(url):
+    """detect_platform followed by InstagramDownloader's profile checks"""
+    if legacy_is_youtube_url(url):
+        return 'youtube', None
+    if legacy_is_instagram_url(url):
+        if legacy_is_profile_url(url):
+            return 'instagram', legacy_extract_username(url)
+        return 'instagram', None
+    return 'generic', None
+
+
+def router_classify(url):
+    route = route_url(url)
+    return route.platform, route.username if route.kind == 'profile' else None
+
+
+def make_corpus(count, seed=0):
+    """Crawl-log-like URL mix: mostly generic, some YouTube and Instagram"""
+    rng = random.Random(seed)
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-'
+
+    def token(n):
+        return ''.join(rng.choice(alphabet) for _ in range(n))
+
+    makers = [
+        (30, lambda: f"https://www.youtube.com/watch?v={token(11)}"),
+        (10, lambda: f"https://youtu.be/{token(11)}"),
+        (15, lambda: f"https://www.instagram.com/p/{token(11)}/"),
+        (5, lambda: f"https://www.instagram.com/reel/{token(11)}/"),
+        (10, lambda: f"https://www.instagram.com/{token(8).lower()}/"),
+        (30, lambda: f"https://cdn{rng.randint(1, 99)}.example.com/media/{token(16)}.mp4"),
+    ]
+    weights = [weight for weight, _ in makers]
+    return [rng.choices(makers, weights)[0][1]() for _ in range(count)]
+
+
+def time_classifier(classify, urls, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for url in urls:
+            classify(url)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare URL classification speed")
+    parser.add_argument("-n", "--urls", type=int, default=100000, help="URLs in the corpus (default: 100000)")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Timed passes, best is reported (default: 5)")
+    args = parser.parse_args()
+
+    urls = make_corpus(args.urls)
+
+    # Both must agree on platform and profile username for the whole corpus
+    mismatches = [url for url in urls if legacy_classify(url) != router_classify(url)]
+    if mismatches:
+        print(f"warning: {len(mismatches)} URLs classified differently, e.g. {mismatches[0]}")
+
+    legacy = time_classifier(legacy_classify, urls, args.repeat)
+    router = time_classifier(router_classify, urls, args.repeat)
+    for name, elapsed in (("legacy regex lists", legacy), ("url_router", router)):
+        print(f"{name:<20} {elapsed:.3f}s  {len(urls) / elapsed:>12,.0f} URLs/s")
+    print(f"speedup: {legacy / router:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
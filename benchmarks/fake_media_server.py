@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Local HTTP server serving synthetic media for benchmarks
+
+Routes (NAME may be anything, so every URL in a batch gets its own title):
+  /progressive/NAME.mp4          single progressive file, supports Range
+  /hls/NAME.m3u8                 HLS playlist with many fragments
+  /hls/NAME/segN.ts              HLS fragment
+  /audio/NAME.m4a                real AAC audio (only if ffmpeg is available)
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MediaLibrary:
+    """In-memory synthetic media payloads"""
+
+    def __init__(self, progressive_size=8 * 1024 * 1024, fragment_count=60, fragment_size=128 * 1024,
+                 audio_seconds=60):
+        self.progressive = os.urandom(progressive_size)
+        self.fragment = os.urandom(fragment_size)
+        self.fragment_count = fragment_count
+        self.audio = self._make_audio(audio_seconds)
+
+    @staticmethod
+    def _make_audio(seconds):
+        """Encode a sine tone with ffmpeg so audio extraction has real input"""
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg:
+            return None
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tone.m4a")
+            result = subprocess.run(
+                [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                 "-i", f"sine=frequency=440:duration={seconds}", "-c:a", "aac", path],
+                capture_output=True
+            )
+            if result.returncode != 0:
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+
+    def playlist(self, name):
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for i in range(self.fragment_count):
+            lines.extend(["#EXTINF:2.0,", f"{name}/seg{i}.ts"])
+        lines.append("#EXT-X-ENDLIST")
+        return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    """Serve payloads from the server's MediaLibrary"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type):
+        start, end = 0, len(body) - 1
+        range_header = self.headers.get('Range')
+        match = re.match(r'bytes=(\d*)-(\d*)', range_header or '')
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), end)
+            else:
+                start = max(0, len(body) - int(match.group(2)))
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body[start:end + 1])
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        library = self.server.library
+        path = self.path.split('?', 1)[0]
+        if re.match(r'^/progressive/[^/]+\.mp4$', path):
+            self._send(library.progressive, 'video/mp4')
+        elif re.match(r'^/hls/[^/]+\.m3u8$', path):
+            name = path[len('/hls/'):-len('.m3u8')]
+            self._send(library.playlist(name), 'application/vnd.apple.mpegurl')
+        elif re.match(r'^/hls/[^/]+/seg\d+\.ts$', path):
+            self._send(library.fragment, 'video/mp2t')
+        elif re.match(r'^/audio/[^/]+\.m4a$', path) and library.audio is not None:
+            self._send(library.audio, 'audio/mp4')
+        else:
+            self.send_error(404)
+
+
+class FakeMediaServer:
+    """Run the media server on a background thread"""
+
+    def __init__(self, library=None, host='127.0.0.1', port=0):
+        self.httpd = ThreadingHTTPServer((host, port), MediaRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.library = library or MediaLibrary()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def has_audio(self):
+        return self.httpd.library.audio is not None
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    with FakeMediaServer(port=8765) as server:
+        print(f"Serving synthetic media on {server.base_url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmark the download paths against a local fake media server
+
+Each mode runs media-downloader.py as a subprocess through the generic
+path and records wall time, startup overhead, CPU time, peak RSS and
+throughput. Startup overhead is measured by running the same command with
+every URL already in the download archive, so nothing is fetched.
+
+Usage:
+  python benchmarks/run_benchmarks.py                       # all modes
+  python benchmarks/run_benchmarks.py -m single batch -r 5  # selected modes
+  python benchmarks/run_benchmarks.py --compare old.json    # diff against a run
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_media_server import FakeMediaServer, MediaLibrary
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SCRIPT = REPO_DIR / "media-downloader.py"
+
+BATCH_SIZE = 8
+
+
+def build_modes(base_url, has_audio):
+    """Map mode name to (CLI arguments, URLs, required feature or None)"""
+    batch_urls = []
+    for i in range(BATCH_SIZE):
+        if i % 2:
+            batch_urls.append(f"{base_url}/hls/batch{i}.m3u8")
+        else:
+            batch_urls.append(f"{base_url}/progressive/batch{i}.mp4")
+
+    audio_skip = None if has_audio else "ffmpeg not found"
+    return {
+        'single': (["-v"], [f"{base_url}/progressive/single.mp4"], None),
+        'single-hls': (["-v"], [f"{base_url}/hls/single.m3u8"], None),
+        'single-hls-fragments': (["-v", "-N", "8"], [f"{base_url}/hls/single.m3u8"], None),
+        'batch': (["-v", "-j", "4"], batch_urls, None),
+        'batch-in-process': (["-v", "-j", "4", "--in-process"], batch_urls, None),
+        'audio': (["-f", "wav"], [f"{base_url}/audio/tone.m4a"], audio_skip),
+        'audio-stream': (["-f", "wav", "--stream-audio"], [f"{base_url}/audio/tone.m4a"], audio_skip),
+    }
+
+
+def run_cli(args, output_dir):
+    """Run media-downloader.py once and return its resource usage"""
+    cmd = [sys.executable, str(SCRIPT), "-o", str(output_dir), "--no-progress"] + args
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    # wait4 reports usage for this child and its own children (yt-dlp, ffmpeg)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    stderr = process.stderr.read().decode('utf-8', 'replace')
+    process.stderr.close()
+
+    bytes_written = sum(
+        entry.stat().st_size
+        for entry in os.scandir(output_dir)
+        if entry.is_file() and not entry.name.startswith('.')
+    )
+    # ru_maxrss is KiB on Linux but bytes on macOS
+    peak_rss_kb = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return {
+        'returncode': process.returncode,
+        'wall_s': wall,
+        'cpu_s': usage.ru_utime + usage.ru_stime,
+        'peak_rss_kb': peak_rss_kb,
+        'bytes': bytes_written,
+        'stderr_tail': stderr[-500:] if process.returncode else '',
+    }
+
+
+def mode_args(args, urls, workdir):
+    """Full CLI arguments for a mode; more than one URL goes through batch mode"""
+    if len(urls) == 1:
+        return args + [urls[0]]
+    batch_file = workdir / "urls.txt"
+    batch_file.write_text("\n".join(urls) + "\n")
+    return args + ["-b", str(batch_file)]
+
+
+def run_mode(args, urls, repeat):
+    """Measure one mode `repeat` times and summarize with medians"""
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+            workdir = Path(tmp)
+            full_args = mode_args(args, urls, workdir)
+
+            # Startup overhead: everything archived, so no download is started
+            archive = workdir / "archive.txt"
+            archive.write_text("".join(f"url {url}\n" for url in urls))
+            startup = run_cli(["--archive", str(archive)] + full_args, workdir / "startup")
+
+            output_dir = workdir / "out"
+            result = run_cli(full_args, output_dir)
+            result['startup_s'] = startup['wall_s']
+            runs.append(result)
+
+    ok_runs = [r for r in runs if r['returncode'] == 0]
+    if not ok_runs:
+        return {'status': 'failed', 'error': runs[-1]['stderr_tail'], 'runs': runs}
+
+    wall = statistics.median(r['wall_s'] for r in ok_runs)
+    bytes_written = statistics.median(r['bytes'] for r in ok_runs)
+    return {
+        'status': 'ok',
+        'wall_s': wall,
+        'startup_s': statistics.median(r['startup_s'] for r in ok_runs),
+        'cpu_s': statistics.median(r['cpu_s'] for r in ok_runs),
+        'peak_rss_kb': max(r['peak_rss_kb'] for r in ok_runs),
+        'bytes': bytes_written,
+        'bytes_per_s': bytes_written / wall if wall else 0,
+        'runs': runs,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"\n{'MODE':<22} {'WALL':>8} {'STARTUP':>8} {'CPU':>8} {'RSS MB':>8} {'MB/s':>8}  {'vs base':>8}")
+    for mode, result in results.items():
+        if result['status'] != 'ok':
+            print(f"{mode:<22} {result['status']}: {result.get('error', '').strip()[-120:]}")
+            continue
+        delta = ""
+        base = (baseline or {}).get(mode)
+        if base and base.get('status') == 'ok' and base['wall_s']:
+            delta = f"{(result['wall_s'] / base['wall_s'] - 1) * 100:+.1f}%"
+        print(f"{mode:<22} {result['wall_s']:>7.2f}s {result['startup_s']:>7.2f}s {result['cpu_s']:>7.2f}s "
+              f"{result['peak_rss_kb'] / 1024:>8.1f} {result['bytes_per_s'] / 1e6:>8.2f}  {delta:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark media-downloader against a local fake media server")
+    parser.add_argument("-m", "--modes", nargs="+", help="Modes to run (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per mode (default: 3)")
+    parser.add_argument("-o", "--output", default="benchmark-results.json", help="Results file (JSON)")
+    parser.add_argument("--compare", help="Previous results file to compare wall times against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+
+    with FakeMediaServer(MediaLibrary()) as server:
+        modes = build_modes(server.base_url, server.has_audio)
+        selected = args.modes or list(modes)
+        unknown = [m for m in selected if m not in modes]
+        if unknown:
+            parser.error(f"unknown modes: {', '.join(unknown)} (available: {', '.join(modes)})")
+
+        results = {}
+        for mode in selected:
+            mode_cli, urls, skip_reason = modes[mode]
+            if skip_reason:
+                results[mode] = {'status': 'skipped', 'error': skip_reason}
+                print(f"{mode}: skipped ({skip_reason})")
+                continue
+            print(f"{mode}: running {args.repeat}x ...")
+            results[mode] = run_mode(mode_cli, urls, max(1, args.repeat))
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print_results(results, baseline)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
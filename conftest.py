@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import importlib.util
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def fake_tool(tmp_path):
+    """Factory writing an executable Python script named name into tmp_path; returns its path"""
+    def make(name, source):
+        path = tmp_path / name
+        path.write_text(f"#!{sys.executable}\n{source}")
+        path.chmod(path.stat().st_mode | stat.S_IXUSR)
+        return str(path)
+    return make
+
+
+@pytest.fixture(scope="session")
+def media_downloader():
+    """The media-downloader.py script loaded as a module (its name is not importable)"""
+    path = Path(__file__).with_name("media-downloader.py")
+    spec = importlib.util.spec_from_file_location("media_downloader", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Cookie jars read in one streaming pass and indexed by (domain, name)
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+
+NETSCAPE_HEADER = "# Netscape HTTP Cookie File\n"
+
+# Netscape lines with this prefix are HttpOnly cookies, not comments
+HTTPONLY_PREFIX = "#HttpOnly_"
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def parse_expiry(text):
+    """Unix time from a DevTools "Expires" column (ISO 8601); 0 for session cookies"""
+    if not text or text == "Session":
+        return 0
+    try:
+        return int(datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return 0
+
+
+class Cookie:
+    """One cookie as stored in a Netscape cookie file"""
+
+    __slots__ = ('domain', 'include_subdomains', 'path', 'secure', 'expires', 'name', 'value')
+
+    def __init__(self, domain, name, value, path="/", secure=False, expires=0, include_subdomains=True):
+        self.domain = domain
+        self.name = name
+        self.value = value
+        self.path = path
+        self.secure = secure
+        self.expires = expires
+        self.include_subdomains = include_subdomains
+
+    def expired(self, now):
+        return 0 < self.expires < now
+
+    def netscape_line(self):
+        flag = "TRUE" if self.include_subdomains else "FALSE"
+        secure = "TRUE" if self.secure else "FALSE"
+        return f"{self.domain}\t{flag}\t{self.path}\t{secure}\t{self.expires}\t{self.name}\t{self.value}\n"
+
+
+def iter_netscape(lines):
+    """Cookies from the lines of a Netscape cookie file"""
+    for line in lines:
+        if line.startswith(HTTPONLY_PREFIX):
+            line = line[len(HTTPONLY_PREFIX):]
+        elif line.startswith('#'):
+            continue
+        parts = line.rstrip('\r\n').split('\t')
+        if len(parts) < 7:
+            continue
+        domain, flag, path, secure, expires, name, value = parts[:7]
+        yield Cookie(domain, name, value, path, secure == "TRUE", int(expires) if expires.isdigit() else 0,
+                     flag == "TRUE")
+
+
+def iter_devtools(lines):
+    """Cookies from a table copied out of the browser DevTools (name, value, domain, path, expires, ...)"""
+    for line in lines:
+        parts = line.rstrip('\r\n').split('\t')
+        if len(parts) < 6:
+            continue
+        # A check mark in the column after Size marks the flag convert_cookies.py always read as "secure"
+        secure = len(parts) > 6 and parts[6] == "✓"
+        yield Cookie(parts[2], parts[0], parts[1], parts[3], secure, parse_expiry(parts[4]))
+
+
+class CookieJar:
+    """Cookies indexed by (domain, name); a later cookie replaces an earlier one with the same key
+
+    Expired cookies are dropped while reading, so lookups only see usable ones.
+    """
+
+    def __init__(self):
+        self.cookies = {}
+        self.expired = 0
+
+    def add(self, cookie, now=None):
+        """Index a cookie; returns False (and counts it) if it has expired"""
+        if cookie.expired(now or time.time()):
+            self.expired += 1
+            return False
+        self.cookies[(cookie.domain, cookie.name)] = cookie
+        return True
+
+    def get(self, domain, name):
+        """Value of a cookie set for exactly this domain (with or without the leading dot), or None"""
+        cookie = self.cookies.get((domain, name)) or self.cookies.get(('.' + domain.lstrip('.'), name))
+        return cookie.value if cookie else None
+
+    def for_domain(self, host, names=None):
+        """{name: value} of the cookies a request to host would send (host and its parent domains)"""
+        labels = host.lstrip('.').split('.')
+        domains = set()
+        for i in range(len(labels) - 1):
+            parent = '.'.join(labels[i:])
+            domains.update((parent, '.' + parent))
+        found = {}
+        # Most specific domain last, so it wins
+        for domain in sorted(domains, key=lambda d: len(d.lstrip('.'))):
+            for name in (names if names is not None else self._names()):
+                cookie = self.cookies.get((domain, name))
+                if cookie is not None:
+                    found[name] = cookie.value
+        return found
+
+    def _names(self):
+        return {name for _, name in self.cookies}
+
+    def __len__(self):
+        return len(self.cookies)
+
+    def __iter__(self):
+        return iter(self.cookies.values())
+
+    def write_netscape(self, path, comment=None):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(NETSCAPE_HEADER)
+            if comment:
+                f.write(f"# {comment}\n")
+            f.write("\n")
+            f.writelines(cookie.netscape_line() for cookie in self)
+
+
+def read_jar(path, now=None):
+    """Parse a Netscape cookie file or DevTools export in one pass, detecting the format from its first line"""
+    now = now or time.time()
+    jar = CookieJar()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        first = f.readline()
+        fields = first.rstrip('\r\n').split('\t')
+        netscape = first.startswith('#') or (len(fields) >= 7 and fields[1] in ('TRUE', 'FALSE'))
+        parse = iter_netscape if netscape else iter_devtools
+        for lines in ([first], f):
+            for cookie in parse(lines):
+                jar.add(cookie, now)
+    return jar
+
+
+def load_jar(path):
+    """read_jar() cached per file until its mtime or size changes"""
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+    jar = read_jar(key)
+    with _cache_lock:
+        _cache[key] = (signature, jar)
+    return jar
+
+
+def convert_devtools_export(input_file, output_file, comment=None):
+    """Write a DevTools cookie export as a Netscape cookie file while reading it; returns the CookieJar
+
+    Expired cookies are left out. Each cookie is written as soon as it is
+    parsed. If a (domain, name) pair appears more than once, the file keeps
+    every copy and the jar keeps the last one, the same as yt-dlp when it
+    loads the file.
+    """
+    now = time.time()
+    jar = CookieJar()
+    with open(input_file, 'r', encoding='utf-8', errors='replace') as source, \
+            open(output_file, 'w', encoding='utf-8') as output:
+        output.write(NETSCAPE_HEADER)
+        if comment:
+            output.write(f"# {comment}\n")
+        output.write("\n")
+        for cookie in iter_devtools(source):
+            if jar.add(cookie, now):
+                output.write(cookie.netscape_line())
+    return jar
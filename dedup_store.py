@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Content-addressed storage: each distinct file is kept once, every copy is a hardlink
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+
+
+STORE_DIR_NAME = ".store"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Bytes hashed first when comparing same-size files in a report
+PARTIAL_HASH_SIZE = 64 * 1024
+
+
+def hash_file(path, limit=None):
+    """SHA-256 hex digest of a file (or of its first `limit` bytes), read in one pass"""
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    remaining = limit
+    with open(path, 'rb', buffering=0) as f:
+        while remaining is None or remaining > 0:
+            size = f.readinto(buffer if remaining is None or remaining >= len(buffer) else view[:remaining])
+            if not size:
+                break
+            digest.update(view[:size])
+            if remaining is not None:
+                remaining -= size
+    return digest.hexdigest()
+
+
+class ContentStore:
+    """Blobs under <output_dir>/.store/objects/<2 hex>/<sha256>, linked to their logical paths
+
+    A manifest (<sha256> <size> <relative path> per line) records every path
+    that was ingested, so copies can be traced back to their content even on
+    filesystems without hardlinks, where the files are left as they are.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.root = self.output_dir / STORE_DIR_NAME
+        self.objects = self.root / "objects"
+        self.manifest_path = self.root / "manifest.tsv"
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest):
+        return self.objects / digest[:2] / digest
+
+    def ingest(self, path):
+        """Store a finished file by content; returns (digest, bytes saved)"""
+        path = Path(path)
+        stat = path.stat()
+        digest = hash_file(path)
+        blob = self.blob_path(digest)
+        saved = 0
+        with self._lock:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                blob_stat = blob.stat()
+            except FileNotFoundError:
+                blob_stat = None
+            try:
+                if blob_stat is None:
+                    os.link(path, blob)
+                elif (blob_stat.st_dev, blob_stat.st_ino) != (stat.st_dev, stat.st_ino):
+                    # Same content already stored: swap the new copy for a link to it
+                    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.link")
+                    os.link(blob, tmp_path)
+                    os.replace(tmp_path, path)
+                    saved = stat.st_size
+            except OSError:
+                # No hardlinks here (other device, FAT, ...): keep the file, record it only
+                pass
+            self._record(digest, stat.st_size, path)
+        return digest, saved
+
+    def _record(self, digest, size, path):
+        try:
+            relative = path.resolve().relative_to(self.output_dir.resolve())
+        except ValueError:
+            relative = path.resolve()
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(f"{digest}\t{size}\t{relative}\n")
+
+    def manifest(self):
+        """Latest digest and size per logical path"""
+        entries = {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t', 2)
+                    if len(parts) == 3 and parts[1].isdigit():
+                        entries[parts[2]] = (parts[0], int(parts[1]))
+        except FileNotFoundError:
+            pass
+        return entries
+
+
+def _walk_files(root):
+    """Regular files below root, skipping the store and other hidden entries"""
+    stack = [str(root)]
+    while stack:
+        try:
+            scan = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with scan:
+            for entry in scan:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def find_duplicates(root):
+    """Groups of paths with identical content below root, largest waste first
+
+    Files are grouped by size first, so only files sharing a size are read.
+    Candidates are then compared by a hash of their first 64 KB before the
+    full hash, and paths that are already hardlinks of each other count once.
+    Returns [(size, [paths...]), ...] where each group holds distinct inodes.
+    """
+    by_size = {}
+    for entry in _walk_files(root):
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_size:
+            by_size.setdefault(stat.st_size, {}).setdefault((stat.st_dev, stat.st_ino), []).append(entry.path)
+
+    groups = []
+    for size, inodes in by_size.items():
+        if len(inodes) < 2:
+            continue
+        by_partial = {}
+        for paths in inodes.values():
+            by_partial.setdefault(hash_file(paths[0], PARTIAL_HASH_SIZE), []).append(paths)
+        for candidates in by_partial.values():
+            if len(candidates) < 2:
+                continue
+            by_full = {}
+            for paths in candidates:
+                key = hash_file(paths[0]) if size > PARTIAL_HASH_SIZE else 'partial'
+                by_full.setdefault(key, []).append(paths)
+            for same in by_full.values():
+                if len(same) > 1:
+                    groups.append((size, [paths[0] for paths in same]))
+    groups.sort(key=lambda group: group[0] * (len(group[1]) - 1), reverse=True)
+    return groups
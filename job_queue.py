@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Crash-safe per-item state for long profile and playlist jobs (SQLite)
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+PENDING = 'pending'
+IN_FLIGHT = 'in-flight'
+DONE = 'done'
+FAILED = 'failed'
+
+# An in-flight item whose lease runs out is handed to the next worker that asks
+DEFAULT_LEASE = 600
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Queue database kept in each output directory
+JOBS_DB_NAME = ".jobs.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    job TEXT NOT NULL,
+    item TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    data TEXT,
+    error TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (job, item)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job TEXT PRIMARY KEY,
+    cursor TEXT,
+    updated REAL NOT NULL
+);
+"""
+
+
+def worker_id():
+    """Lease owner name for this process: host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner):
+    """False only when owner is a process on this host that no longer exists"""
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """Item states (pending/in-flight/done/failed) for one job, kept in SQLite
+
+    Every transition is committed before the caller acts on it, so after a
+    crash the next run resumes from the recorded states: done items are
+    skipped, and in-flight items come back once their lease expires (or
+    right away when the process that held them is gone).
+    """
+
+    def __init__(self, path, job, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = str(path)
+        self.job = job
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.owner = worker_id()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self.release_stale()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def add(self, item, data=None):
+        """Record an item as pending unless it is already known"""
+        self._execute(
+            "INSERT OR IGNORE INTO items (job, item, state, data, updated) VALUES (?, ?, ?, ?, ?)",
+            (self.job, item, PENDING, json.dumps(data) if data is not None else None, time.time())
+        )
+
+    def claim(self, item):
+        """Take the lease on an item; False if it is done, leased or out of attempts"""
+        now = time.time()
+        self.add(item)
+        cursor = self._execute(
+            "UPDATE items SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated = ? "
+            "WHERE job = ? AND item = ? AND attempts < ? "
+            "AND (state IN (?, ?) OR (state = ? AND lease_expires < ?))",
+            (IN_FLIGHT, self.owner, now + self.lease, now, self.job, item, self.max_attempts,
+             PENDING, FAILED, IN_FLIGHT, now)
+        )
+        return cursor.rowcount == 1
+
+    def claim_pending(self, limit=None):
+        """Claim pending and retryable items recorded by earlier runs; returns [(item, data)]"""
+        rows = self._execute(
+            "SELECT item, data FROM items WHERE job = ? AND state IN (?, ?) AND attempts < ? ORDER BY rowid",
+            (self.job, PENDING, FAILED, self.max_attempts)
+        ).fetchall()
+        claimed = []
+        for item, data in rows:
+            if limit is not None and len(claimed) >= limit:
+                break
+            if self.claim(item):
+                claimed.append((item, json.loads(data) if data else None))
+        return claimed
+
+    def complete(self, item):
+        self._execute(
+            "UPDATE items SET state = ?, lease_owner = NULL, lease_expires = NULL, error = NULL, updated = ? "
+            "WHERE job = ? AND item = ?",
+            (DONE, time.time(), self.job, item)
+        )
+
+    def fail(self, item, error=None):
+        self._execute(
+            "UPDATE items SET state = ?, lease_owner = NULL, lease_expires = NULL, error = ?, updated = ? "
+            "WHERE job = ? AND item = ?",
+            (FAILED, str(error) if error is not None else None, time.time(), self.job, item)
+        )
+
+    def is_done(self, item):
+        row = self._execute("SELECT state FROM items WHERE job = ? AND item = ?", (self.job, item)).fetchone()
+        return row is not None and row[0] == DONE
+
+    def items(self, state):
+        """Items of this job in a given state"""
+        rows = self._execute("SELECT item FROM items WHERE job = ? AND state = ? ORDER BY rowid",
+                             (self.job, state)).fetchall()
+        return [row[0] for row in rows]
+
+    def counts(self):
+        """Number of items per state"""
+        rows = self._execute("SELECT state, COUNT(*) FROM items WHERE job = ? GROUP BY state", (self.job,))
+        return dict(rows.fetchall())
+
+    def release_stale(self):
+        """Return in-flight items held by dead local processes to pending"""
+        rows = self._execute(
+            "SELECT DISTINCT lease_owner FROM items WHERE job = ? AND state = ? AND lease_owner IS NOT NULL",
+            (self.job, IN_FLIGHT)
+        ).fetchall()
+        for (owner,) in rows:
+            if not _owner_alive(owner):
+                self._execute(
+                    "UPDATE items SET state = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                    "WHERE job = ? AND state = ? AND lease_owner = ?",
+                    (PENDING, time.time(), self.job, IN_FLIGHT, owner)
+                )
+
+    def load_cursor(self):
+        """Listing position saved by an interrupted run, or None"""
+        row = self._execute("SELECT cursor FROM jobs WHERE job = ?", (self.job,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def save_cursor(self, cursor):
+        """Save (or clear, with None) how far the job's listing has been enqueued"""
+        self._execute(
+            "INSERT INTO jobs (job, cursor, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(job) DO UPDATE SET cursor = excluded.cursor, updated = excluded.updated",
+            (self.job, json.dumps(cursor) if cursor is not None else None, time.time())
+        )
+
+
+class YtDlpJobTracker:
+    """Track the items of a multi-item yt-dlp run in a JobQueue
+
+    yt-dlp reports every item it starts and finishes to temporary files.
+    Finished items are marked done; items started but not finished are marked
+    failed. Without a user archive, done items are handed back to yt-dlp as a
+    temporary --download-archive so a rerun skips them.
+    """
+
+    def __init__(self, queue, use_archive=True):
+        self.queue = queue
+        self.use_archive = use_archive
+        self._files = []
+
+    def _tempfile(self, suffix):
+        fd, path = tempfile.mkstemp(prefix='media-downloader-', suffix=suffix)
+        os.close(fd)
+        self._files.append(path)
+        return path
+
+    def args(self):
+        """yt-dlp arguments for this run"""
+        self._started = self._tempfile('.started')
+        self._finished = self._tempfile('.finished')
+        args = [
+            "--print-to-file", "video:%(extractor_key)s %(id)s", self._started,
+            "--print-to-file", "after_move:%(extractor_key)s %(id)s", self._finished,
+        ]
+        if self.use_archive:
+            archive = self._tempfile('.archive')
+            with open(archive, 'w') as f:
+                f.writelines(f"{item}\n" for item in self.queue.items(DONE))
+            args.extend(["--download-archive", archive])
+        return args
+
+    @staticmethod
+    def _read_items(path):
+        """Archive-style "<extractor> <id>" keys; only the extractor is case-insensitive"""
+        items = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                extractor, _, media_id = line.strip().partition(' ')
+                if media_id:
+                    items.append(f"{extractor.lower()} {media_id}")
+        return items
+
+    def collect(self):
+        """Record the run's outcome per item; returns (done, failed) counts"""
+        finished = set(self._read_items(self._finished))
+        failed = 0
+        for item in self._read_items(self._started):
+            if item not in finished:
+                self.queue.add(item)
+                self.queue.fail(item, "did not finish")
+                failed += 1
+        for item in finished:
+            self.queue.add(item)
+            self.queue.complete(item)
+        return len(finished), failed
+
+    def cleanup(self):
+        for path in self._files:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self._files = []
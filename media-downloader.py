@@ -5,37 +5,90 @@ Currently supports: YouTube, Instagram
 """
 
 import argparse
+import atexit
 import subprocess
 import sys
 import os
-import re
 import json
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 from pathlib import Path
 import shutil
 
+from archive import DownloadArchive, media_key_from_url
+from profile_sync import SyncState
+from progress import ProgressReporter, reserve_stdout, run_with_status, run_capturing_errors
+from autotune import FragmentTuner
+from streaming import stream_audio, is_direct_media_url
+from ratelimit import HostRateLimiters, RetryScheduler, classify_error, parse_host_rates
+from tools import resolve_tool, forget_tool, has_module
+from ytdlp_engine import YtDlpEngine, load_yt_dlp
+from url_router import route_url
+from probe_cache import ProbeCache
+from job_queue import JobQueue, YtDlpJobTracker, JOBS_DB_NAME
+from session_pool import SessionPool, is_auth_error
+from dedup_store import ContentStore, find_duplicates
+from postprocess import PostProcessPool, FileListWatcher, audio_output_path
+from media_index import MediaIndex, AUDIO_SUFFIXES, MEDIA_SUFFIXES, FINISHED_FILE_TEMPLATE, parse_finished_line
+from playlist import flatten_playlist, entry_filename
+from scheduler import BandwidthBudget, SizeEstimator, split_rate_limit
+from staging import ScratchStaging, DiskGuard, InsufficientSpaceError, expected_size, parse_size
+from units import format_bytes
+from tracing import TRACER, ThreadProfiler, YtDlpPhases, span
+
+
+# Phase timings collected for --startup-profile
+STARTUP_TIMINGS = []
+
+# yt-dlp stderr lines kept per run to classify failures for retries
+ERROR_TAIL_LINES = 20
+
+
+def record_startup(phase, start):
+    """Record how long a startup phase took since start"""
+    STARTUP_TIMINGS.append((phase, time.perf_counter() - start))
+    TRACER.record(phase, start)
+
 
 class MediaDownloader:
     """Base class for media downloaders"""
     
-    def __init__(self, output_dir="downloads"):
+    def __init__(self, output_dir="downloads", archive=None, engine=None, progress=None, stream_audio=False,
+                 concurrent_fragments=None, http_chunk_size=None, fragment_tuner=None, probe_cache=None,
+                 rate_limiters=None, retry=None, content_store=None, postprocess_pool=None, media_index=None,
+                 staging=None, disk_guard=None):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.archive = archive
+        self.engine = engine
+        self.progress = progress
+        self.stream_audio = stream_audio
+        self.concurrent_fragments = concurrent_fragments
+        self.http_chunk_size = http_chunk_size
+        self.fragment_tuner = fragment_tuner
+        self.probe_cache = probe_cache
+        self.rate_limiters = rate_limiters or HostRateLimiters()
+        self.retry = retry or RetryScheduler()
+        self.content_store = content_store
+        self.postprocess_pool = postprocess_pool
+        self.media_index = media_index
+        self.staging = staging
+        self.disk_guard = disk_guard
         self.yt_dlp_path = self._ensure_yt_dlp()
     
     def _ensure_yt_dlp(self):
         """Ensure yt-dlp is available"""
-        # Check if yt-dlp is in PATH
-        try:
-            subprocess.run(["yt-dlp", "--version"], capture_output=True, check=True)
-            return "yt-dlp"
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            pass
-        
-        # Check for local yt-dlp
-        local_yt_dlp = Path("./yt-dlp")
-        if local_yt_dlp.exists():
-            return "./yt-dlp"
+        # Look in PATH, then for a local copy; memoized and cached across runs
+        start = time.perf_counter()
+        yt_dlp_path = resolve_tool("yt-dlp", local_paths=["./yt-dlp"])
+        record_startup("resolve yt-dlp", start)
+        if yt_dlp_path:
+            return yt_dlp_path
         
         # Download yt-dlp
         print("yt-dlp not found, downloading...")
@@ -46,6 +99,7 @@ class MediaDownloader:
                 "-o", "yt-dlp"
             ], check=True)
             subprocess.run(["chmod", "+x", "yt-dlp"], check=True)
+            forget_tool("yt-dlp")
             return "./yt-dlp"
         except subprocess.CalledProcessError as e:
             print(f"Failed to download yt-dlp: {e}")
@@ -55,23 +109,462 @@ class MediaDownloader:
         """Download media from URL"""
         raise NotImplementedError("Subclasses must implement download()")
 
+    def _run_yt_dlp(self, cmd, url, audio_format=None, keep_video=False):
+        """Run a yt-dlp command line, in-process when an engine is configured
+
+        Runs are paced by the host's rate limiter, and throttled or transient
+        failures are retried with backoff before giving up. With audio_format
+        and a post-processing pool, each finished file is handed to the pool
+        as soon as yt-dlp moves it into place (see _format_args). With a
+        scratch directory, yt-dlp writes there and finished files are moved
+        to the output directory; with a disk guard, the run first waits for
+        enough free space.
+        """
+        downloading = "--list-formats" not in cmd
+        reserved = None
+        if self.disk_guard and downloading:
+            with span("disk admission"):
+                reserved = self._admit(cmd, url, audio_format)
+        try:
+            self._run_yt_dlp_admitted(cmd, url, audio_format, keep_video, downloading)
+        finally:
+            if reserved is not None:
+                self.disk_guard.release(reserved)
+
+    def _admit(self, cmd, url, audio_format):
+        """Reserve the expected size of a download with the disk guard; exits if it can never fit"""
+        out = sys.stderr if self.progress else sys.stdout
+        expected = self._expected_size(cmd, audio_format)
+
+        def on_wait(path, free, needed):
+            print(f"Waiting for disk space on {path} ({format_bytes(max(free, 0))} free, "
+                  f"{format_bytes(needed)} needed): {url}", file=out)
+
+        try:
+            return self.disk_guard.admit(expected, on_wait=on_wait)
+        except InsufficientSpaceError as e:
+            print(f"Not enough disk space for {url}: {e.strerror}", file=out)
+            if self.progress:
+                self.progress.finish(url, ok=False, error=e.strerror)
+            sys.exit(1)
+
+    @staticmethod
+    def _expected_size(cmd, audio_format):
+        """Bytes the download needs, from the info JSON it loads, or None when unknown"""
+        if "--load-info-json" not in cmd:
+            return None
+        try:
+            with open(cmd[cmd.index("--load-info-json") + 1], 'r', encoding='utf-8') as f:
+                return expected_size(json.load(f), audio_format)
+        except (OSError, ValueError):
+            return None
+
+    def _run_yt_dlp_admitted(self, cmd, url, audio_format, keep_video, downloading):
+        hooks = []
+        if self.progress:
+            self.progress.start(url)
+            hooks.append(self.progress.hook(url))
+        probe = self._fragment_probe(cmd, url)
+        if probe:
+            hooks.append(probe)
+        # Progress statuses mark where extraction ends and each transfer and yt-dlp post-processor runs
+        phases = YtDlpPhases(TRACER, url) if TRACER.enabled else None
+        if phases:
+            hooks.append(phases)
+
+        def on_status(status, postprocess=False):
+            for hook in hooks:
+                hook(status, postprocess)
+
+        # yt-dlp writes into a per-URL scratch directory; files are moved out as they finish
+        reported_cmd = cmd
+        job_dir = final_dir = None
+        if self.staging and downloading:
+            job_dir = self.staging.open_job(url)
+            cmd, final_dir = self.staging.redirect(cmd, job_dir)
+
+        # yt-dlp reports every file it finishes as it goes, so each one can be
+        # converted, stored and indexed without waiting for the whole run
+        handoff = bool(audio_format and self.postprocess_pool)
+        handed_off = []
+        watcher = None
+        if handoff or self.content_store or self.media_index or job_dir:
+            fd, finished_log = tempfile.mkstemp(prefix='media-downloader-', suffix='.finished')
+            os.close(fd)
+            cmd = cmd[:1] + ["--print-to-file", FINISHED_FILE_TEMPLATE, finished_log] + cmd[1:]
+
+            def on_finished(line):
+                media_key, duration, path = parse_finished_line(line)
+                if handoff:
+                    self._postprocess(path, audio_format, keep_video, media_key, duration, job_dir, final_dir)
+                    handed_off.append(path)
+                elif job_dir:
+                    [path] = self.staging.publish([path], final_dir)
+                    self._record_outputs([path], media_key, duration)
+                else:
+                    self._record_outputs([path], media_key, duration)
+                if job_dir:
+                    # What yt-dlp would have printed for the file without staging
+                    self._record_output_path(path, reported_cmd)
+
+            watcher = FileListWatcher(finished_log, TRACER.wrap(on_finished))
+            watcher.start()
+
+        try:
+            with span("yt-dlp"):
+                returncode = self._run_yt_dlp_with_retries(cmd, url, on_status if hooks else None)
+        finally:
+            if phases:
+                phases.close()
+            if watcher:
+                watcher.stop()
+                os.unlink(watcher.path)
+
+        if handoff and not self.postprocess_pool.background:
+            if not self._wait_postprocessing(handed_off) and returncode == 0:
+                returncode = 1
+
+        if job_dir:
+            try:
+                self.staging.sweep(job_dir, final_dir, keep=handed_off)
+            except OSError as e:
+                print(f"Warning: could not move files from {job_dir}: {e}")
+                returncode = returncode or 1
+            self.staging.close_job(job_dir)
+
+        if self.progress:
+            self.progress.finish(url, ok=returncode == 0, returncode=returncode)
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+    def _format_args(self, audio_only, format, keep_video):
+        """yt-dlp format selection; audio is extracted by yt-dlp unless the post-processing pool does it"""
+        if not audio_only:
+            # Download best quality video+audio, merge if needed
+            return ["-f", "bestvideo+bestaudio/best"]
+        if self.postprocess_pool:
+            # What -x downloads; the conversion happens in the pool
+            return ["-f", "bestaudio/best"]
+        args = ["-x", "--audio-format", format]
+        if keep_video:
+            args.append("-k")
+        return args
+
+    def _postprocess(self, path, format, keep_video, media_key=None, duration=None, job_dir=None, final_dir=None):
+        """Queue a downloaded file for audio extraction, storing and indexing the results when done
+
+        A file in a scratch job directory is converted there, and the results
+        are moved to final_dir. If the conversion fails, the downloaded file
+        is moved there instead.
+        """
+        if job_dir:
+            self.staging.hold(job_dir)
+
+        def on_done(paths):
+            if job_dir:
+                paths = self.staging.publish(paths, final_dir)
+            self._record_outputs(paths, media_key, duration)
+            return paths
+
+        future = self.postprocess_pool.submit(path, format, keep_video, on_done=on_done)
+        if job_dir:
+            def release(future):
+                if (future.cancelled() or future.exception()) and os.path.exists(path):
+                    try:
+                        self.staging.publish([path], final_dir)
+                    except OSError as e:
+                        print(f"Warning: could not move {path} out of {job_dir}: {e}")
+                self.staging.close_job(job_dir)
+
+            future.add_done_callback(release)
+        return future
+
+    def _wait_postprocessing(self, paths):
+        """Wait for the conversions of downloaded files; False if any failed"""
+        ok = True
+        for path in paths:
+            future = self.postprocess_pool.take(path)
+            if future is None:
+                continue
+            try:
+                future.result()
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"Post-processing failed for {path}: {e}")
+                ok = False
+        return ok
+
+    def _run_yt_dlp_with_retries(self, cmd, url, on_status):
+        limiter = self.rate_limiters.for_url(url)
+        attempt = 0
+        while True:
+            with span("rate limit wait"):
+                limiter.acquire()
+            error_tail = deque(maxlen=ERROR_TAIL_LINES)
+            returncode = self._run_yt_dlp_once(cmd, on_status, error_tail)
+            if returncode == 0:
+                limiter.succeeded()
+                return returncode
+            kind = classify_error(error_tail)
+            if not self.retry.should_retry(attempt, kind):
+                return returncode
+            delay = self.retry.delay(attempt, kind)
+            attempt += 1
+            with span("retry wait", reason=kind):
+                self._report_retry(url, limiter, kind, delay, attempt)
+
+    def _run_yt_dlp_once(self, cmd, on_status, error_tail):
+        if self.engine is not None:
+            return self.engine.run(
+                cmd[1:],
+                progress_hook=on_status,
+                log_to_stderr=bool(self.progress),
+                error_tail=error_tail
+            )
+        if self.progress:
+            # Keep stdout for JSON events only
+            return run_with_status(cmd, on_status, output=sys.stderr, error_tail=error_tail)
+        if on_status:
+            return run_with_status(cmd, on_status, echo_progress=True, error_tail=error_tail)
+        return run_capturing_errors(cmd, error_tail)
+
+    def _report_retry(self, url, limiter, kind, delay, attempt):
+        """Wait before a retry; throttling also slows down every worker on the host"""
+        host = HostRateLimiters.host_of(url)
+        out = sys.stderr if self.progress else sys.stdout
+        if kind == 'throttled':
+            rate = limiter.throttled(pause=delay)
+            print(f"Throttled by {host}, slowing to {rate:.2f}/s and retrying in {delay:.0f}s "
+                  f"(retry {attempt}/{self.retry.max_retries})", file=out)
+        else:
+            rate = limiter.rate
+            print(f"Transient error from {host}, retrying in {delay:.0f}s "
+                  f"(retry {attempt}/{self.retry.max_retries})", file=out)
+            time.sleep(delay)
+        if self.progress:
+            self.progress.emit(url, 'retry', reason=kind, attempt=attempt, delay=round(delay, 1),
+                               rate=round(rate, 3))
+
+    def _try_stream_audio(self, url, format, keep_video, extra_args, single_item):
+        """Transcode audio while it downloads when enabled; returns True if done"""
+        if not self.stream_audio or keep_video or not single_item:
+            return False
+        if extra_args and "--list-formats" in extra_args:
+            return False
+        ffmpeg_path = resolve_tool("ffmpeg")
+        if not ffmpeg_path:
+            return False
+
+        print(f"Streaming audio from: {url}")
+        # Paced, admitted and staged like a regular run; a failure falls back
+        # to that run, which retries throttled and transient errors
+        limiter = self.rate_limiters.for_url(url)
+        with span("rate limit wait"):
+            limiter.acquire()
+        reserved = None
+        if self.disk_guard:
+            with span("disk admission"):
+                reserved = self._admit(self._source_args(url, extra_args), url, format)
+        job_dir = self.staging.open_job(url) if self.staging else None
+        if self.progress:
+            self.progress.start(url)
+        args = list(extra_args or []) + self._archive_args() + self._transfer_args(url)
+        error_tail = deque(maxlen=ERROR_TAIL_LINES)
+        try:
+            with span("stream audio"):
+                path = stream_audio(self.yt_dlp_path, ffmpeg_path, url, job_dir or self.output_dir, format, args,
+                                    error_tail=error_tail)
+            if path is not None and job_dir:
+                [path] = self.staging.publish([path], str(self.output_dir))
+        finally:
+            if job_dir:
+                self.staging.close_job(job_dir)
+            if reserved is not None:
+                self.disk_guard.release(reserved)
+
+        if path is None:
+            kind = classify_error(error_tail)
+            if kind == 'throttled':
+                # The fallback's first request waits out the pause like a retry would
+                limiter.throttled(pause=self.retry.delay(0, kind))
+            if self.progress:
+                self.progress.emit(url, 'fallback', reason=kind)
+            print("Streaming not possible for this URL, falling back to download-then-convert")
+            return False
+        limiter.succeeded()
+        self._record_output_path(path, extra_args)
+        self._record_outputs([path], media_key_from_url(url))
+        if self.progress:
+            self.progress.finish(url)
+        print("Download completed successfully!")
+        return True
+
+    def _record_outputs(self, paths, media_key=None, duration=None):
+        """Store finished files by content (linking duplicates) and add them to the output index"""
+        with span("store and index"):
+            self._record_outputs_untraced(paths, media_key, duration)
+
+    def _record_outputs_untraced(self, paths, media_key, duration):
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            digest = None
+            if self.content_store:
+                try:
+                    digest, saved = self.content_store.ingest(path)
+                    if saved:
+                        print(f"Deduplicated {os.path.basename(path)}: identical content already stored "
+                              f"({saved / (1024 * 1024):.1f} MB saved)")
+                except OSError as e:
+                    print(f"Warning: could not deduplicate {path}: {e}")
+            if self.media_index:
+                try:
+                    self.media_index.record(path, media_key, duration, digest)
+                except OSError as e:
+                    print(f"Warning: could not index {path}: {e}")
+
+    @staticmethod
+    def _record_output_path(path, extra_args):
+        """Mirror yt-dlp's after_move:filepath print for files written outside yt-dlp"""
+        args = extra_args or []
+        for i in range(len(args) - 2):
+            if args[i] == "--print-to-file" and args[i + 1] == "after_move:filepath":
+                with open(args[i + 2], 'a') as f:
+                    f.write(f"{path}\n")
+
+    def _transfer_args(self, url):
+        """yt-dlp arguments for parallel fragment and chunked HTTP downloads"""
+        args = []
+        fragments = self.concurrent_fragments
+        if fragments == 'auto':
+            fragments = self.fragment_tuner.choose(urlparse(url).hostname) if self.fragment_tuner else None
+        if fragments:
+            args.extend(["--concurrent-fragments", str(fragments)])
+        if self.http_chunk_size:
+            args.extend(["--http-chunk-size", str(self.http_chunk_size)])
+        return args
+
+    def _fragment_probe(self, cmd, url):
+        """Throughput probe for auto-tuned runs, or None"""
+        if self.concurrent_fragments != 'auto' or not self.fragment_tuner:
+            return None
+        if "--concurrent-fragments" not in cmd:
+            return None
+        level = int(cmd[cmd.index("--concurrent-fragments") + 1])
+        return self.fragment_tuner.probe(urlparse(url).hostname, level)
+
+    def _source_args(self, url, extra_args=None):
+        """The URL to download, or the cached info JSON from an earlier probe of it
+
+        With a disk guard, a single video is probed first so its expected size
+        is known; the download then reuses that info instead of extracting again.
+        """
+        if self.probe_cache:
+            path = self.probe_cache.lookup(url, extra_args)
+            if path is None and self.disk_guard and media_key_from_url(url) is not None \
+                    and not (extra_args and "--list-formats" in extra_args):
+                try:
+                    self.probe_cache.probe(self.yt_dlp_path, url, extra_args)
+                    path = self.probe_cache.lookup(url, extra_args)
+                except (subprocess.CalledProcessError, OSError):
+                    pass
+            if path is not None:
+                return ["--load-info-json", str(path)]
+        return [url]
+
+    def _job_queue(self, job):
+        """Durable per-item state for a multi-item job, kept in the output directory"""
+        return JobQueue(self.output_dir / JOBS_DB_NAME, job)
+
+    def _archive_args(self):
+        """yt-dlp arguments that record and skip entries in the download archive"""
+        if not self.archive:
+            return []
+        return ["--download-archive", str(self.archive.path)]
+
+    def _job_tracker(self, job, extra_args):
+        """A YtDlpJobTracker for a multi-item job
+
+        Done items are only handed to yt-dlp as a temporary download archive
+        when no archive is in use: yt-dlp reads just the last
+        --download-archive, so one added here would replace the user's.
+        """
+        user_archive = any(arg == "--download-archive" or arg.startswith("--download-archive=")
+                           for arg in extra_args or [])
+        return YtDlpJobTracker(self._job_queue(job), use_archive=not (self.archive or user_archive))
+
+    def _is_indexed(self, url, audio_only, format, extra_args=None):
+        """Check the output index for a file of this media in the wanted form, without spawning yt-dlp"""
+        if not self.media_index:
+            return False
+        if extra_args and ("--list-formats" in extra_args or "--force-overwrites" in extra_args):
+            return False
+        key = media_key_from_url(url)
+        if key is None:
+            return False
+        for path in self.media_index.lookup(*key):
+            suffix = path.suffix.lower()
+            if not audio_only:
+                wanted = suffix not in AUDIO_SUFFIXES
+            elif format == 'best':
+                wanted = suffix in AUDIO_SUFFIXES
+            else:
+                wanted = suffix == audio_output_path(path, format).suffix
+            if wanted:
+                print(f"Already downloaded, skipping: {url} ({path})")
+                return True
+        return False
+
+    def _count_media(self, directory):
+        """Number of media files below a directory, from the output index when there is one"""
+        if self.media_index:
+            return self.media_index.count(directory)
+        count = 0
+        with os.scandir(directory) as scan:
+            for entry in scan:
+                if os.path.splitext(entry.name)[1].lower() in MEDIA_SUFFIXES and entry.is_file():
+                    count += 1
+        return count
+
+    def _is_archived(self, url, extra_args=None):
+        """Check the download archive for URL without spawning yt-dlp"""
+        if not self.archive or (extra_args and "--list-formats" in extra_args):
+            return False
+        key = media_key_from_url(url)
+        return key is not None and self.archive.has(*key)
+
 
 class YouTubeDownloader(MediaDownloader):
     """YouTube specific downloader"""
+
+    def __init__(self, output_dir="downloads", playlist_workers=0, **kwargs):
+        super().__init__(output_dir, **kwargs)
+        self.playlist_workers = max(0, playlist_workers or 0)
     
-    def is_youtube_url(self, url):
+    @staticmethod
+    def is_youtube_url(url):
         """Check if URL is a YouTube URL"""
-        patterns = [
-            r'(https?://)?(www\.)?(youtube\.com|youtu\.be)',
-            r'(https?://)?(www\.)?youtube\.com/watch\?v=',
-            r'(https?://)?(www\.)?youtu\.be/'
-        ]
-        return any(re.match(pattern, url) for pattern in patterns)
+        return route_url(url).platform == 'youtube'
     
     def download(self, url, audio_only=True, format="wav", keep_video=False, extra_args=None):
         """Download YouTube media"""
         if not self.is_youtube_url(url):
             raise ValueError("Not a valid YouTube URL")
+
+        if self._is_archived(url, extra_args):
+            print(f"Already downloaded, skipping: {url}")
+            return
+        if self._is_indexed(url, audio_only, format, extra_args):
+            return
+
+        route = route_url(url)
+        listing_formats = extra_args and "--list-formats" in extra_args
+        if self.playlist_workers and route.kind in ('playlist', 'channel') and not listing_formats:
+            self._download_playlist(url, route, audio_only, format, keep_video, extra_args)
+            return
+
+        if audio_only and self._try_stream_audio(url, format, keep_video, extra_args,
+                                                 single_item=media_key_from_url(url) is not None):
+            return
         
         output_template = str(self.output_dir / "%(title)s.%(ext)s")
         
@@ -80,75 +573,173 @@ class YouTubeDownloader(MediaDownloader):
         # Add extra arguments first if provided
         if extra_args:
             cmd.extend(extra_args)
+
+        cmd.extend(self._archive_args())
+        cmd.extend(self._transfer_args(url))
         
         # Only add format options if not listing formats
-        if not extra_args or "--list-formats" not in extra_args:
-            if audio_only:
-                cmd.extend(["-x", "--audio-format", format])
-                if keep_video:
-                    cmd.append("-k")
-            else:
-                # Download best quality video+audio, merge if needed
-                cmd.extend(["-f", "bestvideo+bestaudio/best"])
+        if not listing_formats:
+            cmd.extend(self._format_args(audio_only, format, keep_video))
         
-        cmd.extend(["-o", output_template, url])
+        # Playlists and channels record per-video state so an interrupted run resumes
+        tracker = None
+        if route.kind in ('playlist', 'channel') and not listing_formats:
+            tracker = self._job_tracker(f"youtube-{route.kind}:{route.id or route.username}", extra_args)
+            cmd.extend(tracker.args())
+
+        cmd.extend(["-o", output_template] + self._source_args(url, extra_args))
         
         print(f"Downloading from YouTube: {url}")
         try:
-            subprocess.run(cmd, check=True)
+            self._run_yt_dlp(cmd, url, audio_format=format if audio_only and not listing_formats else None,
+                             keep_video=keep_video)
             print("Download completed successfully!")
         except subprocess.CalledProcessError as e:
             print(f"Download failed: {e}")
             sys.exit(1)
+        finally:
+            if tracker:
+                tracker.collect()
+                tracker.cleanup()
+                tracker.queue.close()
+
+    def _download_playlist(self, url, route, audio_only, format, keep_video, extra_args):
+        """Download the videos of a playlist or channel in parallel, one yt-dlp run each
+
+        The listing is fetched once without resolving formats (--flat-playlist).
+        Per-video state is kept in the same job queue the single-process mode
+        uses, so a rerun of either mode only downloads what is missing.
+        """
+        print(f"Listing {route.kind}: {url}")
+        self.rate_limiters.for_url(url).acquire()
+        try:
+            entries = flatten_playlist(self.yt_dlp_path, url, extra_args)
+        except (subprocess.CalledProcessError, ValueError) as e:
+            print(f"Could not list {url}: {e}")
+            sys.exit(1)
+        total = len(entries)
+        if not total:
+            print("No videos found")
+            return
+
+        queue = self._job_queue(f"youtube-{route.kind}:{route.id or route.username}")
+        counts = {'done': 0, 'failed': 0, 'archived': 0, 'resumed': 0, 'busy': 0}
+        counts_lock = threading.Lock()
+
+        def download_entry(entry):
+            try:
+                with TRACER.url(entry.url):
+                    self._download_entry(entry, total, audio_only, format, keep_video, extra_args)
+            except SystemExit:
+                # The download path exits on failures (e.g. no disk space); contain it to this entry
+                queue.fail(entry.item, 'download failed')
+                print(f"Download failed [{entry.index}/{total}] {entry.url}")
+                outcome = 'failed'
+            except Exception as e:
+                queue.fail(entry.item, e)
+                print(f"Download failed [{entry.index}/{total}] {entry.url}: {e}")
+                outcome = 'failed'
+            else:
+                queue.complete(entry.item)
+                outcome = 'done'
+            with counts_lock:
+                counts[outcome] += 1
+
+        pending = []
+        for entry in entries:
+            if self.archive and self.archive.has(entry.extractor, entry.media_id):
+                counts['archived'] += 1
+                continue
+            if self._is_indexed(entry.url, audio_only, format, extra_args):
+                counts['archived'] += 1
+                continue
+            queue.add(entry.item, {'url': entry.url, 'index': entry.index, 'title': entry.title})
+            if not queue.claim(entry.item):
+                # Done in an earlier run, leased by another running process, or out of attempts
+                counts['resumed' if queue.is_done(entry.item) else 'busy'] += 1
+                continue
+            pending.append(entry)
+
+        print(f"Downloading {len(pending)} of {total} videos with {self.playlist_workers} workers")
+        # A --limit-rate given to the playlist is shared by its parallel downloads
+        extra_args = split_rate_limit(extra_args, min(self.playlist_workers, len(pending)))
+        try:
+            with ThreadPoolExecutor(max_workers=self.playlist_workers, thread_name_prefix='playlist') as pool:
+                list(pool.map(download_entry, pending))
+        finally:
+            queue.close()
+
+        print(f"\nDownloaded {counts['done']} of {total} videos")
+        if counts['archived']:
+            print(f"Skipped {counts['archived']} videos already downloaded")
+        if counts['resumed']:
+            print(f"Skipped {counts['resumed']} videos completed by an earlier run")
+        if counts['busy']:
+            print(f"Skipped {counts['busy']} videos in progress elsewhere or out of retries")
+        if counts['failed']:
+            print(f"{counts['failed']} videos failed; rerun to retry them")
+            sys.exit(1)
+
+    def _download_entry(self, entry, total, audio_only, format, keep_video, extra_args):
+        """Download one playlist video, named by its playlist index"""
+        cmd = [self.yt_dlp_path]
+        if extra_args:
+            cmd.extend(extra_args)
+        cmd.extend(self._archive_args())
+        cmd.extend(self._transfer_args(entry.url))
+        cmd.extend(self._format_args(audio_only, format, keep_video))
+        cmd.extend(["--no-playlist", "-o", str(self.output_dir / entry_filename(entry, total))])
+        cmd.extend(self._source_args(entry.url, extra_args))
+        print(f"Downloading [{entry.index}/{total}]: {entry.title or entry.url}")
+        self._run_yt_dlp(cmd, entry.url, audio_format=format if audio_only else None, keep_video=keep_video)
 
 
 class InstagramDownloader(MediaDownloader):
     """Instagram specific downloader"""
+
+    def __init__(self, output_dir="downloads", incremental=False, post_workers=4, post_rate=2.0,
+                 session_pool=None, **kwargs):
+        super().__init__(output_dir, **kwargs)
+        self.incremental = incremental
+        self.post_workers = max(1, post_workers)
+        self.post_rate = post_rate
+        self.session_pool = session_pool
     
-    def is_instagram_url(self, url):
+    @staticmethod
+    def is_instagram_url(url):
         """Check if URL is an Instagram URL"""
-        patterns = [
-            r'(https?://)?(www\.)?instagram\.com/p/',
-            r'(https?://)?(www\.)?instagram\.com/reel/',
-            r'(https?://)?(www\.)?instagram\.com/tv/',
-            r'(https?://)?(www\.)?instagram\.com/stories/',
-            r'(https?://)?(www\.)?instagram\.com/[^/]+/?$'  # Profile URL
-        ]
-        return any(re.match(pattern, url) for pattern in patterns)
+        return route_url(url).platform == 'instagram'
 
     def is_profile_url(self, url):
         """Check if URL is an Instagram profile URL"""
-        # Match URLs like instagram.com/username or instagram.com/username/
-        # but not specific posts, reels, etc.
-        pattern = r'^(https?://)?(www\.)?instagram\.com/([^/]+)/?$'
-        match = re.match(pattern, url)
-        if match:
-            username = match.group(3)
-            # Exclude Instagram's special pages
-            special_pages = ['p', 'reel', 'tv', 'stories', 'explore', 'accounts', 'about', 'legal', 'privacy']
-            return username not in special_pages
-        return False
+        return route_url(url).kind == 'profile'
 
     def extract_username(self, url):
         """Extract username from Instagram profile URL"""
-        pattern = r'^(https?://)?(www\.)?instagram\.com/([^/]+)/?$'
-        match = re.match(pattern, url)
-        if match:
-            return match.group(3)
+        route = route_url(url)
+        if route.kind == 'profile':
+            return route.username
         return None
     
     def _ensure_instaloader(self):
         """Ensure instaloader is available"""
+        if has_module("instaloader"):
+            return True
+        print("Installing instaloader for Instagram profile downloads...")
         try:
-            import instaloader
+            subprocess.run([sys.executable, "-m", "pip", "install", "instaloader"], check=True)
+            forget_tool("module:instaloader")
             return True
-        except ImportError:
-            print("Installing instaloader for Instagram profile downloads...")
-            try:
-                subprocess.run([sys.executable, "-m", "pip", "install", "instaloader"], check=True)
-                return True
-            except subprocess.CalledProcessError:
-                return False
+        except subprocess.CalledProcessError:
+            return False
+
+    def _session_pool(self, extra_args):
+        """Session pool for instaloader, built from --cookies if none was configured"""
+        if self.session_pool is None and extra_args and "--cookies" in extra_args:
+            cookie_file_idx = extra_args.index("--cookies") + 1
+            if cookie_file_idx < len(extra_args):
+                self.session_pool = SessionPool([extra_args[cookie_file_idx]])
+        return self.session_pool
 
     def download_profile(self, url, video=True, extra_args=None):
         """Download all posts from an Instagram profile using instaloader"""
@@ -158,6 +749,8 @@ class InstagramDownloader(MediaDownloader):
 
         # Try to use instaloader for profile downloads
         if self._ensure_instaloader():
+            # Read by the fallback handler, which can run before a session is picked
+            session = session_pool = None
             try:
                 import instaloader
 
@@ -168,6 +761,10 @@ class InstagramDownloader(MediaDownloader):
                 print(f"Downloading all posts from Instagram profile: @{username}")
                 print(f"Files will be saved to: {account_dir}")
 
+                # Posts and GraphQL queries share the Instagram host's adaptive rate limit
+                limiter = self.rate_limiters.get('instagram.com', rate=self.post_rate, burst=self.post_workers)
+                rate_controller = self._rate_controller(instaloader, limiter)
+
                 # Initialize Instaloader with custom settings
                 L = instaloader.Instaloader(
                     dirname_pattern=str(account_dir),
@@ -180,65 +777,145 @@ class InstagramDownloader(MediaDownloader):
                     compress_json=False,
                     filename_pattern="{date:%Y%m%d}_{mediaid}",
                     quiet=False,
-                    request_timeout=60
+                    request_timeout=60,
+                    rate_controller=(lambda context: rate_controller(context)) if rate_controller else None
                 )
 
-                # Load session cookies if available
-                session_loaded = False
-                if extra_args and "--cookies" in extra_args:
-                    cookie_file_idx = extra_args.index("--cookies") + 1
-                    if cookie_file_idx < len(extra_args):
-                        cookie_file = extra_args[cookie_file_idx]
-                        try:
-                            # Read cookie file and extract sessionid
-                            sessionid = None
-                            ds_user_id = None
-                            with open(cookie_file, 'r') as f:
-                                for line in f:
-                                    if line.startswith('#') or not line.strip():
-                                        continue
-                                    parts = line.strip().split('\t')
-                                    if len(parts) >= 7:
-                                        if parts[5] == 'sessionid':
-                                            sessionid = parts[6]
-                                        elif parts[5] == 'ds_user_id':
-                                            ds_user_id = parts[6]
-
-                            if sessionid:
-                                print(f"Loading session from cookies...")
-                                # Try to load existing session or create new one
-                                session_file = Path(f".instaloader-session-{username}")
-
-                                # Create a session using the import_session method
-                                # We need to manually set the cookies
-                                L.context._session.cookies.set('sessionid', sessionid, domain='.instagram.com')
-                                if ds_user_id:
-                                    L.context._session.cookies.set('ds_user_id', ds_user_id, domain='.instagram.com')
-
-                                # Test the session
-                                try:
-                                    L.context.test_login()
-                                    print(f"Session authenticated successfully!")
-                                    session_loaded = True
-                                except Exception:
-                                    print(f"Session authentication failed, trying without login...")
-                        except Exception as e:
-                            print(f"Warning: Could not load cookies: {e}")
+                # Log in with a saved session; test_login() only runs for new or rejected sessions
+                session_pool = self._session_pool(extra_args)
+                with span("instaloader login"):
+                    session = session_pool.acquire() if session_pool else None
+                    while session and not session_pool.apply(session, L):
+                        if session.rejected:
+                            print(f"Session from {session.cookie_file} failed authentication")
+                        session = session_pool.acquire()
+                if session:
+                    print(f"Using Instagram session of @{session.username}")
+                elif session_pool:
+                    print("No valid Instagram session, trying without login...")
 
                 # Get profile
-                profile = instaloader.Profile.from_username(L.context, username)
+                with span("instaloader profile"):
+                    profile = instaloader.Profile.from_username(L.context, username)
+
+                sync_state = SyncState(account_dir) if self.incremental else None
+                if sync_state and sync_state.latest_date:
+                    print(f"Incremental sync: fetching posts newer than {sync_state.latest_date:%Y-%m-%d %H:%M}")
+
+                # Per-post state survives crashes; done posts are never downloaded twice
+                queue = self._job_queue(f"instagram-profile:{username}")
+
+                # This loop paginates posts while a bounded pool downloads their media
+                downloaded = {'count': 0}
+                downloaded_lock = threading.Lock()
+                failures = []
+                in_flight = threading.BoundedSemaphore(self.post_workers * 2)
+
+                def post_done(future, post):
+                    in_flight.release()
+                    if future.exception() is not None:
+                        queue.fail(f"instagram {post.shortcode}", future.exception())
+                        failures.append(future.exception())
+                        return
+                    queue.complete(f"instagram {post.shortcode}")
+                    with downloaded_lock:
+                        downloaded['count'] += 1
+                        print(f"Downloaded post {downloaded['count']}")
+                        if self.progress:
+                            post_bytes = self._post_bytes(account_dir, post)
+                            post_elapsed = future.result()
+                            self.progress.emit(
+                                url,
+                                'post',
+                                bytes=post_bytes,
+                                speed=post_bytes / post_elapsed if post_elapsed else None,
+                                count=downloaded['count'],
+                                shortcode=post.shortcode,
+                                post_elapsed=round(post_elapsed, 3)
+                            )
+
+                if self.progress:
+                    self.progress.start(url)
+
+                def submit(post):
+                    in_flight.acquire()
+                    future = pool.submit(TRACER.wrap(self._download_post), L, post, profile.username, limiter,
+                                         account_dir)
+                    future.add_done_callback(lambda f, p=post: post_done(f, p))
+
+                skipped_count = 0
+                resumed_count = 0
+                listing_complete = True
+                with ThreadPoolExecutor(max_workers=self.post_workers) as pool:
+                    # Posts an interrupted run listed but did not finish go first
+                    for item, _ in queue.claim_pending():
+                        submit(instaloader.Post.from_shortcode(L.context, item.split(' ', 1)[1]))
+
+                    posts = profile.get_posts()
+                    cursor = queue.load_cursor()
+                    # Incremental syncs stop at the first synced post, so they always list from the top
+                    if cursor and not sync_state and hasattr(posts, 'thaw'):
+                        try:
+                            posts.thaw(instaloader.FrozenNodeIterator(**cursor))
+                            print("Resuming the post listing where the last run stopped")
+                        except Exception:
+                            pass
 
-                # Download all posts
-                post_count = 0
-                for post in profile.get_posts():
-                    L.download_post(post, target=profile.username)
-                    post_count += 1
-                    print(f"Downloaded post {post_count}")
+                    # Each step may fetch the next page of the listing
+                    for post in TRACER.timed_iter(posts, "instaloader listing"):
+                        if failures:
+                            listing_complete = False
+                            break
+                        if sync_state:
+                            if sync_state.is_synced(post.date_utc):
+                                # Pinned posts are listed first regardless of age
+                                if getattr(post, 'is_pinned', False):
+                                    continue
+                                print("Reached already-synced posts, stopping")
+                                break
+                            sync_state.observe(post.mediaid, post.date_utc)
+                        if self.archive and self.archive.has('instagram', post.shortcode):
+                            skipped_count += 1
+                            continue
+                        # Same "<extractor> <id>" items the yt-dlp fallback records
+                        item = f"instagram {post.shortcode}"
+                        queue.add(item, {'mediaid': post.mediaid, 'date': post.date_utc.isoformat()})
+                        if not queue.claim(item):
+                            # Done in an earlier run, or already leased (retried above or by another worker)
+                            if queue.is_done(item):
+                                resumed_count += 1
+                            continue
+                        submit(post)
+                        if hasattr(posts, 'freeze'):
+                            queue.save_cursor(posts.freeze()._asdict())
+
+                if listing_complete:
+                    queue.save_cursor(None)
+                queue.close()
+                if failures:
+                    raise failures[0]
+                post_count = downloaded['count']
+                if self.progress:
+                    self.progress.finish(url, posts=post_count, skipped=skipped_count)
+
+                # Only advance the high-water mark once every newer post is on disk
+                if sync_state:
+                    sync_state.save()
 
                 print(f"\nSuccessfully downloaded {post_count} posts from @{username}!")
+                if skipped_count:
+                    print(f"Skipped {skipped_count} posts already in the download archive")
+                if resumed_count:
+                    print(f"Skipped {resumed_count} posts completed by an earlier run")
                 return
 
             except Exception as e:
+                if self.progress:
+                    self.progress.finish(url, ok=False, error=str(e))
+                if session and is_auth_error(e):
+                    # Only now is the saved session checked again (on its next use)
+                    session_pool.invalidate(session)
+                    print(f"Instagram rejected the session from {session.cookie_file}; it will be re-validated")
                 print(f"Instaloader failed: {e}")
                 print("Falling back to yt-dlp method...")
 
@@ -247,8 +924,8 @@ class InstagramDownloader(MediaDownloader):
         account_dir = self.output_dir / username
         account_dir.mkdir(exist_ok=True)
 
-        # Build output template with post index for multiple media items
-        output_template = str(account_dir / "%(upload_date>%Y%m%d)s_%(title).100s_%(autonumber)s.%(ext)s")
+        # The media id keeps names stable across runs (autonumber shifts when a run resumes)
+        output_template = str(account_dir / "%(upload_date>%Y%m%d)s_%(title).100s_%(id)s.%(ext)s")
 
         cmd = [self.yt_dlp_path]
 
@@ -256,6 +933,25 @@ class InstagramDownloader(MediaDownloader):
         if extra_args:
             cmd.extend(extra_args)
 
+        cmd.extend(self._archive_args())
+        cmd.extend(self._transfer_args(url))
+
+        sync_state = SyncState(account_dir) if self.incremental else None
+        seen_log = None
+        if sync_state:
+            if sync_state.dateafter():
+                cmd.extend(["--dateafter", sync_state.dateafter()])
+            if self.archive:
+                # Posts are listed newest first, so the first archived one ends the sync
+                cmd.append("--break-on-existing")
+            # Record each post's timestamp to advance the high-water mark afterwards
+            fd, seen_log = tempfile.mkstemp(prefix='media-downloader-', suffix='.seen')
+            os.close(fd)
+            cmd.extend(["--print-to-file", "after_move:%(id)s %(timestamp)s", seen_log])
+
+        tracker = self._job_tracker(f"instagram-profile:{username}", extra_args)
+        cmd.extend(tracker.args())
+
         # Download highest quality media
         cmd.extend([
             "--write-description",  # Save post captions
@@ -268,13 +964,12 @@ class InstagramDownloader(MediaDownloader):
         print(f"Files will be saved to: {account_dir}")
 
         try:
-            subprocess.run(cmd, check=True)
+            self._run_yt_dlp(cmd, url)
+            if sync_state:
+                self._update_sync_state(sync_state, seen_log)
             print(f"\nSuccessfully downloaded all media from @{username}!")
 
-            # Count downloaded files
-            media_files = list(account_dir.glob("*"))
-            media_count = len([f for f in media_files if f.suffix.lower() in ['.mp4', '.jpg', '.jpeg', '.png', '.webm']])
-            print(f"Total media files downloaded: {media_count}")
+            print(f"Total media files downloaded: {self._count_media(account_dir)}")
 
         except subprocess.CalledProcessError as e:
             print(f"Download failed: {e}")
@@ -283,18 +978,127 @@ class InstagramDownloader(MediaDownloader):
             print("  --cookies-from-browser chrome  (or firefox, safari, edge, etc.)")
             print("  --cookies /path/to/cookies.txt")
             sys.exit(1)
+        finally:
+            tracker.collect()
+            tracker.cleanup()
+            tracker.queue.close()
+            if seen_log:
+                os.unlink(seen_log)
+
+    @staticmethod
+    def _is_throttled(error):
+        """Check whether an instaloader error is Instagram rate limiting"""
+        import instaloader
+        too_many = getattr(instaloader.exceptions, 'TooManyRequestsException', ())
+        return isinstance(error, too_many) or '429' in str(error)
+
+    @staticmethod
+    def _post_files(account_dir, post, extensions=('.jpg', '.mp4', '.json', '.txt')):
+        """Files instaloader wrote for a post ({date:%Y%m%d}_{mediaid} naming) that exist"""
+        prefix = f"{post.date_utc:%Y%m%d}_{post.mediaid}"
+        names = [prefix]
+        mediacount = getattr(post, 'mediacount', 1)
+        if mediacount > 1:
+            names.extend(f"{prefix}_{i}" for i in range(1, mediacount + 1))
+        return [account_dir / (name + ext) for name in names for ext in extensions
+                if os.path.exists(account_dir / (name + ext))]
+
+    @classmethod
+    def _post_bytes(cls, account_dir, post):
+        """Size of the files instaloader wrote for a post"""
+        total = 0
+        for path in cls._post_files(account_dir, post):
+            try:
+                total += os.stat(path).st_size
+            except OSError:
+                pass
+        return total
+
+    @staticmethod
+    def _rate_controller(instaloader, limiter):
+        """Instaloader RateController class that also paces queries through the shared host limiter"""
+        base = getattr(instaloader, 'RateController', None)
+        if base is None:
+            return None
+
+        class SharedRateController(base):
+            def wait_before_query(self, query_type):
+                limiter.acquire()
+                super().wait_before_query(query_type)
+
+            def handle_429(self, query_type):
+                limiter.throttled()
+                super().handle_429(query_type)
+
+        return SharedRateController
+
+    def _download_post(self, L, post, target, limiter, account_dir=None):
+        """Download one post, slowing down all workers when Instagram throttles us
+
+        Returns the time spent downloading, excluding rate limiter and retry waits.
+        """
+        elapsed = 0.0
+        attempt = 0
+        while True:
+            with span("rate limit wait"):
+                limiter.acquire()
+            start = time.monotonic()
+            try:
+                with span("instaloader post", shortcode=post.shortcode):
+                    L.download_post(post, target=target)
+                elapsed += time.monotonic() - start
+                limiter.succeeded()
+                break
+            except Exception as e:
+                kind = 'throttled' if self._is_throttled(e) else classify_error([str(e)])
+                if not self.retry.should_retry(attempt, kind):
+                    raise
+                delay = self.retry.delay(attempt, kind)
+                attempt += 1
+                if kind == 'throttled':
+                    rate = limiter.throttled(pause=delay)
+                    print(f"Rate limited by Instagram, slowing to {rate:.2f} posts/s and pausing for {delay:.0f}s")
+                else:
+                    print(f"Transient error on post {post.shortcode}, retrying in {delay:.0f}s: {e}")
+                    time.sleep(delay)
+        if account_dir:
+            self._record_outputs(self._post_files(account_dir, post, extensions=('.jpg', '.mp4')),
+                                 ('instagram', post.shortcode), getattr(post, 'video_duration', None))
+        if self.archive:
+            self.archive.add('instagram', post.shortcode)
+        return elapsed
+
+    def _update_sync_state(self, sync_state, seen_log):
+        """Advance the sync state from yt-dlp's "<id> <timestamp>" log"""
+        with open(seen_log, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1].isdigit():
+                    sync_state.observe(parts[0], datetime.fromtimestamp(int(parts[1]), timezone.utc))
+        sync_state.save()
 
     def download(self, url, audio_only=True, format="wav", keep_video=False, extra_args=None):
         """Download Instagram media"""
-        if not self.is_instagram_url(url):
+        route = route_url(url)
+        if route.platform != 'instagram':
             raise ValueError("Not a valid Instagram URL")
 
         # Check if this is a profile URL
-        if self.is_profile_url(url):
+        if route.kind == 'profile':
             # For profiles, always download video and ignore audio-only settings
             self.download_profile(url, video=True, extra_args=extra_args)
             return
 
+        if self._is_archived(url, extra_args):
+            print(f"Already downloaded, skipping: {url}")
+            return
+        if self._is_indexed(url, audio_only, format, extra_args):
+            return
+
+        if audio_only and self._try_stream_audio(url, format, keep_video, extra_args,
+                                                 single_item=media_key_from_url(url) is not None):
+            return
+
         # Original single post/reel/story download logic
         output_template = str(self.output_dir / "%(title)s.%(ext)s")
 
@@ -304,26 +1108,25 @@ class InstagramDownloader(MediaDownloader):
         if extra_args:
             cmd.extend(extra_args)
 
+        cmd.extend(self._archive_args())
+        cmd.extend(self._transfer_args(url))
+
         # Instagram-specific options
         # For stories, download all items in the story
         if '/stories/' not in url:
             cmd.extend(["--no-playlist"])
 
         # Only add format options if not listing formats
-        if not extra_args or "--list-formats" not in extra_args:
-            if audio_only:
-                cmd.extend(["-x", "--audio-format", format])
-                if keep_video:
-                    cmd.append("-k")
-            else:
-                # Download best quality video+audio, merge if needed
-                cmd.extend(["-f", "bestvideo+bestaudio/best"])
+        listing_formats = extra_args and "--list-formats" in extra_args
+        if not listing_formats:
+            cmd.extend(self._format_args(audio_only, format, keep_video))
 
-        cmd.extend(["-o", output_template, url])
+        cmd.extend(["-o", output_template] + self._source_args(url, extra_args))
 
         print(f"Downloading from Instagram: {url}")
         try:
-            subprocess.run(cmd, check=True)
+            self._run_yt_dlp(cmd, url, audio_format=format if audio_only and not listing_formats else None,
+                             keep_video=keep_video)
             print("Download completed successfully!")
         except subprocess.CalledProcessError as e:
             print(f"Download failed: {e}")
@@ -337,72 +1140,458 @@ class InstagramDownloader(MediaDownloader):
 class UniversalDownloader:
     """Main downloader that delegates to platform-specific downloaders"""
     
-    def __init__(self, output_dir="downloads"):
-        self.downloaders = {
-            'youtube': YouTubeDownloader(output_dir),
-            'instagram': InstagramDownloader(output_dir)
+    DOWNLOADER_CLASSES = {
+        'youtube': YouTubeDownloader,
+        'instagram': InstagramDownloader
+    }
+
+    def __init__(self, output_dir="downloads", archive=None, incremental=False, in_process=False,
+                 post_workers=4, post_rate=2.0, session_pool=None, playlist_workers=0, **options):
+        self.output_dir = Path(output_dir)
+        self.archive = archive
+        # Settings shared by every platform downloader (see MediaDownloader.__init__)
+        self.options = dict(options, archive=archive)
+        # One set of per-host limiters, so every downloader and worker paces the same hosts together
+        self.rate_limiters = self.options.setdefault('rate_limiters', HostRateLimiters())
+        self.postprocess_pool = self.options.get('postprocess_pool')
+        self.instagram_options = {
+            'incremental': incremental,
+            'post_workers': post_workers,
+            'post_rate': post_rate,
+            'session_pool': session_pool
         }
+        self.youtube_options = {'playlist_workers': playlist_workers}
+        self.in_process = in_process
+        self.engine = None
+        # Downloaders are built on first use so only the platform in use pays for setup
+        self.downloaders = {}
+        self._lock = threading.Lock()
+
+    def get_downloader(self, platform):
+        """Return the downloader for a platform, creating it on first use"""
+        with self._lock:
+            if platform not in self.downloaders:
+                start = time.perf_counter()
+                kwargs = dict(self.options)
+                if platform == 'instagram':
+                    kwargs.update(self.instagram_options)
+                elif platform == 'youtube':
+                    kwargs.update(self.youtube_options)
+                downloader = self.DOWNLOADER_CLASSES[platform](self.output_dir, **kwargs)
+                if self.in_process:
+                    downloader.engine = self._get_engine(downloader.yt_dlp_path)
+                record_startup(f"init {platform} downloader", start)
+                self.downloaders[platform] = downloader
+            return self.downloaders[platform]
+
+    def _get_engine(self, yt_dlp_path):
+        """Load the in-process yt-dlp engine shared by all downloaders"""
+        if self.engine is None:
+            start = time.perf_counter()
+            module = load_yt_dlp(shutil.which(yt_dlp_path) or yt_dlp_path)
+            record_startup("load yt_dlp module", start)
+            if module is None:
+                print("yt_dlp module not importable, using yt-dlp subprocesses instead")
+                self.in_process = False
+                return None
+            self.engine = YtDlpEngine(module)
+        return self.engine
     
+    def probe(self, url, extra_args=None):
+        """Return yt-dlp's info JSON for url, from the probe cache when fresh"""
+        probe_cache = self.options.get('probe_cache') or ProbeCache(ttl=0)
+        return probe_cache.probe(self.get_downloader('youtube').yt_dlp_path, url, extra_args)
+
     def detect_platform(self, url):
         """Detect which platform the URL belongs to"""
-        for name, downloader in self.downloaders.items():
-            if name == 'youtube' and downloader.is_youtube_url(url):
-                return 'youtube'
-            elif name == 'instagram' and downloader.is_instagram_url(url):
-                return 'instagram'
-        
-        # Try generic yt-dlp as fallback
-        return 'generic'
+        # Unrecognized hosts route to 'generic' (yt-dlp fallback)
+        return route_url(url).platform
     
     def download(self, url, audio_only=True, format="wav", platform=None, keep_video=False, extra_args=None):
         """Download media from any supported platform"""
+        with TRACER.url(url):
+            self._download(url, audio_only, format, platform, keep_video, extra_args)
+
+    def _download(self, url, audio_only, format, platform, keep_video, extra_args):
         if platform is None:
             platform = self.detect_platform(url)
         
         if platform == 'generic':
             print(f"Platform not specifically supported, trying generic download...")
             # Use YouTube downloader as generic since it uses yt-dlp
-            downloader = self.downloaders['youtube']
+            downloader = self.get_downloader('youtube')
+
+            # Generic URLs have no known media id before extraction, so key them by URL
+            listing_formats = extra_args and "--list-formats" in extra_args
+            if self.archive and not listing_formats and self.archive.has('url', url):
+                print(f"Already downloaded, skipping: {url}")
+                return
+
+            if audio_only and downloader._try_stream_audio(url, format, keep_video, extra_args,
+                                                           single_item=is_direct_media_url(url)):
+                if self.archive:
+                    self.archive.add('url', url)
+                return
             # Override the URL check for generic downloads
-            output_template = str(Path("downloads") / "%(title)s.%(ext)s")
+            output_template = str(self.output_dir / "%(title)s.%(ext)s")
             
             cmd = [downloader.yt_dlp_path]
             
             # Add extra arguments first if provided
             if extra_args:
                 cmd.extend(extra_args)
+
+            cmd.extend(downloader._archive_args())
+            cmd.extend(downloader._transfer_args(url))
             
             # Only add format options if not listing formats
-            if not extra_args or "--list-formats" not in extra_args:
-                if audio_only:
-                    cmd.extend(["-x", "--audio-format", format])
-                    if keep_video:
-                        cmd.append("-k")
-                else:
-                    # Download best quality video+audio, merge if needed
-                    cmd.extend(["-f", "bestvideo+bestaudio/best"])
+            if not listing_formats:
+                cmd.extend(downloader._format_args(audio_only, format, keep_video))
             
-            cmd.extend(["-o", output_template, url])
+            cmd.extend(["-o", output_template] + downloader._source_args(url, extra_args))
             
             try:
-                subprocess.run(cmd, check=True)
+                downloader._run_yt_dlp(cmd, url, audio_format=format if audio_only and not listing_formats else None,
+                                       keep_video=keep_video)
+                if self.archive and not listing_formats:
+                    self.archive.add('url', url)
                 print("Download completed successfully!")
             except subprocess.CalledProcessError as e:
                 print(f"Download failed: {e}")
                 sys.exit(1)
         else:
-            if platform not in self.downloaders:
+            if platform not in self.DOWNLOADER_CLASSES:
                 raise ValueError(f"Platform '{platform}' not supported")
             
-            downloader = self.downloaders[platform]
+            downloader = self.get_downloader(platform)
             downloader.download(url, audio_only, format, keep_video, extra_args)
 
 
+def run_batch(downloader, args, extra_args):
+    """Download every URL from the batch file through a bounded worker pool"""
+    from batch import BatchRunner, read_jobs, parse_platform_limits, print_summary
+
+    try:
+        jobs = read_jobs(args.batch_file)
+        platform_limits = parse_platform_limits(args.platform_jobs)
+        bandwidth = parse_size(args.bandwidth) if args.bandwidth else None
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.url:
+        jobs.insert(0, (args.url, args.priority))
+    if not jobs:
+        print("Error: no URLs to download")
+        sys.exit(1)
+    urls = [url for url, _ in jobs]
+
+    estimator = None
+    if args.shortest_first:
+        probe_cache = downloader.options.get('probe_cache')
+        if probe_cache:
+            yt_dlp_path = downloader.get_downloader('youtube').yt_dlp_path
+
+            def probe(url):
+                downloader.rate_limiters.for_url(url).acquire()
+                return probe_cache.probe(yt_dlp_path, url, extra_args)
+            estimator = SizeEstimator(probe, audio_only=not args.video)
+        else:
+            print("Warning: --shortest-first needs the probe cache (--probe-ttl > 0); keeping batch order")
+
+    print(f"Starting batch of {len(urls)} URLs with up to {args.jobs} concurrent downloads")
+    if bandwidth:
+        print(f"Sharing {format_bytes(bandwidth)}/s between the running downloads")
+    runner = BatchRunner(downloader, max_workers=max(1, args.jobs), platform_limits=platform_limits,
+                         budget=BandwidthBudget(bandwidth) if bandwidth else None, estimator=estimator)
+    start = time.monotonic()
+    try:
+        results = runner.run(
+            urls,
+            platform=args.platform,
+            extra_args=extra_args,
+            priorities=[priority for _, priority in jobs],
+            audio_only=not args.video,
+            format=args.format,
+            keep_video=args.keep_video
+        )
+    except KeyboardInterrupt:
+        print("\nBatch cancelled by user")
+        sys.exit(1)
+    stages = [runner.metrics]
+    if downloader.postprocess_pool:
+        stages.append(downloader.postprocess_pool.metrics)
+    print_summary(results, time.monotonic() - start, rates=downloader.rate_limiters.report(), stages=stages)
+
+    if any(r.status != 'ok' for r in results):
+        sys.exit(1)
+
+
+# Longest pause of an idle worker between claims, and how many times in a row
+# it tries to reach the queue before giving up
+WORKER_IDLE_MAX = 5
+WORKER_UNREACHABLE_TRIES = 6
+
+
+def run_coordinator(args):
+    """Queue the batch's URLs and serve them to workers until every job is done or failed"""
+    from batch import BatchResult, read_urls, print_summary
+    from work_queue import SQLiteWorkQueue, WorkQueueServer, WORK_DB_NAME, DEFAULT_BROKER_PORT
+
+    urls = [args.url] if args.url else []
+    if args.batch_file:
+        try:
+            urls.extend(read_urls(args.batch_file))
+        except OSError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    host, _, port = args.coordinator.rpartition(':')
+    if not port.isdigit():
+        host, port = args.coordinator, DEFAULT_BROKER_PORT
+
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    queue = SQLiteWorkQueue(args.queue_db or Path(args.output_dir) / WORK_DB_NAME)
+    options = {'audio_only': not args.video, 'format': args.format, 'keep_video': args.keep_video}
+    added = queue.enqueue(urls, platform=args.platform, options=options)
+    server = WorkQueueServer((host or '127.0.0.1', int(port)), queue)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Queued {added} new URLs ({len(urls) - added} already known); "
+          f"serving workers at http://{host or '127.0.0.1'}:{port}")
+
+    start = time.monotonic()
+    try:
+        last = None
+        while not queue.drained():
+            counts = queue.counts()
+            if counts != last:
+                print("  " + ", ".join(f"{state}: {n}" for state, n in sorted(counts.items())), flush=True)
+                last = counts
+            time.sleep(1)
+        # Give idle workers a chance to see the queue drained before it goes away
+        time.sleep(WORKER_IDLE_MAX + 1)
+    except KeyboardInterrupt:
+        print("\nCoordinator stopped; workers keep their current jobs and the queue resumes on restart")
+        sys.exit(1)
+    finally:
+        server.shutdown()
+
+    results = []
+    for job in queue.jobs():
+        result = BatchResult(job['id'], job['url'], job['platform'])
+        result.status = 'ok' if job['state'] == 'done' else 'failed'
+        result.error = job['error']
+        info = job['result'] or {}
+        result.elapsed = info.get('elapsed', 0.0)
+        result.bytes_written = info.get('bytes', 0)
+        results.append(result)
+    queue.close()
+    print_summary(results, time.monotonic() - start)
+    if any(r.status != 'ok' for r in results):
+        sys.exit(1)
+
+
+def run_worker(downloader, args, extra_args):
+    """Claim jobs from a coordinator (or a local queue file) and download them until the queue is drained"""
+    from batch import BatchResult, BatchRunner, print_summary
+    from job_queue import worker_id
+    from work_queue import QueueBusyError, open_work_queue
+
+    queue = open_work_queue(args.worker)
+    worker = worker_id()
+    jobs = max(1, args.jobs)
+    runner = BatchRunner(downloader, max_workers=jobs)
+    results = []
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(60):
+            try:
+                queue.heartbeat(worker)
+            except OSError as e:
+                print(f"Warning: heartbeat to {args.worker} failed: {e}")
+
+    def work():
+        idle = 0
+        unreachable = 0
+        while not stop.is_set():
+            try:
+                job = queue.claim(worker)
+                unreachable = 0
+                if job is None:
+                    if queue.drained():
+                        return
+                    # Other workers hold the remaining partitions or jobs; they may finish or vanish
+                    time.sleep(min(WORKER_IDLE_MAX, 2 ** idle))
+                    idle += 1
+                    continue
+            except QueueBusyError:
+                # The coordinator is up but could not answer this time; not a sign it is gone
+                time.sleep(min(WORKER_IDLE_MAX, 2 ** idle))
+                idle += 1
+                continue
+            except OSError as e:
+                unreachable += 1
+                if unreachable > WORKER_UNREACHABLE_TRIES:
+                    print(f"Queue {args.worker} is gone ({e}), stopping")
+                    return
+                time.sleep(5)
+                continue
+            idle = 0
+            runner.metrics.queued()
+            result = runner.run_one(BatchResult(job['id'], job['url'], job['platform']), extra_args, job['options'])
+            results.append(result)
+            report = {'elapsed': round(result.elapsed, 3), 'bytes': result.bytes_written, 'files': result.files}
+            for attempt in range(WORKER_UNREACHABLE_TRIES):
+                try:
+                    if result.status == 'ok':
+                        queue.complete(job['id'], worker, report)
+                    else:
+                        queue.fail(job['id'], worker, result.error, report)
+                    break
+                except QueueBusyError:
+                    time.sleep(min(WORKER_IDLE_MAX, 2 ** attempt))
+                except OSError as e:
+                    print(f"Warning: could not report {job['url']}: {e}")
+                    break
+            else:
+                print(f"Warning: could not report {job['url']}: {args.worker} stayed busy")
+
+    print(f"Worker {worker} taking jobs from {args.worker} with {jobs} concurrent downloads")
+    threading.Thread(target=heartbeat, daemon=True).start()
+    start = time.monotonic()
+    threads = [threading.Thread(target=work) for _ in range(jobs)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        print("\nWorker stopping; unfinished jobs go back to the queue")
+        stop.set()
+        sys.exit(1)
+    finally:
+        stop.set()
+        try:
+            queue.release(worker)
+        except OSError:
+            pass
+    if not results:
+        print("No jobs left for this worker")
+        return
+    print_summary(results, time.monotonic() - start, rates=downloader.rate_limiters.report(), stages=[runner.metrics])
+
+
+def run_probe(downloader, args, extra_args):
+    """Print one line of info JSON per URL, extracting only what is not cached"""
+    urls = [args.url] if args.url else []
+    if args.batch_file:
+        from batch import read_urls
+        try:
+            urls.extend(read_urls(args.batch_file))
+        except OSError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    failed = False
+    for url in urls:
+        try:
+            print(downloader.probe(url, extra_args), flush=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Probe failed for {url}: {e}", file=sys.stderr)
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+def run_index_command(args):
+    """Rebuild the output directory's index from disk, or list what it holds"""
+    index = MediaIndex(args.output_dir)
+    try:
+        if args.index_rebuild:
+            start = time.monotonic()
+            indexed, removed = index.rebuild()
+            print(f"Indexed {indexed} files in {args.output_dir} ({removed} stale entries removed) "
+                  f"in {time.monotonic() - start:.1f}s")
+        if args.index_list:
+            total = 0
+            for path, media_key, size, sha256, duration in index.entries():
+                total += size
+                length = f"{duration:.0f}s" if duration else "-"
+                print(f"{media_key or '-':<32} {size / (1024 * 1024):>9.1f} MB {length:>7}  {path}")
+            print(f"\n{index.count(extensions=None)} files, {total / (1024 * 1024):.1f} MB")
+    finally:
+        index.close()
+
+
+def run_dedupe_report(args):
+    """List files with identical content in the output directory; with --dedupe, link them"""
+    groups = find_duplicates(args.output_dir)
+    if not groups:
+        print(f"No duplicate files in {args.output_dir}")
+        return
+
+    store = ContentStore(args.output_dir) if args.dedupe else None
+    reclaimable = 0
+    for size, paths in groups:
+        reclaimable += size * (len(paths) - 1)
+        print(f"{len(paths)} copies, {size / (1024 * 1024):.1f} MB each:")
+        for path in paths:
+            print(f"  {path}")
+            if store:
+                try:
+                    store.ingest(path)
+                except OSError as e:
+                    print(f"  Warning: could not deduplicate {path}: {e}")
+
+    action = "Reclaimed" if store else "Reclaimable with --dedupe"
+    print(f"\n{len(groups)} duplicate groups. {action}: {reclaimable / (1024 * 1024):.1f} MB")
+
+
+def print_startup_profile(total):
+    """Print the startup phase timings collected so far"""
+    print("\nStartup profile")
+    print("=" * 50)
+    for phase, elapsed in STARTUP_TIMINGS:
+        print(f"  {phase:<36} {elapsed * 1000:>8.1f} ms")
+    print(f"  {'total':<36} {total * 1000:>8.1f} ms\n")
+
+
+def start_tracing(args):
+    """Record phase spans (and run cProfile with --profile); results are written when the process exits"""
+    TRACER.enable()
+    profiler = None
+    if args.profile:
+        profiler = ThreadProfiler()
+        profiler.start()
+
+    def finish():
+        if profiler:
+            stats = profiler.stop()
+            print(ThreadProfiler.report(stats), file=sys.stderr)
+            try:
+                stats.dump_stats(args.profile_output)
+                print(f"cProfile stats saved to {args.profile_output}", file=sys.stderr)
+            except OSError as e:
+                print(f"Warning: could not save cProfile stats: {e}", file=sys.stderr)
+            TRACER.print_summary(sys.stderr)
+        if args.trace:
+            try:
+                if args.trace_format == 'chrome':
+                    TRACER.write_chrome_trace(args.trace)
+                else:
+                    TRACER.write_json(args.trace)
+            except OSError as e:
+                print(f"Warning: could not write trace: {e}", file=sys.stderr)
+
+    atexit.register(finish)
+
+
 def main():
+    main_start = time.perf_counter()
     parser = argparse.ArgumentParser(
         description="Download media from various platforms (YouTube, Instagram, etc.)"
     )
-    parser.add_argument("url", help="URL of the media to download")
+    parser.add_argument("url", nargs="?", help="URL of the media to download")
     parser.add_argument(
         "-v", "--video", 
         action="store_true", 
@@ -430,25 +1619,320 @@ def main():
     )
     parser.add_argument(
         "--cookies",
-        help="Path to cookies file (useful for Instagram)"
+        action="append",
+        help="Path to cookies file (useful for Instagram); repeat to rotate Instagram profile "
+             "downloads between several accounts"
     )
     parser.add_argument(
         "--cookies-from-browser",
         help="Browser to extract cookies from (brave, chrome, chromium, edge, firefox, opera, safari, vivaldi, whale)"
     )
+    parser.add_argument(
+        "--archive",
+        metavar="FILE",
+        help="Download archive file; media already recorded in it is skipped"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch Instagram profile posts newer than the last completed sync"
+    )
+    parser.add_argument(
+        "--post-workers",
+        type=int,
+        default=4,
+        help="Instagram posts downloaded in parallel during profile downloads (default: 4)"
+    )
+    parser.add_argument(
+        "--post-rate",
+        type=float,
+        default=2.0,
+        help="Maximum Instagram post downloads started per second, shared by all workers (default: 2)"
+    )
+    parser.add_argument(
+        "--playlist-workers",
+        type=int,
+        default=0,
+        metavar="N",
+        help="List YouTube playlists and channels once, then download N videos at a time, "
+             "named by playlist index (default: 0, one yt-dlp run downloads them in order)"
+    )
+    parser.add_argument(
+        "--progress-json",
+        action="store_true",
+        help="Emit one JSON progress event per line on stdout (other yt-dlp output goes to stderr)"
+    )
+    parser.add_argument(
+        "--stream-audio",
+        action="store_true",
+        help="Pipe the best audio stream into ffmpeg while it downloads instead of converting afterwards"
+    )
+    parser.add_argument(
+        "-N", "--concurrent-fragments",
+        metavar="N|auto",
+        help="Download this many HLS/DASH fragments in parallel; 'auto' tunes the level per host"
+    )
+    parser.add_argument(
+        "--http-chunk-size",
+        metavar="SIZE",
+        help="Download progressive files in HTTP range chunks of this size, e.g. 10M"
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run yt-dlp as a library inside this process instead of one subprocess per URL"
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Print how long each startup phase took before downloading"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write timed phases (probe, extract, transfer, ffmpeg, ...) of every URL to FILE on exit"
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=["json", "chrome"],
+        default="json",
+        help="--trace output: spans and per-URL totals as JSON (default), or Chrome trace events "
+             "for chrome://tracing and Perfetto"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run under cProfile (all threads) and print the top functions and a per-URL phase breakdown "
+             "on exit; stats are saved to --profile-output"
+    )
+    parser.add_argument(
+        "--profile-output",
+        default="media-downloader.prof",
+        metavar="FILE",
+        help="Where --profile saves its cProfile stats (default: media-downloader.prof)"
+    )
+    parser.add_argument(
+        "--postprocess-workers",
+        type=int,
+        metavar="N",
+        help="Extract audio in a pool of N ffmpeg workers while the next downloads run "
+             "(default: one per CPU core, 0 lets yt-dlp convert after each download)"
+    )
+    parser.add_argument(
+        "--index-rebuild",
+        action="store_true",
+        help="Rebuild the output directory's file index from disk and exit"
+    )
+    parser.add_argument(
+        "--index-list",
+        action="store_true",
+        help="List the files in the output directory's index (media id, size, duration) and exit"
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Keep identical downloads once: hash finished files and hardlink copies to a "
+             "content store in the output directory"
+    )
+    parser.add_argument(
+        "--dedupe-report",
+        action="store_true",
+        help="List duplicate files in the output directory and exit (with --dedupe, link them)"
+    )
+    parser.add_argument(
+        "--scratch-dir",
+        metavar="DIR",
+        help="Download and convert in DIR (e.g. a tmpfs or local SSD) and move finished files into the "
+             "output directory; partial files never reach it"
+    )
+    parser.add_argument(
+        "--min-free",
+        metavar="SIZE",
+        help="Free space to keep on the output and scratch volumes, e.g. 5G; downloads wait while the "
+             "disk is short and fail up front when their expected size cannot fit"
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Retries per download after throttling or transient network errors (default: 3)"
+    )
+    parser.add_argument(
+        "--host-rate",
+        action="append",
+        metavar="HOST=RATE",
+        help="Starting request rate per second for a host, e.g. instagram.com=0.5; "
+             "adapted down on throttling and back up on success (can be repeated)"
+    )
+    parser.add_argument(
+        "--probe",
+        action="store_true",
+        help="Print yt-dlp's info JSON for the URL(s) instead of downloading; cached for later downloads"
+    )
+    parser.add_argument(
+        "--probe-ttl",
+        type=int,
+        default=3600,
+        metavar="SECONDS",
+        help="How long probed metadata is reused by --probe and downloads (default: 3600, 0 disables)"
+    )
+    parser.add_argument(
+        "-b", "--batch-file",
+        help="File with one URL per line to download concurrently ('-' reads from stdin)"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent downloads in batch mode (default: 4)"
+    )
+    parser.add_argument(
+        "--coordinator",
+        metavar="[HOST:]PORT",
+        help="Queue the URL/batch file and hand it out to --worker processes on other machines "
+             "(e.g. 0.0.0.0:8642; no authentication, use on trusted networks only)"
+    )
+    parser.add_argument(
+        "--queue-db",
+        help="Coordinator queue file (default: <output dir>/.work.sqlite); rerunning resumes it"
+    )
+    parser.add_argument(
+        "--worker",
+        metavar="QUEUE",
+        help="Download jobs from a coordinator (http://host:port) or a local queue file, -j at a time; "
+             "jobs of one account stay on one worker"
+    )
+    parser.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Batch priority of the URL given on the command line (default: 0); higher starts first and "
+             "gets a larger bandwidth share. Batch file lines take one as 'URL N'"
+    )
+    parser.add_argument(
+        "--shortest-first",
+        action="store_true",
+        help="In batch mode, probe single videos in the background and start the smallest expected "
+             "downloads first (within a priority)"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        metavar="RATE",
+        help="Total download rate for batch mode, e.g. 20M (bytes/s); each download gets a --limit-rate "
+             "share weighted by priority"
+    )
+    parser.add_argument(
+        "--platform-jobs",
+        action="append",
+        metavar="PLATFORM=N",
+        help="Per-platform concurrency limit in batch mode, e.g. instagram=1 (can be repeated)"
+    )
     
     # Parse known args and collect remaining as extra args for yt-dlp
     args, extra_args = parser.parse_known_args()
+
+    # stdout carries JSON events only; messages, summaries and tool output go to stderr
+    progress = ProgressReporter(reserve_stdout()) if args.progress_json else None
+
+    if args.trace or args.profile:
+        start_tracing(args)
+
+    fragments = args.concurrent_fragments
+    if fragments and fragments != 'auto' and (not fragments.isdigit() or int(fragments) < 1):
+        parser.error("--concurrent-fragments must be a positive number or 'auto'")
+
+    if args.dedupe_report:
+        run_dedupe_report(args)
+        return
+
+    if args.index_rebuild or args.index_list:
+        run_index_command(args)
+        return
+
+    if args.coordinator:
+        if not args.url and not args.batch_file:
+            parser.error("--coordinator needs a URL or --batch-file to queue")
+        run_coordinator(args)
+        return
+
+    if not args.url and not args.batch_file and not args.worker:
+        parser.error("a URL or --batch-file is required")
+
+    if args.post_rate <= 0:
+        parser.error("--post-rate must be a positive number")
+
+    try:
+        host_rates = parse_host_rates(args.host_rate)
+        min_free = parse_size(args.min_free) if args.min_free else 0
+    except ValueError as e:
+        parser.error(str(e))
     
-    # Add cookies to extra_args if provided
+    # Add cookies to extra_args if provided; yt-dlp takes a single cookie jar
     if args.cookies:
-        extra_args.extend(["--cookies", args.cookies])
+        extra_args.extend(["--cookies", args.cookies[0]])
     
     # Add cookies-from-browser to extra_args if provided
     if args.cookies_from_browser:
         extra_args.extend(["--cookies-from-browser", args.cookies_from_browser])
     
-    downloader = UniversalDownloader(args.output_dir)
+    archive = DownloadArchive(args.archive) if args.archive else None
+    disk_guard = None
+    if args.min_free or args.scratch_dir:
+        volumes = [args.output_dir] + ([args.scratch_dir] if args.scratch_dir else [])
+        disk_guard = DiskGuard(volumes, min_free=min_free)
+    postprocess_pool = None
+    if not args.video and args.postprocess_workers != 0:
+        ffmpeg_path = resolve_tool("ffmpeg")
+        if ffmpeg_path:
+            # Batch runs collect conversions at the end so download slots never wait on ffmpeg
+            postprocess_pool = PostProcessPool(ffmpeg_path, workers=args.postprocess_workers,
+                                               background=bool(args.batch_file))
+    downloader = UniversalDownloader(
+        args.output_dir,
+        archive=archive,
+        incremental=args.incremental,
+        in_process=args.in_process,
+        post_workers=args.post_workers,
+        post_rate=args.post_rate,
+        session_pool=SessionPool(args.cookies) if args.cookies else None,
+        playlist_workers=args.playlist_workers,
+        progress=progress,
+        stream_audio=args.stream_audio,
+        concurrent_fragments=fragments,
+        http_chunk_size=args.http_chunk_size,
+        fragment_tuner=FragmentTuner() if fragments == 'auto' else None,
+        probe_cache=ProbeCache(ttl=args.probe_ttl) if args.probe_ttl > 0 else None,
+        rate_limiters=HostRateLimiters(rates=host_rates),
+        retry=RetryScheduler(max_retries=max(0, args.max_retries)),
+        content_store=ContentStore(args.output_dir) if args.dedupe else None,
+        postprocess_pool=postprocess_pool,
+        media_index=MediaIndex(args.output_dir),
+        staging=ScratchStaging(args.scratch_dir) if args.scratch_dir else None,
+        disk_guard=disk_guard
+    )
+
+    if args.startup_profile:
+        # Do the setup the first download would do, so it can be reported up front
+        platform = args.platform
+        if not platform and args.url:
+            start = time.perf_counter()
+            platform = downloader.detect_platform(args.url)
+            record_startup("detect platform", start)
+        downloader.get_downloader(platform if platform in downloader.DOWNLOADER_CLASSES else 'youtube')
+        print_startup_profile(time.perf_counter() - main_start)
+
+    if args.probe:
+        run_probe(downloader, args, extra_args)
+        return
+
+    if args.worker:
+        run_worker(downloader, args, extra_args)
+        return
+
+    if args.batch_file:
+        run_batch(downloader, args, extra_args)
+        return
     
     try:
         downloader.download(
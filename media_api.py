@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Library API: asyncio downloads that return structured results instead of printing and exiting
+
+    import asyncio
+    from media_api import Downloader, DownloadError
+
+    async def main():
+        downloader = Downloader("downloads", max_concurrency=50)
+        try:
+            result = await downloader.download("https://youtu.be/VIDEO_ID", format="mp3", timeout=600)
+            for media in result.files:
+                print(media.media_id, media.path, media.size, media.duration)
+        except DownloadError as e:
+            print(e.kind, e)
+
+    asyncio.run(main())
+
+Every download is a yt-dlp subprocess driven by asyncio.create_subprocess_exec,
+so one event loop can run hundreds of them. Cancelling the task or hitting
+the timeout kills the subprocess.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+import weakref
+from collections import deque
+from pathlib import Path
+
+from archive import DownloadArchive, media_key_from_url
+from media_index import FINISHED_FILE_TEMPLATE, parse_finished_line
+from ratelimit import HostRateLimiters, RetryScheduler, classify_error
+from tools import resolve_tool
+from url_router import route_url
+
+
+# yt-dlp stderr lines kept per run to classify failures
+ERROR_TAIL_LINES = 20
+
+# Seconds a cancelled or timed out yt-dlp gets to exit before it is killed
+TERMINATE_GRACE = 5.0
+
+# Error substrings for failures that a retry will not fix, by DownloadError kind
+ERROR_KINDS = (
+    ('unsupported', ('unsupported url',)),
+    ('unavailable', ('video unavailable', 'private video', 'http error 404', 'has been removed',
+                     'not available', 'does not exist')),
+    ('auth', ('sign in to confirm', 'login required', 'requested content is not available',
+              'use --cookies', 'http error 401', 'http error 403')),
+)
+
+
+def classify_failure(lines):
+    """DownloadError kind for yt-dlp stderr lines: throttled, transient, unsupported, unavailable, auth or failed"""
+    kind = classify_error(lines)
+    if kind:
+        return kind
+    text = '\n'.join(line.lower() for line in lines if line.startswith('ERROR'))
+    for name, markers in ERROR_KINDS:
+        if any(marker in text for marker in markers):
+            return name
+    return 'failed'
+
+
+class DownloadError(Exception):
+    """A download that did not complete
+
+    kind is one of 'throttled', 'transient', 'unsupported', 'unavailable',
+    'auth', 'timeout', 'missing-tool' or 'failed'. result holds whatever was
+    downloaded before the failure (e.g. part of a playlist).
+    """
+
+    def __init__(self, message, kind='failed', url=None, returncode=None, stderr=None, result=None):
+        super().__init__(message)
+        self.kind = kind
+        self.url = url
+        self.returncode = returncode
+        self.stderr = stderr or []
+        self.result = result
+
+
+class MediaFile:
+    """One file written by a download"""
+
+    def __init__(self, path, size, media_id=None, duration=None):
+        self.path = path
+        self.size = size
+        self.media_id = media_id
+        self.duration = duration
+
+    def __repr__(self):
+        return f"MediaFile({self.path!r}, size={self.size}, media_id={self.media_id!r}, duration={self.duration})"
+
+
+class DownloadResult:
+    """Outcome of one URL: the files written, timing, and the error if it failed"""
+
+    def __init__(self, url, platform):
+        self.url = url
+        self.platform = platform
+        self.files = []
+        self.elapsed = 0.0
+        self.attempts = 0
+        self.skipped = False
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def total_bytes(self):
+        return sum(media.size for media in self.files)
+
+    def __repr__(self):
+        status = f"error={self.error.kind!r}" if self.error else f"files={len(self.files)}"
+        return f"DownloadResult({self.url!r}, {status})"
+
+
+class Downloader:
+    """Concurrent yt-dlp downloads on an asyncio event loop
+
+    Shares the CLI's building blocks: per-host adaptive rate limits, retries
+    with backoff for throttled and transient failures, the download archive
+    and the output directory index. Nothing is printed; yt-dlp's stderr is
+    kept on the DownloadError.
+    """
+
+    def __init__(self, output_dir="downloads", yt_dlp_path=None, max_concurrency=16, archive=None,
+                 media_index=None, rate_limiters=None, retry=None, extra_args=None):
+        self.output_dir = Path(output_dir)
+        self.yt_dlp_path = yt_dlp_path
+        self.max_concurrency = max(1, max_concurrency)
+        self.archive = archive
+        self.media_index = media_index
+        self.rate_limiters = rate_limiters or HostRateLimiters()
+        self.retry = retry or RetryScheduler()
+        self.extra_args = list(extra_args or [])
+        # One semaphore per event loop (asyncio primitives bind to the loop that first waits on them),
+        # so a Downloader can be reused across asyncio.run() calls
+        self._slots = weakref.WeakKeyDictionary()
+
+    def _yt_dlp(self):
+        if self.yt_dlp_path is None:
+            self.yt_dlp_path = resolve_tool("yt-dlp", local_paths=["./yt-dlp"])
+            if not self.yt_dlp_path:
+                raise DownloadError("yt-dlp not found", kind='missing-tool')
+        return self.yt_dlp_path
+
+    def build_command(self, url, finished_log, audio_only=True, format="wav", keep_video=False, extra_args=None):
+        """The yt-dlp command line for a download, writing finished files to finished_log"""
+        cmd = [self._yt_dlp(), "--quiet", "--no-progress", "--no-warnings"]
+        cmd.extend(self.extra_args)
+        cmd.extend(extra_args or [])
+        if self.archive:
+            cmd.extend(["--download-archive", str(self.archive.path)])
+        if audio_only:
+            cmd.extend(["-x", "--audio-format", format])
+            if keep_video:
+                cmd.append("-k")
+        else:
+            cmd.extend(["-f", "bestvideo+bestaudio/best"])
+        cmd.extend([
+            "--print-to-file", FINISHED_FILE_TEMPLATE, finished_log,
+            "-o", str(self.output_dir / "%(title)s.%(ext)s"),
+            url,
+        ])
+        return cmd
+
+    async def download(self, url, audio_only=True, format="wav", keep_video=False, extra_args=None, timeout=None):
+        """Download one URL; returns a DownloadResult or raises DownloadError
+
+        timeout (seconds) covers the download including retries, but not the
+        wait for a free slot when max_concurrency downloads are running.
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self._slots:
+            self._slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        result = DownloadResult(url, route_url(url).platform)
+        start = time.monotonic()
+        key = media_key_from_url(url)
+        if self.archive and key and self.archive.has(*key):
+            result.skipped = True
+            return result
+
+        fd, finished_log = tempfile.mkstemp(prefix='media-downloader-', suffix='.finished')
+        os.close(fd)
+        try:
+            cmd = self.build_command(url, finished_log, audio_only, format, keep_video, extra_args)
+            async with self._slots[loop]:
+                await asyncio.wait_for(self._run_with_retries(cmd, url, result), timeout)
+        except asyncio.TimeoutError:
+            result.error = DownloadError(f"timed out after {timeout}s", kind='timeout', url=url, result=result)
+        except DownloadError as e:
+            e.url, e.result = url, result
+            result.error = e
+        finally:
+            result.files = self._collect_files(finished_log)
+            result.elapsed = time.monotonic() - start
+            os.unlink(finished_log)
+        if result.error:
+            raise result.error
+        return result
+
+    async def download_many(self, urls, **kwargs):
+        """Download URLs concurrently (up to max_concurrency); returns DownloadResults in input order
+
+        Failures do not raise; their results carry the DownloadError in .error.
+        """
+        async def one(url):
+            try:
+                return await self.download(url, **kwargs)
+            except DownloadError as e:
+                if e.result is None:
+                    e.result = DownloadResult(url, route_url(url).platform)
+                    e.result.error = e
+                return e.result
+        return await asyncio.gather(*(one(url) for url in urls))
+
+    async def _run_with_retries(self, cmd, url, result):
+        limiter = self.rate_limiters.for_url(url)
+        while True:
+            await limiter.acquire_async()
+            result.attempts += 1
+            returncode, stderr = await self._run(cmd)
+            if returncode == 0:
+                limiter.succeeded()
+                return
+            kind = classify_error(stderr)
+            attempt = result.attempts - 1
+            if not self.retry.should_retry(attempt, kind):
+                message = next((line for line in reversed(stderr) if line.startswith('ERROR')),
+                               f"yt-dlp exited with status {returncode}")
+                raise DownloadError(message, kind=classify_failure(stderr), returncode=returncode,
+                                    stderr=list(stderr))
+            delay = self.retry.delay(attempt, kind)
+            if kind == 'throttled':
+                # Pauses the host's limiter, so the next acquire waits for every download on it
+                limiter.throttled(pause=delay)
+            else:
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _run(cmd):
+        """Run yt-dlp; returns (exit status, last stderr lines). Kills it when cancelled"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stderr = deque(maxlen=ERROR_TAIL_LINES)
+        try:
+            async for line in process.stderr:
+                stderr.append(line.decode('utf-8', 'replace').rstrip())
+            return await process.wait(), stderr
+        finally:
+            if process.returncode is None:
+                process.terminate()
+                try:
+                    await asyncio.wait_for(process.wait(), TERMINATE_GRACE)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+
+    def _collect_files(self, finished_log):
+        files = []
+        with open(finished_log, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                media_key, duration, path = parse_finished_line(line.rstrip('\n'))
+                try:
+                    size = os.stat(path).st_size
+                except OSError:
+                    continue
+                if self.media_index:
+                    self.media_index.record(path, media_key, duration)
+                files.append(MediaFile(path, size, DownloadArchive.make_key(*media_key) if media_key else None,
+                                       duration))
+        return files
+
+
+async def download(url, output_dir="downloads", timeout=None, **kwargs):
+    """Download a single URL with a one-off Downloader; see Downloader.download"""
+    options = {name: kwargs.pop(name) for name in ('audio_only', 'format', 'keep_video', 'extra_args')
+               if name in kwargs}
+    return await Downloader(output_dir, **kwargs).download(url, timeout=timeout, **options)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Per-output-directory index of downloaded files (SQLite), so counts and lookups never scan the tree
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from dedup_store import ContentStore
+
+
+# Index database kept in each output directory
+INDEX_DB_NAME = ".index.sqlite"
+
+AUDIO_SUFFIXES = {'.mp3', '.m4a', '.aac', '.ogg', '.opus', '.wav', '.flac'}
+
+MEDIA_SUFFIXES = {'.mp4', '.webm', '.mkv', '.mov', '.jpg', '.jpeg', '.png', '.webp'} | AUDIO_SUFFIXES
+
+# Printed by yt-dlp for every file it moves into place: "<extractor> <id>\t<duration>\t<path>"
+FINISHED_FILE_TEMPLATE = "after_move:%(extractor_key)s %(id)s\t%(duration|)s\t%(filepath)s"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    media_key TEXT,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT,
+    duration REAL,
+    added REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS media_by_key ON media (media_key);
+"""
+
+
+def parse_finished_line(line):
+    """Split a FINISHED_FILE_TEMPLATE line into ((extractor, media id), duration, path)"""
+    media_key, duration, path = line.split('\t', 2)
+    extractor, _, media_id = media_key.partition(' ')
+    try:
+        duration = float(duration)
+    except ValueError:
+        duration = None
+    return (extractor, media_id) if media_id else None, duration, path
+
+
+def _media_key(extractor, media_id):
+    # Same "<extractor> <id>" form as the download archive
+    return f"{extractor.lower()} {media_id}"
+
+
+class MediaIndex:
+    """Media id -> path, size, hash and duration for every file downloaded into a directory
+
+    Paths are stored relative to the output directory. Each completed file is
+    recorded in its own transaction, so the index is consistent after a
+    crash. rebuild() recreates it from disk for files written by other tools
+    or before the index existed.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / INDEX_DB_NAME
+        self._lock = threading.Lock()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def _relative(self, path):
+        path = Path(path)
+        try:
+            return str(path.resolve().relative_to(self.output_dir.resolve()))
+        except ValueError:
+            return str(path.resolve())
+
+    def record(self, path, media_key=None, duration=None, sha256=None):
+        """Add or update the entry for a finished file"""
+        stat = os.stat(path)
+        if media_key is not None and not isinstance(media_key, str):
+            media_key = _media_key(*media_key)
+        self._execute(
+            "INSERT INTO media (path, media_key, size, mtime, sha256, duration, added) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET media_key = COALESCE(excluded.media_key, media_key), "
+            "size = excluded.size, mtime = excluded.mtime, sha256 = COALESCE(excluded.sha256, sha256), "
+            "duration = COALESCE(excluded.duration, duration)",
+            (self._relative(path), media_key, stat.st_size, stat.st_mtime, sha256, duration, time.time())
+        )
+
+    def forget(self, path):
+        self._execute("DELETE FROM media WHERE path = ?", (self._relative(path),))
+
+    def lookup(self, extractor, media_id):
+        """Absolute paths recorded for a media item that still exist"""
+        rows = self._execute("SELECT path FROM media WHERE media_key = ?",
+                             (_media_key(extractor, media_id),)).fetchall()
+        paths = [self.output_dir / row[0] for row in rows]
+        return [path for path in paths if path.exists()]
+
+    def has(self, extractor, media_id):
+        return bool(self.lookup(extractor, media_id))
+
+    def count(self, directory=None, extensions=MEDIA_SUFFIXES):
+        """Number of indexed files, optionally below a subdirectory and with given extensions"""
+        return sum(1 for _ in self.entries(directory, extensions))
+
+    def entries(self, directory=None, extensions=None):
+        """(path, media key, size, sha256, duration) rows, optionally below a subdirectory"""
+        sql = "SELECT path, media_key, size, sha256, duration FROM media"
+        params = ()
+        if directory is not None:
+            prefix = self._relative(self.output_dir / directory).rstrip(os.sep) + os.sep
+            # Range scan on the primary key instead of LIKE, which would need escaping
+            sql += " WHERE path >= ? AND path < ?"
+            params = (prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+        for row in self._execute(sql + " ORDER BY path", params).fetchall():
+            if extensions is None or os.path.splitext(row[0])[1].lower() in extensions:
+                yield row
+
+    def rebuild(self):
+        """Re-index the directory with os.scandir; returns (files indexed, entries removed)
+
+        Entries whose file is unchanged (same size and mtime) keep their media
+        id, hash and duration. New or changed files take them from a
+        yt-dlp .info.json next to them and from the content store manifest.
+        """
+        with self._lock:
+            known = {row[0]: row for row in self._db.execute(
+                "SELECT path, media_key, size, mtime, sha256, duration FROM media")}
+        digests = {path: digest for path, (digest, _) in ContentStore(self.output_dir).manifest().items()}
+
+        root = os.path.join(str(self.output_dir), '')
+        seen = set()
+        rows = []
+        stack = [root]
+        while stack:
+            try:
+                scan = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with scan:
+                entries = list(scan)
+            names = {entry.name for entry in entries}
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                stem, ext = os.path.splitext(entry.name)
+                if ext.lower() not in MEDIA_SUFFIXES or not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                relative = entry.path[len(root):]
+                seen.add(relative)
+                old = known.get(relative)
+                if old and old[2] == stat.st_size and old[3] == stat.st_mtime:
+                    continue
+                media_key, duration = None, None
+                if stem + '.info.json' in names:
+                    media_key, duration = self._read_info(os.path.join(os.path.dirname(entry.path),
+                                                                       stem + '.info.json'))
+                rows.append((relative, media_key, stat.st_size, stat.st_mtime, digests.get(relative),
+                             duration, time.time()))
+
+        removed = [(path,) for path in known if path not in seen]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._db.executemany("DELETE FROM media WHERE path = ?", removed)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(seen), len(removed)
+
+    @staticmethod
+    def _read_info(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        if not info.get('id') or not info.get('extractor_key'):
+            return None, info.get('duration')
+        return _media_key(info['extractor_key'], info['id']), info.get('duration')
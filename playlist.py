@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Playlist and channel fan-out: list the entries once, then download them as separate jobs
+"""
+
+import json
+import subprocess
+
+from probe_cache import OUTPUT_ONLY_ARGS
+from tracing import span
+
+
+# A channel URL lists its tabs (Videos, Shorts, Live); each tab is listed in turn
+MAX_NESTING = 2
+
+# yt-dlp extractors whose entries are themselves playlists
+PLAYLIST_EXTRACTORS = ('YoutubeTab', 'YoutubePlaylist')
+
+
+class PlaylistEntry:
+    """One video of a flattened playlist, numbered by its position in the listing"""
+
+    def __init__(self, index, media_id, url, title=None, extractor='youtube'):
+        self.index = index
+        self.media_id = media_id
+        self.url = url
+        self.title = title
+        self.extractor = extractor
+
+    @property
+    def item(self):
+        """JobQueue item key, the same "<extractor> <id>" YtDlpJobTracker records"""
+        return f"{self.extractor.lower()} {self.media_id}"
+
+    def __repr__(self):
+        return f"PlaylistEntry({self.index}, {self.media_id!r}, {self.url!r})"
+
+
+def _entry_url(entry):
+    url = entry.get('url') or entry.get('webpage_url')
+    if url and '://' in url:
+        return url
+    if entry.get('ie_key', 'Youtube') == 'Youtube' and entry.get('id'):
+        return f"https://www.youtube.com/watch?v={entry['id']}"
+    return url
+
+
+def _is_playlist(entry):
+    return entry.get('_type') == 'playlist' or entry.get('ie_key') in PLAYLIST_EXTRACTORS
+
+
+def parse_flat_playlist(info, expand=None, depth=0):
+    """Video entries of a yt-dlp --flat-playlist info dict, in listing order, without duplicates
+
+    Nested playlists (channel tabs) are taken from their inline entries or,
+    when yt-dlp only gave their URL, from expand(url) returning another
+    info dict. Numbering starts at 1 and follows the listing.
+    """
+    entries = []
+    seen = set()
+
+    def walk(info, depth):
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            if _is_playlist(entry):
+                if depth >= MAX_NESTING:
+                    continue
+                if entry.get('entries') is not None:
+                    walk(entry, depth + 1)
+                elif expand and _entry_url(entry):
+                    walk(expand(_entry_url(entry)), depth + 1)
+                continue
+            url = _entry_url(entry)
+            if not entry.get('id') or not url or entry['id'] in seen:
+                continue
+            seen.add(entry['id'])
+            extractor = (entry.get('ie_key') or info.get('extractor_key') or 'youtube').lower()
+            entries.append(PlaylistEntry(len(entries) + 1, entry['id'], url, entry.get('title'), extractor))
+
+    walk(info, depth)
+    return entries
+
+
+def list_playlist(yt_dlp_path, url, extra_args=None):
+    """yt-dlp's metadata-only listing (--flat-playlist) of a playlist or channel as a dict"""
+    args = [arg for arg in (extra_args or []) if arg not in OUTPUT_ONLY_ARGS]
+    with span("list playlist"):
+        result = subprocess.run(
+            [yt_dlp_path, "--flat-playlist", "--dump-single-json", "--no-warnings"] + args + [url],
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding='utf-8'
+        )
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, result.args)
+    return json.loads(result.stdout)
+
+
+def flatten_playlist(yt_dlp_path, url, extra_args=None):
+    """PlaylistEntry list for a playlist or channel URL, with one cheap listing per (nested) playlist"""
+    return parse_flat_playlist(list_playlist(yt_dlp_path, url, extra_args),
+                               expand=lambda tab_url: list_playlist(yt_dlp_path, tab_url, extra_args))
+
+
+def entry_filename(entry, total):
+    """yt-dlp output template for an entry: its zero-padded playlist index, then the title
+
+    The index is padded to the width of the largest one, so names sort in
+    playlist order.
+    """
+    width = max(2, len(str(total)))
+    return f"{entry.index:0{width}d} - %(title)s.%(ext)s"
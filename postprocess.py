@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Post-processing stage: audio extraction in a worker pool separate from the downloads
+"""
+
+import os
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from tracing import TRACER, span
+
+
+# Same encoders yt-dlp's --audio-format picks; formats not listed use ffmpeg's
+# default for the file extension (e.g. PCM for .wav)
+AUDIO_CODECS = {
+    'mp3': 'libmp3lame',
+    'aac': 'aac',
+    'm4a': 'aac',
+    'opus': 'libopus',
+    'vorbis': 'libvorbis',
+    'flac': 'flac',
+    'alac': 'alac',
+}
+
+# Audio formats whose file extension differs from the format name
+AUDIO_EXTENSIONS = {
+    'aac': 'm4a',
+    'alac': 'm4a',
+    'vorbis': 'ogg',
+}
+
+
+def audio_output_path(source, format):
+    """Where the audio extracted from source is written, named like yt-dlp's -x output"""
+    return Path(source).with_suffix('.' + AUDIO_EXTENSIONS.get(format, format))
+
+
+def extract_audio(ffmpeg_path, source, format="wav", keep_video=False):
+    """Convert a downloaded file to an audio format; returns the files left on disk
+
+    Output goes to a hidden partial file that is renamed when ffmpeg is done,
+    so an interrupted conversion never leaves a truncated file under the final
+    name. The source is deleted unless keep_video is set.
+    """
+    source = Path(source)
+    output = audio_output_path(source, format)
+    if format == 'best' or output == source:
+        return [str(source)]
+
+    partial_path = output.with_name(f".{output.stem}.{uuid.uuid4().hex}{output.suffix}")
+    cmd = [ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin", "-i", str(source), "-vn"]
+    if format in AUDIO_CODECS:
+        cmd.extend(["-c:a", AUDIO_CODECS[format]])
+    cmd.extend(["-y", str(partial_path)])
+    try:
+        subprocess.run(cmd, check=True)
+        os.replace(partial_path, output)
+    finally:
+        if partial_path.exists():
+            partial_path.unlink()
+
+    if keep_video:
+        return [str(output), str(source)]
+    source.unlink()
+    return [str(output)]
+
+
+class StageMetrics:
+    """Queue depth and worker utilization of one pipeline stage
+
+    Depth and busy workers are integrated over time between transitions, so
+    the averages cover the span from the first queued job to the moment the
+    stage last went idle (or now, while it is still working).
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.depth = 0
+        self.max_depth = 0
+        self.busy = 0
+        self.jobs = 0
+        self._depth_time = 0.0
+        self._busy_time = 0.0
+        self._start = None
+        self._last = None
+        self._lock = threading.Lock()
+
+    def _advance(self):
+        now = time.monotonic()
+        if self._start is None:
+            self._start = self._last = now
+        self._depth_time += self.depth * (now - self._last)
+        self._busy_time += self.busy * (now - self._last)
+        self._last = now
+
+    def queued(self):
+        with self._lock:
+            self._advance()
+            self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+
+    def started(self):
+        with self._lock:
+            self._advance()
+            self.depth -= 1
+            self.busy += 1
+
+    def finished(self):
+        with self._lock:
+            self._advance()
+            self.busy -= 1
+            self.jobs += 1
+
+    def report(self):
+        """Jobs, queue depth (max and time-averaged) and utilization of the workers"""
+        with self._lock:
+            if self.depth or self.busy:
+                self._advance()
+            elapsed = (self._last - self._start) if self._start is not None else 0.0
+            return {
+                'workers': self.workers,
+                'jobs': self.jobs,
+                'max_depth': self.max_depth,
+                'avg_depth': self._depth_time / elapsed if elapsed else 0.0,
+                'utilization': self._busy_time / (self.workers * elapsed) if elapsed else 0.0,
+            }
+
+
+class FileListWatcher:
+    """Call back with every line another process appends to a file, as it is written
+
+    Used with yt-dlp's --print-to-file after_move:filepath so each item of a
+    playlist can be post-processed while the next one downloads.
+    """
+
+    def __init__(self, path, callback, interval=0.25):
+        self.path = path
+        self.callback = callback
+        self.interval = interval
+        self.lines = []
+        self._offset = 0
+        self._pending = b''
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching after handling whatever was written up to now"""
+        self._stop.set()
+        self._thread.join()
+        self._poll()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self._poll()
+
+    def _poll(self):
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return
+        self._offset += len(data)
+        # Only complete lines; a partly written one is finished on the next poll
+        *lines, self._pending = (self._pending + data).split(b'\n')
+        for line in lines:
+            line = line.decode('utf-8').strip()
+            if line:
+                self.lines.append(line)
+                self.callback(line)
+
+
+class PostProcessPool:
+    """Audio extraction jobs run by ffmpeg processes, one per CPU core by default
+
+    Downloads hand their finished files to submit() and move on, so the
+    network and the CPU are busy at the same time. With background=True
+    downloads do not wait for their conversions; callers collect the results
+    with take() (batch mode does this after the last download).
+    """
+
+    def __init__(self, ffmpeg_path, workers=None, background=False):
+        self.ffmpeg_path = ffmpeg_path
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.background = background
+        self.metrics = StageMetrics('postprocess', self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='postprocess')
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, source, format="wav", keep_video=False, on_done=None):
+        """Queue a downloaded file for audio extraction; returns a future of the resulting paths
+
+        on_done is called with those paths in the worker, before the future
+        completes; if it returns a list (e.g. the paths after moving the
+        files), that becomes the future's result instead.
+        """
+        self.metrics.queued()
+        future = self._executor.submit(TRACER.wrap(self._run), source, format, keep_video, on_done)
+        with self._lock:
+            self._futures[str(source)] = future
+        return future
+
+    def take(self, source):
+        """The pending or finished job for a submitted file (once), or None"""
+        with self._lock:
+            return self._futures.pop(str(source), None)
+
+    def _run(self, source, format, keep_video, on_done):
+        self.metrics.started()
+        try:
+            with span("ffmpeg", file=os.path.basename(str(source))):
+                paths = extract_audio(self.ffmpeg_path, source, format, keep_video)
+            if on_done:
+                result = on_done(paths)
+                if result is not None:
+                    paths = result
+            return paths
+        finally:
+            self.metrics.finished()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Local cache of yt-dlp info JSON so probing and downloading extract only once
+"""
+
+import hashlib
+import os
+import subprocess
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from archive import media_key_from_url
+from tools import CACHE_DIR
+from tracing import span
+
+
+PROBE_CACHE_DIR = CACHE_DIR / "probe"
+
+# Format URLs in the info JSON are signed and expire (YouTube's after ~6h),
+# so entries must be re-probed well before that to stay downloadable
+DEFAULT_TTL = 3600
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Arguments that change what yt-dlp prints rather than what it extracts
+OUTPUT_ONLY_ARGS = ("--list-formats", "-F")
+
+# Options that change what yt-dlp extracts: who it is logged in as, how it
+# reaches the site and which formats it selects. Their values are part of
+# the cache key, so a probe without cookies is not reused by a run with them.
+EXTRACTION_ARGS = frozenset((
+    "--cookies", "--cookies-from-browser", "-u", "--username", "-p", "--password", "-2", "--twofactor",
+    "--netrc-location", "--netrc-cmd", "--video-password", "--ap-mso", "--ap-username", "--ap-password",
+    "--client-certificate", "--add-header", "--user-agent", "--referer", "--extractor-args", "--proxy",
+    "--geo-verification-proxy", "--xff", "-f", "--format", "-S", "--format-sort", "--age-limit",
+))
+EXTRACTION_FLAGS = frozenset(("-n", "--netrc"))
+
+
+def extraction_args(extra_args):
+    """The options in extra_args that change what yt-dlp extracts, as NAME=VALUE strings
+
+    A cookie file stands for its path, mtime and size, so a rewritten jar
+    misses the entries probed with the old one.
+    """
+    args = list(extra_args or [])
+    selected = []
+    i = 0
+    while i < len(args):
+        name, sep, value = args[i].partition('=') if args[i].startswith('--') else (args[i], '', '')
+        if name in EXTRACTION_FLAGS:
+            selected.append(name)
+        elif name in EXTRACTION_ARGS:
+            if not sep and i + 1 < len(args):
+                i += 1
+                value = args[i]
+            if name == "--cookies":
+                try:
+                    stat = os.stat(value)
+                    value = f"{os.path.abspath(value)} {stat.st_mtime_ns} {stat.st_size}"
+                except OSError:
+                    pass
+            selected.append(f"{name}={value}")
+        i += 1
+    return selected
+
+
+def cache_key(url, extra_args=None):
+    """Media id when the URL names one item, otherwise the normalized URL; plus a digest of extraction_args()"""
+    key = media_key_from_url(url)
+    if key is not None:
+        key = f"{key[0]} {key[1]}"
+    else:
+        parts = urlsplit(url if '://' in url else f"https://{url}")
+        host = (parts.hostname or '').lower()
+        if host.startswith(('www.', 'm.')):
+            host = host.split('.', 1)[1]
+        netloc = f"{host}:{parts.port}" if parts.port else host
+        key = "url " + urlunsplit((parts.scheme.lower(), netloc, parts.path.rstrip('/') or '/', parts.query, ''))
+    args = extraction_args(extra_args)
+    if args:
+        # Hashed, so passwords never appear in the key
+        key += " args " + hashlib.sha1('\0'.join(args).encode('utf-8')).hexdigest()[:16]
+    return key
+
+
+class ProbeCache:
+    """Directory of info JSON files with a TTL and LRU eviction by total size
+
+    A hit refreshes the entry's access time (its mtime is left alone, since
+    that is what the TTL is measured from); eviction removes expired entries
+    first, then the least recently used until the cache fits in max_bytes.
+    """
+
+    def __init__(self, path=PROBE_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def entry_path(self, url, extra_args=None):
+        digest = hashlib.sha1(cache_key(url, extra_args).encode('utf-8')).hexdigest()
+        return self.path / f"{digest}.info.json"
+
+    def lookup(self, url, extra_args=None):
+        """Path of a fresh info JSON for url probed with the same extraction_args(), or None"""
+        path = self.entry_path(url, extra_args)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        if time.time() - stat.st_mtime > self.ttl:
+            return None
+        try:
+            os.utime(path, (time.time(), stat.st_mtime))
+        except OSError:
+            pass
+        return path
+
+    def get(self, url, extra_args=None):
+        """Cached info JSON text for url, or None"""
+        path = self.lookup(url, extra_args)
+        if path is None:
+            return None
+        try:
+            return path.read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def put(self, url, info_json, extra_args=None):
+        """Store info JSON text for url and return its path"""
+        path = self.entry_path(url, extra_args)
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        tmp_path.write_text(info_json, encoding='utf-8')
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def probe(self, yt_dlp_path, url, extra_args=None, refresh=False):
+        """Return info JSON for url, running yt-dlp -J only on a cache miss"""
+        if not refresh:
+            cached = self.get(url, extra_args)
+            if cached is not None:
+                return cached
+        args = [arg for arg in (extra_args or []) if arg not in OUTPUT_ONLY_ARGS]
+        with span("probe"):
+            result = subprocess.run(
+                [yt_dlp_path, "--dump-single-json", "--no-warnings"] + args + [url],
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding='utf-8'
+            )
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, result.args)
+        info_json = result.stdout.strip()
+        try:
+            self.put(url, info_json, extra_args)
+        except OSError:
+            # Caching is an optimization; the probe result is still valid
+            pass
+        return info_json
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over max_bytes"""
+        now = time.time()
+        entries = []
+        try:
+            scan = os.scandir(self.path)
+        except OSError:
+            return
+        with scan:
+            for entry in scan:
+                if not entry.name.endswith('.info.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.ttl:
+                    self._remove(entry.path)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+High-water mark tracking for incremental Instagram profile syncs
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+class SyncState:
+    """Newest synced post of an account, stored as JSON in the account folder"""
+
+    FILENAME = ".sync-state.json"
+
+    def __init__(self, account_dir):
+        self.path = Path(account_dir) / self.FILENAME
+        self.latest_mediaid = None
+        self.latest_date = None
+        self._pending_mediaid = None
+        self._pending_date = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.latest_mediaid = data.get('latest_mediaid')
+        if data.get('latest_date'):
+            self.latest_date = datetime.fromisoformat(data['latest_date'])
+
+    @staticmethod
+    def _as_utc(date):
+        # instaloader hands out naive UTC datetimes
+        if date.tzinfo is None:
+            return date.replace(tzinfo=timezone.utc)
+        return date
+
+    def is_synced(self, date):
+        """Check whether a post from this date is covered by the last sync"""
+        return self.latest_date is not None and self._as_utc(date) <= self.latest_date
+
+    def observe(self, mediaid, date):
+        """Note a post seen in this run; committed by save()"""
+        date = self._as_utc(date)
+        if self._pending_date is None or date > self._pending_date:
+            self._pending_mediaid = mediaid
+            self._pending_date = date
+
+    def dateafter(self):
+        """yt-dlp --dateafter value covering posts since the last sync"""
+        if self.latest_date is None:
+            return None
+        return self.latest_date.strftime("%Y%m%d")
+
+    def save(self):
+        """Advance the high-water mark; only call once a sync completed"""
+        if self._pending_date is None:
+            return
+        if self.latest_date is not None and self._pending_date <= self.latest_date:
+            return
+        self.latest_mediaid = self._pending_mediaid
+        self.latest_date = self._pending_date
+
+        data = {
+            'latest_mediaid': self.latest_mediaid,
+            'latest_date': self.latest_date.isoformat(),
+            'synced_at': datetime.now(timezone.utc).isoformat(),
+        }
+        # Write to a temp file and rename so an interrupted save never corrupts state
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Machine-readable progress events (JSON lines) for every download path
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# Marker that tells our progress lines apart from yt-dlp's regular output
+PROGRESS_MARKER = "MDPROGRESS "
+
+PROGRESS_TEMPLATE_ARGS = [
+    "--newline",
+    "--progress",
+    "--progress-template", "download:" + PROGRESS_MARKER + '{"download":%(progress)j}',
+    "--progress-template", "postprocess:" + PROGRESS_MARKER + '{"postprocess":%(progress)j}',
+]
+
+
+def reserve_stdout():
+    """Send everything else written to stdout to stderr; returns a stream on the real stdout
+
+    The redirect is made on the file descriptor, so it also covers output
+    from libraries (instaloader, in-process yt-dlp) and child processes,
+    not just this script's print() calls.
+    """
+    sys.stdout.flush()
+    stream = os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=1, encoding='utf-8')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return stream
+
+
+def parse_progress_line(line):
+    """Parse a templated progress line into (status, postprocess), or None"""
+    if not line.startswith(PROGRESS_MARKER):
+        return None
+    try:
+        data = json.loads(line[len(PROGRESS_MARKER):])
+    except ValueError:
+        return None
+    if 'download' in data:
+        return data['download'], False
+    if 'postprocess' in data:
+        return data['postprocess'], True
+    return None
+
+
+def tee_stderr(stream, error_tail):
+    """Copy a process's stderr (a text stream) to ours in a thread, keeping the last lines in error_tail"""
+    def copy():
+        for line in stream:
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            error_tail.append(line.rstrip('\n'))
+
+    thread = threading.Thread(target=copy, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_capturing_errors(cmd, error_tail):
+    """Run a command with stdout untouched and stderr teed into error_tail"""
+    process = subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace')
+    thread = tee_stderr(process.stderr, error_tail)
+    returncode = process.wait()
+    thread.join()
+    return returncode
+
+
+def run_with_status(cmd, on_status, output=None, echo_progress=False, error_tail=None):
+    """Run a yt-dlp command, calling on_status(status, postprocess) per update
+
+    Lines that are not progress updates are copied to output (stdout by
+    default). With echo_progress, yt-dlp's usual progress line is printed too.
+    If error_tail (e.g. a bounded deque) is given, stderr lines are appended
+    to it as they pass through. Returns the process exit code.
+    """
+    output = output or sys.stdout
+    cmd = cmd[:1] + PROGRESS_TEMPLATE_ARGS + cmd[1:]
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE if error_tail is not None else None,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        bufsize=1
+    )
+    thread = tee_stderr(process.stderr, error_tail) if error_tail is not None else None
+    for line in process.stdout:
+        parsed = parse_progress_line(line.rstrip('\n'))
+        if parsed is None:
+            output.write(line)
+            continue
+        status, postprocess = parsed
+        on_status(status, postprocess)
+        if echo_progress and not postprocess and status.get('_default_template'):
+            output.write(f"[download] {status['_default_template']}\n")
+    returncode = process.wait()
+    if thread:
+        thread.join()
+    return returncode
+
+
+class ProgressReporter:
+    """Emit one JSON object per progress update to a stream
+
+    Every event carries url, host, phase, bytes, total_bytes, speed (bytes/s),
+    eta and elapsed (seconds since the job started). Downloading updates are
+    throttled to one per `interval` seconds per URL; phase changes are always
+    emitted.
+    """
+
+    def __init__(self, stream=None, interval=0.5):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last_emit = {}
+        self._started = {}
+
+    def start(self, url):
+        """Mark the start of a job and emit a 'start' event"""
+        with self._lock:
+            self._started[url] = time.monotonic()
+        self.emit(url, 'start')
+
+    def finish(self, url, ok=True, **fields):
+        """Emit a 'done' or 'error' event for a job"""
+        self.emit(url, 'done' if ok else 'error', **fields)
+        with self._lock:
+            self._started.pop(url, None)
+            self._last_emit.pop(url, None)
+
+    def emit(self, url, phase, bytes=None, total_bytes=None, speed=None, eta=None, **extra):
+        """Write a single event line"""
+        now = time.monotonic()
+        with self._lock:
+            if phase == 'download':
+                last = self._last_emit.get(url)
+                if last is not None and now - last < self.interval:
+                    return
+            self._last_emit[url] = now
+            started = self._started.get(url, now)
+            event = {
+                'time': time.time(),
+                'url': url,
+                'host': urlparse(url).hostname,
+                'phase': phase,
+                'bytes': bytes,
+                'total_bytes': total_bytes,
+                'speed': speed,
+                'eta': eta,
+                'elapsed': round(now - started, 3),
+            }
+            event.update(extra)
+            self.stream.write(json.dumps(event) + "\n")
+            self.stream.flush()
+
+    def handle_status(self, url, status, postprocess=False):
+        """Translate a yt-dlp progress/postprocessor status dict into an event"""
+        if postprocess:
+            self.emit(url, 'postprocess', postprocessor=status.get('postprocessor'),
+                      status=status.get('status'))
+            return
+        phase = 'download' if status.get('status') == 'downloading' else status.get('status')
+        self.emit(
+            url,
+            phase,
+            bytes=status.get('downloaded_bytes'),
+            total_bytes=status.get('total_bytes') or status.get('total_bytes_estimate'),
+            speed=status.get('speed'),
+            eta=status.get('eta'),
+            filename=status.get('filename'),
+            fragment_index=status.get('fragment_index'),
+            fragment_count=status.get('fragment_count'),
+        )
+
+    def hook(self, url):
+        """Status callback for one URL, for use with run_with_status"""
+        return lambda status, postprocess=False: self.handle_status(url, status, postprocess)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Rate limiting and backoff helpers shared by download workers
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# Starting rate for hosts without a configured one (yt-dlp runs or posts per second)
+DEFAULT_HOST_RATE = 2.0
+DEFAULT_HOST_BURST = 4
+
+# Substrings of yt-dlp / instaloader errors that mean the host is throttling us
+THROTTLE_MARKERS = (
+    'http error 429', 'too many requests', 'rate-limit', 'rate limit', 'please wait a few minutes',
+)
+
+# Substrings of errors that are likely to go away on a retry
+TRANSIENT_MARKERS = (
+    'timed out', 'timeout', 'connection reset', 'connection aborted', 'connection refused',
+    'remote end closed', 'temporary failure in name resolution', 'incompleteread',
+    'http error 500', 'http error 502', 'http error 503', 'http error 504',
+)
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` acquisitions per second"""
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token if one is available; returns 0, or the seconds to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait for a token without blocking the event loop"""
+        # Imported here so the CLI does not pay for loading asyncio
+        import asyncio
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens to every worker for a while, e.g. after a 429"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """Token bucket that adapts its rate to throttling (AIMD)
+
+    Every throttling response halves the rate (down to min_rate) and every
+    success adds `increase` tokens/s back (up to max_rate), so the rate
+    settles just below what the host tolerates.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=0.05, max_rate=None, increase=0.05):
+        super().__init__(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate or self.rate * 4
+        self.increase = increase
+        self.successes = 0
+        self.throttles = 0
+
+    def succeeded(self):
+        with self._lock:
+            self.successes += 1
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, pause=0.0):
+        """Slow down after a throttling response; returns the new rate"""
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            rate = self.rate
+        if pause:
+            self.pause(pause)
+        return rate
+
+
+class HostRateLimiters:
+    """One AdaptiveRateLimiter per host, shared by every downloader and worker"""
+
+    def __init__(self, default_rate=DEFAULT_HOST_RATE, rates=None):
+        self.default_rate = default_rate
+        self.rates = rates or {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        """Host name without "www." / "m.", so one site shares one limiter"""
+        host = (urlparse(url if '://' in url else f"https://{url}").hostname or '').lower()
+        if host.startswith(('www.', 'm.')):
+            host = host.split('.', 1)[1]
+        return host
+
+    def get(self, host, rate=None, burst=DEFAULT_HOST_BURST):
+        """Limiter for host, created with rate (or the configured/default rate) on first use"""
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                rate = self.rates.get(host, rate or self.default_rate)
+                limiter = AdaptiveRateLimiter(rate, burst=burst)
+                self._limiters[host] = limiter
+            return limiter
+
+    def for_url(self, url):
+        return self.get(self.host_of(url))
+
+    def report(self):
+        """Current rate and counters per host"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {
+            host: {'rate': round(limiter.rate, 3), 'successes': limiter.successes, 'throttles': limiter.throttles}
+            for host, limiter in sorted(limiters.items())
+        }
+
+
+def parse_host_rates(values):
+    """Parse HOST=RATE overrides (requests per second) into a rates dict"""
+    rates = {}
+    for value in values or []:
+        host, sep, rate = value.partition('=')
+        try:
+            rate = float(rate)
+        except ValueError:
+            rate = 0
+        if not sep or not host.strip() or rate <= 0:
+            raise ValueError(f"Invalid host rate '{value}', expected HOST=RATE")
+        rates[HostRateLimiters.host_of(host.strip())] = rate
+    return rates
+
+
+def classify_error(lines):
+    """'throttled', 'transient' or None (not worth retrying) for error output lines
+
+    Only ERROR lines are considered when there are any, so warnings that
+    mention rate limits do not trigger retries.
+    """
+    lines = [line for line in lines if line.strip()]
+    errors = [line for line in lines if line.lstrip().startswith('ERROR')] or lines
+    text = "\n".join(errors).lower()
+    if any(marker in text for marker in THROTTLE_MARKERS):
+        return 'throttled'
+    if any(marker in text for marker in TRANSIENT_MARKERS):
+        return 'transient'
+    return None
+
+
+def backoff_delay(attempt, base=30.0, cap=600.0):
+    """Exponential backoff with full jitter for the given retry attempt"""
+    return random.uniform(base / 2, min(cap, base * (2 ** attempt)))
+
+
+class RetryScheduler:
+    """When and how long to wait before retrying a failed download
+
+    Throttling waits start from throttle_base seconds, other transient errors
+    from base; both double per attempt with jitter, up to cap.
+    """
+
+    def __init__(self, max_retries=3, base=5.0, throttle_base=30.0, cap=600.0):
+        self.max_retries = max_retries
+        self.base = base
+        self.throttle_base = throttle_base
+        self.cap = cap
+
+    def should_retry(self, attempt, kind):
+        """attempt counts retries already made; kind comes from classify_error"""
+        return kind is not None and attempt < self.max_retries
+
+    def delay(self, attempt, kind):
+        base = self.throttle_base if kind == 'throttled' else self.base
+        return backoff_delay(attempt, base=base, cap=self.cap)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Batch scheduling: job priorities, shortest-expected-job-first ordering and a shared bandwidth budget
+"""
+
+import heapq
+import json
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from staging import expected_size, parse_size
+
+
+DEFAULT_PRIORITY = 0
+
+# Each priority step doubles a job's share of the bandwidth budget; steps
+# beyond this are clamped so one job cannot shut the others out
+MAX_PRIORITY_STEPS = 4
+
+# Background probes learning job sizes; few, so they take little from the downloads
+PROBE_WORKERS = 2
+
+# yt-dlp's per-download rate cap options
+RATE_LIMIT_ARGS = ("--limit-rate", "-r")
+
+
+def priority_weight(priority):
+    """Bandwidth weight of a job relative to one of DEFAULT_PRIORITY"""
+    steps = max(-MAX_PRIORITY_STEPS, min(MAX_PRIORITY_STEPS, priority - DEFAULT_PRIORITY))
+    return 2.0 ** steps
+
+
+def upcoming_weight(queued, slots):
+    """Combined weight of the next slots jobs to start, given queued: a count of queued jobs by priority
+
+    Jobs start by priority first, so these are the highest-priority ones.
+    """
+    weight = 0.0
+    for priority in sorted(queued, reverse=True):
+        if slots <= 0:
+            break
+        count = min(queued[priority], slots)
+        weight += count * priority_weight(priority)
+        slots -= count
+    return weight
+
+
+def order_key(priority, size, index):
+    """Sort key for queued jobs: higher priority, then known sizes smallest first, then input order"""
+    return (-priority, size is None, size or 0, index)
+
+
+def split_rate_limit(args, parts):
+    """args with a --limit-rate divided between parts downloads run at the same time"""
+    if not args or parts <= 1:
+        return args
+    split = list(args)
+    for i, arg in enumerate(split[:-1]):
+        if arg in RATE_LIMIT_ARGS:
+            try:
+                split[i + 1] = str(max(1, parse_size(split[i + 1]) // parts))
+            except ValueError:
+                # Left for yt-dlp to report
+                pass
+    return split
+
+
+def cap_rate_limit(args, cap):
+    """args with their --limit-rate lowered to cap, or with one added when there is none"""
+    capped = list(args)
+    found = False
+    for i, arg in enumerate(capped[:-1]):
+        if arg in RATE_LIMIT_ARGS:
+            found = True
+            try:
+                capped[i + 1] = str(min(parse_size(capped[i + 1]), cap))
+            except ValueError:
+                # Left for yt-dlp to report
+                pass
+    if not found:
+        capped.extend(["--limit-rate", str(cap)])
+    return capped
+
+
+class BandwidthBudget:
+    """A total download rate (bytes/s) split across running jobs by priority weight
+
+    yt-dlp's --limit-rate is fixed when a download starts, so each job gets
+    its share up front: the budget divided over the weights of the running
+    jobs, its own, and those of queued jobs about to take the remaining
+    slots. A job gets no more than running jobs left unallocated, but at
+    least half its share, so a high-priority job starting on a busy link is
+    not left with the crumbs (the total can then briefly exceed the budget).
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.allocated = 0
+        self.weights = 0.0
+        self._lock = threading.Lock()
+
+    def allocate(self, weight=1.0, upcoming=0.0):
+        """Rate cap for a starting job; upcoming is the weight of jobs expected to start with it
+
+        Pass the cap and weight to release() when the job ends.
+        """
+        with self._lock:
+            share = self.rate * weight / (self.weights + weight + upcoming)
+            cap = max(1, int(max(min(share, self.rate - self.allocated), share / 2)))
+            self.allocated += cap
+            self.weights += weight
+            return cap
+
+    def release(self, cap, weight=1.0):
+        with self._lock:
+            self.allocated -= cap
+            self.weights -= weight
+
+
+class SizeEstimator:
+    """Expected download sizes of queued URLs, probed in the background
+
+    probe(url) returns yt-dlp's info JSON text. It should go through the
+    probe cache, so the download that follows loads the info instead of
+    extracting again. Scheduling never waits for a probe: until a URL's
+    size is known (or when it cannot be probed) it is estimated as the
+    median of the sizes known so far, so a big video probed early does not
+    jump ahead of a small one still being probed. The median is kept
+    up to date as sizes arrive, so reading it is O(1).
+    """
+
+    def __init__(self, probe, audio_only=True, workers=PROBE_WORKERS):
+        self.probe = probe
+        self.audio_only = audio_only
+        self.sizes = {}
+        self._futures = {}
+        # Running median: the lower half as a max-heap (negated), the upper half as a min-heap
+        self._lower = []
+        self._upper = []
+        # (url, size) pairs learned since the last take_learned()
+        self._learned = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe')
+
+    def submit(self, url):
+        if url not in self._futures:
+            self._futures[url] = self._pool.submit(self._estimate, url)
+
+    def _estimate(self, url):
+        try:
+            info = json.loads(self.probe(url))
+        except (subprocess.CalledProcessError, OSError, ValueError):
+            return
+        # Transfer size: for audio, the audio-only format yt-dlp will pick
+        size = expected_size(info, 'best' if self.audio_only else None)
+        if size is not None:
+            self.learn(url, size)
+
+    def learn(self, url, size):
+        with self._lock:
+            self.sizes[url] = size
+            self._learned.append((url, size))
+            heapq.heappush(self._lower, -size)
+            heapq.heappush(self._upper, -heapq.heappop(self._lower))
+            if len(self._upper) > len(self._lower):
+                heapq.heappush(self._lower, -heapq.heappop(self._upper))
+
+    def take_learned(self):
+        """(url, size) pairs learned since the last call"""
+        with self._lock:
+            learned, self._learned = self._learned, []
+            return learned
+
+    def median(self):
+        """Median (lower) of the sizes known so far, or None"""
+        with self._lock:
+            return -self._lower[0] if self._lower else None
+
+    def size(self, url):
+        """Expected bytes for url, or None while no size at all is known"""
+        size = self.sizes.get(url)
+        return size if size is not None else self.median()
+
+    def discard(self, url):
+        """Drop a probe not started yet (its job is starting and will extract for itself)"""
+        future = self._futures.get(url)
+        if future:
+            future.cancel()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ScheduledQueue:
+    """Queued jobs (with priority, index and url) of one platform, popped in order_key order
+
+    Jobs whose size is known sit in one heap. The rest sit in another, by
+    priority and input order only, since they all count as the median size;
+    comparing the two heads finds the next job in O(log n). When a queued
+    job's size is learned, learn() moves it across; its old entry is
+    skipped once it surfaces.
+    """
+
+    def __init__(self, estimator=None):
+        self.estimator = estimator
+        self._sized = []
+        self._unsized = []
+        # Indexes of jobs moved out of _unsized
+        self._moved = set()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, job):
+        heapq.heappush(self._unsized, (-job.priority, job.index, job))
+        self._count += 1
+
+    def learn(self, job, size):
+        self._moved.add(job.index)
+        heapq.heappush(self._sized, (-job.priority, size, job.index, job))
+
+    def _head(self):
+        """(order key, heap) of the next job, or None"""
+        while self._unsized and self._unsized[0][1] in self._moved:
+            self._moved.discard(heapq.heappop(self._unsized)[1])
+        heads = []
+        if self._sized:
+            priority, size, index, _ = self._sized[0]
+            heads.append((order_key(-priority, size, index), self._sized))
+        if self._unsized:
+            priority, index, _ = self._unsized[0]
+            median = self.estimator.median() if self.estimator else None
+            heads.append((order_key(-priority, median, index), self._unsized))
+        return min(heads, key=lambda head: head[0]) if heads else None
+
+    def peek(self):
+        """Order key of the next job, or None when empty"""
+        head = self._head()
+        return head[0] if head else None
+
+    def pop(self):
+        _, heap = self._head()
+        self._count -= 1
+        return heapq.heappop(heap)[-1]
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Instagram login sessions reused across runs and rotated between cookie jars
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from cookies import load_jar
+from tools import CACHE_DIR
+
+
+SESSION_DIR = CACHE_DIR / "instagram-sessions"
+
+# Cookies that make up an authenticated Instagram session
+SESSION_COOKIES = ('sessionid', 'ds_user_id', 'csrftoken', 'mid', 'ig_did', 'rur')
+
+
+def read_session_cookies(cookie_file):
+    """Instagram session cookies from a Netscape cookie file"""
+    return load_jar(cookie_file).for_domain('www.instagram.com', SESSION_COOKIES)
+
+
+def is_auth_error(error):
+    """Check whether an instaloader error means the session is not (or no longer) logged in"""
+    if type(error).__name__ in ('LoginRequiredException', 'LoginException', 'BadCredentialsException'):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ('401', 'login required', 'redirected to login', 'checkpoint required'))
+
+
+class InstagramSession:
+    """The session cookies of one cookie jar and when they were last validated"""
+
+    def __init__(self, cookie_file, cookies, mtime, username=None, validated=None, last_used=0, rejected=False):
+        self.cookie_file = cookie_file
+        self.cookies = cookies
+        self.mtime = mtime
+        self.username = username
+        self.validated = validated
+        self.last_used = last_used
+        # A rejected session stays unused until its cookie jar changes on disk
+        self.rejected = rejected
+        # Set when it could not be checked (network error); not saved, so only for this run
+        self.skipped = False
+
+    def to_json(self):
+        return {
+            'cookie_file': self.cookie_file,
+            'cookies': self.cookies,
+            'mtime': self.mtime,
+            'username': self.username,
+            'validated': self.validated,
+            'last_used': self.last_used,
+            'rejected': self.rejected,
+        }
+
+
+class SessionPool:
+    """Validated Instagram sessions, persisted to disk and handed out least recently used first
+
+    A cookie jar is parsed only when its mtime changes, and a session is checked
+    with test_login() only when it is new or after a request failed with an
+    auth error; otherwise the session saved by an earlier run is used as is.
+    Sessions are files under SESSION_DIR, readable only by the user.
+    """
+
+    def __init__(self, cookie_files, path=SESSION_DIR):
+        self.path = Path(path)
+        self.cookie_files = [str(Path(cookie_file).resolve()) for cookie_file in cookie_files]
+        self._lock = threading.Lock()
+        # Loaded on first use, so runs that never touch Instagram do not read the jars
+        self.sessions = None
+
+    def _state_path(self, cookie_file):
+        digest = hashlib.sha1(cookie_file.encode('utf-8')).hexdigest()[:16]
+        return self.path / f"{digest}.json"
+
+    def _load(self, cookie_file):
+        try:
+            mtime = os.stat(cookie_file).st_mtime
+        except OSError as e:
+            print(f"Warning: Could not load cookies: {e}")
+            return None
+        try:
+            with open(self._state_path(cookie_file), 'r') as f:
+                saved = json.load(f)
+            if saved.get('mtime') == mtime and saved.get('cookies'):
+                return InstagramSession(cookie_file, saved['cookies'], mtime, saved.get('username'),
+                                        saved.get('validated'), saved.get('last_used', 0),
+                                        saved.get('rejected', False))
+        except (OSError, ValueError):
+            pass
+
+        try:
+            cookies = read_session_cookies(cookie_file)
+        except OSError as e:
+            print(f"Warning: Could not load cookies: {e}")
+            return None
+        if 'sessionid' not in cookies:
+            print(f"Warning: no Instagram sessionid cookie in {cookie_file}")
+            return None
+        session = InstagramSession(cookie_file, cookies, mtime)
+        self._save(session)
+        return session
+
+    def _save(self, session):
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            state_path = self._state_path(session.cookie_file)
+            tmp_path = state_path.with_name(state_path.name + f".{os.getpid()}.tmp")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(session.to_json(), f, indent=2)
+            os.replace(tmp_path, state_path)
+        except OSError:
+            pass
+
+    def acquire(self):
+        """The usable session that has been idle longest (across runs), or None"""
+        with self._lock:
+            if self.sessions is None:
+                self.sessions = [s for s in map(self._load, self.cookie_files) if s is not None]
+            usable = [s for s in self.sessions if not s.rejected and not s.skipped]
+            if not usable:
+                return None
+            session = min(usable, key=lambda s: s.last_used)
+            session.last_used = time.time()
+            self._save(session)
+            return session
+
+    def apply(self, session, L):
+        """Log an Instaloader instance in with a session; False if it is rejected or cannot be checked
+
+        Only a failed login or an auth error rejects the session (until its
+        cookie jar changes); any other error skips it for this run only.
+        """
+        cookies = L.context._session.cookies
+        for name, value in session.cookies.items():
+            cookies.set(name, value, domain='.instagram.com')
+        if 'csrftoken' in session.cookies:
+            L.context._session.headers.update({'X-CSRFToken': session.cookies['csrftoken']})
+
+        if not session.validated or not session.username:
+            try:
+                username = L.context.test_login()
+            except Exception as e:
+                if not is_auth_error(e):
+                    print(f"Warning: could not check the session from {session.cookie_file}: {e}")
+                    with self._lock:
+                        session.skipped = True
+                    return False
+                username = None
+            with self._lock:
+                if not username:
+                    session.rejected = True
+                    self._save(session)
+                    return False
+                session.username = username
+                session.validated = time.time()
+                self._save(session)
+        L.context.username = session.username
+        return True
+
+    def invalidate(self, session):
+        """Mark a session for re-validation after a request failed with an auth error"""
+        with self._lock:
+            session.validated = None
+            self._save(session)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Disk-aware output: scratch-directory staging with atomic moves, and free-space admission control
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+
+from units import format_bytes
+
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+# 16-bit stereo PCM at 44.1 kHz, what ffmpeg writes for .wav from typical sources
+WAV_BYTES_PER_SECOND = 44100 * 2 * 2
+
+# Files yt-dlp is still writing (or left behind when interrupted); they stay in
+# the scratch directory so a rerun can continue them
+PARTIAL_SUFFIXES = ('.part', '.ytdl', '.temp')
+
+# Seconds between free-space checks while a job waits for room
+DEFAULT_POLL_INTERVAL = 5.0
+
+
+def parse_size(text):
+    """Bytes for a size such as 500M, 10G or 1.5T (binary units, optional trailing B)"""
+    value = text.strip().upper()
+    if value.endswith('B'):
+        value = value[:-1]
+    unit = value[-1:] if value[-1:] in SIZE_UNITS else ''
+    number = value[:-1] if unit else value
+    try:
+        size = float(number)
+    except ValueError:
+        raise ValueError(f"Invalid size '{text}', expected e.g. 500M or 10G")
+    if size < 0:
+        raise ValueError(f"Invalid size '{text}', expected e.g. 500M or 10G")
+    return int(size * SIZE_UNITS[unit])
+
+
+def _format_size(info):
+    return info.get('filesize') or info.get('filesize_approx')
+
+
+def expected_size(info, audio_format=None):
+    """Bytes a download described by yt-dlp's info dict needs on disk, or None if sizes are unknown
+
+    For audio extraction the download and the converted file exist at the
+    same time; WAV output is estimated from the duration, other formats as
+    no larger than the download.
+    """
+    download = None
+    if audio_format:
+        # What -f bestaudio/best picks: the largest audio-only format
+        sizes = [_format_size(f) for f in info.get('formats') or []
+                 if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+        download = max((size for size in sizes if size), default=None)
+    if download is None:
+        requested = info.get('requested_formats') or [info]
+        sizes = [_format_size(f) for f in requested]
+        if not all(sizes):
+            return None
+        download = sum(sizes)
+    if not audio_format or audio_format == 'best':
+        return int(download)
+    if audio_format == 'wav' and info.get('duration'):
+        return int(download + info['duration'] * WAV_BYTES_PER_SECOND)
+    return int(download * 2)
+
+
+class InsufficientSpaceError(OSError):
+    """A job needs more space than its volume can ever provide"""
+
+
+class DiskGuard:
+    """Free-space admission control for jobs writing to one or more volumes
+
+    Before a job starts, every volume it writes to must have its expected
+    size plus min_free available, after subtracting what jobs already
+    admitted have reserved. A job that does not fit waits while other jobs
+    are running (their files land and their reservations end). If nothing is
+    running and it still does not fit, it fails with InsufficientSpaceError
+    instead of filling the disk partway through.
+    """
+
+    def __init__(self, paths, min_free=0, interval=DEFAULT_POLL_INTERVAL):
+        self.min_free = min_free
+        self.interval = interval
+        # One entry per filesystem, so a scratch dir on the output volume is checked once
+        self.volumes = {}
+        for path in paths:
+            os.makedirs(path, exist_ok=True)
+            self.volumes.setdefault(os.stat(path).st_dev, str(path))
+        self._reserved = dict.fromkeys(self.volumes, 0)
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def _short(self, needed):
+        """(path, free, needed) of the first volume without room, or None"""
+        for dev, path in self.volumes.items():
+            free = shutil.disk_usage(path).free - self._reserved[dev]
+            if free < needed + self.min_free:
+                return path, free, needed + self.min_free
+        return None
+
+    def admit(self, expected=None, on_wait=None):
+        """Wait until a job of expected bytes (None if unknown) fits; returns the bytes reserved
+
+        on_wait(path, free, needed) is called once if the job has to wait.
+        Pass the return value to release() when the job is done.
+        """
+        needed = expected or 0
+        waited = False
+        with self._cond:
+            while True:
+                short = self._short(needed)
+                if short is None:
+                    for dev in self._reserved:
+                        self._reserved[dev] += needed
+                    self.active += 1
+                    return needed
+                path, free, wanted = short
+                if not self.active:
+                    raise InsufficientSpaceError(
+                        errno.ENOSPC, f"{format_bytes(max(free, 0))} free on {path}, "
+                                      f"{format_bytes(wanted)} needed")
+                if on_wait and not waited:
+                    on_wait(path, free, wanted)
+                waited = True
+                self._cond.wait(self.interval)
+
+    def release(self, reserved):
+        with self._cond:
+            for dev in self._reserved:
+                self._reserved[dev] -= reserved
+            self.active -= 1
+            self._cond.notify_all()
+
+
+def move_atomic(source, destination):
+    """Move a file so that it appears at destination complete or not at all
+
+    A rename when both are on one filesystem; otherwise a copy to a hidden
+    file next to destination, flushed to disk, then renamed into place.
+    """
+    try:
+        os.replace(source, destination)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    directory, name = os.path.split(destination)
+    partial_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.partial")
+    try:
+        with open(source, 'rb') as src, open(partial_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copystat(source, partial_path)
+        os.replace(partial_path, destination)
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+    os.unlink(source)
+
+
+def _is_partial(name):
+    return name.startswith('.') or name.endswith(PARTIAL_SUFFIXES) or '.part-Frag' in name
+
+
+class ScratchStaging:
+    """Per-job directories in a scratch location (tmpfs, local SSD) for yt-dlp and ffmpeg to write into
+
+    A job's directory is named after its URL, so a rerun finds and continues
+    the partial files of an interrupted one. Finished files are moved into
+    their final directory with move_atomic(), so the output directory never
+    holds a half-written file.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(self.path, exist_ok=True)
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def open_job(self, key):
+        """The scratch directory for a job, created if needed; pair with close_job()"""
+        job_dir = os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])
+        os.makedirs(job_dir, exist_ok=True)
+        with self._lock:
+            self._users[job_dir] = self._users.get(job_dir, 0) + 1
+        return job_dir
+
+    def hold(self, job_dir):
+        """Keep a job directory while its files are used after the job (e.g. queued conversions)"""
+        with self._lock:
+            self._users[job_dir] = self._users.get(job_dir, 0) + 1
+
+    def close_job(self, job_dir):
+        """Drop a use of a job directory; the last one removes it if nothing is left in it"""
+        with self._lock:
+            self._users[job_dir] -= 1
+            if self._users[job_dir]:
+                return
+            del self._users[job_dir]
+            try:
+                os.rmdir(job_dir)
+            except OSError:
+                pass
+
+    @staticmethod
+    def redirect(cmd, job_dir):
+        """Point a yt-dlp command's -o template into job_dir; returns (command, final directory)
+
+        "--print-to-file after_move:filepath FILE" arguments are dropped,
+        since they would report scratch paths; the caller reports the final
+        paths instead.
+        """
+        staged = []
+        final_dir = None
+        i = 0
+        while i < len(cmd):
+            arg = cmd[i]
+            if arg == "--print-to-file" and i + 2 < len(cmd) and cmd[i + 1] == "after_move:filepath":
+                i += 3
+                continue
+            if arg == "-o" and i + 1 < len(cmd):
+                final_dir, template = os.path.split(cmd[i + 1])
+                staged.extend(["-o", os.path.join(job_dir, template)])
+                i += 2
+                continue
+            staged.append(arg)
+            i += 1
+        return staged, final_dir
+
+    @staticmethod
+    def publish(paths, final_dir):
+        """Move finished files from scratch into final_dir; returns their new paths"""
+        os.makedirs(final_dir, exist_ok=True)
+        published = []
+        for path in paths:
+            destination = os.path.join(final_dir, os.path.basename(path))
+            move_atomic(path, destination)
+            published.append(destination)
+        return published
+
+    def sweep(self, job_dir, final_dir, keep=()):
+        """Publish what a finished job left in its scratch directory, except partial files
+
+        Catches files yt-dlp writes without reporting them as finished, like
+        the video kept by -k or thumbnails. Files sharing a name stem with a
+        path in keep (a queued conversion's source and output) are left to
+        whoever converts them.
+        """
+        keep = {os.path.splitext(os.path.abspath(path))[0] for path in keep}
+        leftovers = []
+        try:
+            with os.scandir(job_dir) as scan:
+                for entry in scan:
+                    if not entry.is_file() or _is_partial(entry.name):
+                        continue
+                    if os.path.splitext(os.path.abspath(entry.path))[0] not in keep:
+                        leftovers.append(entry.path)
+        except OSError:
+            return []
+        return self.publish(leftovers, final_dir)
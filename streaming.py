@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Streaming audio extraction: pipe yt-dlp's download straight into ffmpeg
+"""
+
+import io
+import os
+import subprocess
+import tempfile
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse
+
+from progress import tee_stderr
+
+
+# Formats that can be written to a pipe as they arrive: progressive HTTP
+# downloads and native HLS, but not DASH segments. Audio-only formats are
+# preferred; a single muxed file (e.g. a direct .mp4 link) is the last resort,
+# ffmpeg drops its video track while reading.
+STREAMABLE_FORMAT = (
+    "bestaudio[protocol^=http][protocol!*=dash]"
+    "/bestaudio[protocol=m3u8_native]"
+    "/best[protocol^=http][protocol!*=dash]"
+)
+
+# Direct media links the generic extractor resolves to a single item
+DIRECT_MEDIA_EXTENSIONS = {'.mp3', '.m4a', '.aac', '.ogg', '.opus', '.wav', '.flac', '.mp4', '.webm', '.mkv', '.mov'}
+
+
+def is_direct_media_url(url):
+    """Check whether a URL points straight at a media file"""
+    return Path(urlparse(url).path).suffix.lower() in DIRECT_MEDIA_EXTENSIONS
+
+
+def stream_audio(yt_dlp_path, ffmpeg_path, url, output_dir, format="wav", extra_args=None, error_tail=None):
+    """Download the best audio stream of a single video and transcode it on the fly
+
+    yt-dlp writes the selected format to stdout while ffmpeg reads it from a
+    pipe, so transcoding overlaps with the transfer and the source is never
+    written to disk. Returns the output path, or None if streaming did not
+    succeed (e.g. no streamable format exists), in which case the caller
+    should fall back to the regular download-then-convert path. If
+    error_tail (e.g. a bounded deque) is given, yt-dlp's stderr lines are
+    appended to it, to classify a failure.
+    """
+    output_dir = Path(output_dir)
+    fd, title_log = tempfile.mkstemp(prefix='media-downloader-', suffix='.title')
+    os.close(fd)
+    # ffmpeg creates this itself, so the file gets normal permissions
+    partial_path = str(output_dir / f".stream-{uuid.uuid4().hex}.{format}")
+
+    cmd = [yt_dlp_path]
+    if extra_args:
+        cmd.extend(extra_args)
+    cmd.extend([
+        "--no-playlist",
+        "-f", STREAMABLE_FORMAT,
+        # %(title)S is the title sanitized for use as a filename
+        "--print-to-file", "video:%(title)S", title_log,
+        "-o", "-",
+        url
+    ])
+    ffmpeg_cmd = [
+        ffmpeg_path, "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-vn",
+        "-y", partial_path
+    ]
+
+    try:
+        downloader = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE if error_tail is not None else None)
+        errors = None
+        if error_tail is not None:
+            errors = tee_stderr(io.TextIOWrapper(downloader.stderr, encoding='utf-8', errors='replace'),
+                                error_tail)
+        transcoder = subprocess.Popen(ffmpeg_cmd, stdin=downloader.stdout)
+        # Let ffmpeg own the read end so yt-dlp sees a broken pipe if ffmpeg dies
+        downloader.stdout.close()
+        transcoder_code = transcoder.wait()
+        downloader_code = downloader.wait()
+        if errors:
+            errors.join()
+
+        if downloader_code != 0 or transcoder_code != 0:
+            return None
+        if not os.path.exists(partial_path) or not os.path.getsize(partial_path):
+            return None
+
+        with open(title_log, 'r') as f:
+            title = f.readline().strip() or "audio"
+        final_path = output_dir / f"{title}.{format}"
+        os.replace(partial_path, final_path)
+        return final_path
+    finally:
+        os.unlink(title_log)
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
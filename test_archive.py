@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+from archive import DownloadArchive, media_key_from_url
+
+
+def test_media_key_from_url():
+    assert media_key_from_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ') == ('youtube', 'dQw4w9WgXcQ')
+    assert media_key_from_url('youtu.be/dQw4w9WgXcQ') == ('youtube', 'dQw4w9WgXcQ')
+    assert media_key_from_url('https://youtube.com/shorts/dQw4w9WgXcQ') == ('youtube', 'dQw4w9WgXcQ')
+    assert media_key_from_url('https://www.instagram.com/p/ABC123/') == ('instagram', 'ABC123')
+    assert media_key_from_url('https://www.instagram.com/reel/XYZ789') == ('instagram', 'XYZ789')
+    # Playlists and profiles expand to many items, so they have no single key
+    assert media_key_from_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123') is None
+    assert media_key_from_url('https://www.instagram.com/drmbt') is None
+    assert media_key_from_url('https://example.com/video.mp4') is None
+
+
+def test_archive_roundtrip(tmp_path):
+    path = tmp_path / 'archive.txt'
+    archive = DownloadArchive(path)
+    assert not archive.has('youtube', 'dQw4w9WgXcQ')
+
+    archive.add('youtube', 'dQw4w9WgXcQ')
+    archive.add('youtube', 'dQw4w9WgXcQ')
+    assert ('youtube', 'dQw4w9WgXcQ') in archive
+    assert path.read_text() == 'youtube dQw4w9WgXcQ\n'
+
+    # A fresh instance loads the existing log
+    assert DownloadArchive(path).has('youtube', 'dQw4w9WgXcQ')
+
+
+def test_archive_picks_up_external_appends(tmp_path):
+    path = tmp_path / 'archive.txt'
+    archive = DownloadArchive(path)
+
+    # Simulate yt-dlp appending to the same file, including a partial line
+    with open(path, 'a') as f:
+        f.write('instagram ABC123\ninstagram DEF')
+    assert archive.has('instagram', 'ABC123')
+    assert not archive.has('instagram', 'DEF')
+
+    with open(path, 'a') as f:
+        f.write('456\n')
+    assert archive.has('instagram', 'DEF456')
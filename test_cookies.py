@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+from cookies import load_jar, read_jar
+from convert_cookies import convert_cookies
+
+
+def test_convert_streams_devtools_export(tmp_path):
+    export = tmp_path / "export.txt"
+    export.write_text(
+        "sessionid\tabc\t.instagram.com\t/\t2099-01-01T00:00:00.000Z\t41\t✓\t✓\n"
+        "csrftoken\tsessionid\t.instagram.com\t/\tSession\t20\t\t✓\n"
+        "old\tx\t.instagram.com\t/\t2001-01-01T00:00:00.000Z\t4\t\t\n"
+        "garbage line\n",
+        encoding='utf-8'
+    )
+    output = tmp_path / "cookies.txt"
+    jar = convert_cookies(export, output)
+
+    assert jar.expired == 1
+    assert jar.get('instagram.com', 'sessionid') == 'abc'
+    assert jar.get('.instagram.com', 'csrftoken') == 'sessionid'
+    lines = [line for line in output.read_text(encoding='utf-8').splitlines() if line and not line.startswith('#')]
+    assert lines == [
+        ".instagram.com\tTRUE\t/\tTRUE\t4070908800\tsessionid\tabc",
+        ".instagram.com\tTRUE\t/\tFALSE\t0\tcsrftoken\tsessionid",
+    ]
+    # The converted file reads back to the same cookies
+    assert read_jar(output).for_domain('www.instagram.com') == {'sessionid': 'abc', 'csrftoken': 'sessionid'}
+
+
+def test_lookup_by_domain(tmp_path):
+    path = tmp_path / "jar.txt"
+    path.write_text(
+        "# Netscape HTTP Cookie File\n"
+        ".instagram.com\tTRUE\t/\tTRUE\t0\tsessionid\tparent\n"
+        "#HttpOnly_www.instagram.com\tFALSE\t/\tTRUE\t0\tsessionid\thost\n"
+        ".youtube.com\tTRUE\t/\tTRUE\t0\tsessionid\tother\n"
+        ".notinstagram.com\tTRUE\t/\tTRUE\t0\tmid\tnope\n"
+        f".instagram.com\tTRUE\t/\tTRUE\t{int(time.time()) - 10}\tmid\texpired\n"
+    )
+    jar = read_jar(path)
+    assert len(jar) == 4
+    assert jar.expired == 1
+    assert jar.for_domain('www.instagram.com') == {'sessionid': 'host'}
+    assert jar.for_domain('instagram.com') == {'sessionid': 'parent'}
+    assert jar.for_domain('music.youtube.com', ['sessionid', 'mid']) == {'sessionid': 'other'}
+
+
+def test_load_jar_cached_until_file_changes(tmp_path):
+    path = tmp_path / "jar.txt"
+    path.write_text(".instagram.com\tTRUE\t/\tTRUE\t0\tsessionid\tone\n")
+    jar = load_jar(path)
+    assert load_jar(path) is jar
+
+    path.write_text(".instagram.com\tTRUE\t/\tTRUE\t0\tsessionid\ttwo\n")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+    assert load_jar(path).get('instagram.com', 'sessionid') == 'two'
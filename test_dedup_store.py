@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import os
+
+from dedup_store import ContentStore, find_duplicates, hash_file
+
+
+def test_ingest_links_identical_files(tmp_path):
+    store = ContentStore(tmp_path)
+    first = tmp_path / "a.mp4"
+    second = tmp_path / "sub" / "b.mp4"
+    second.parent.mkdir()
+    first.write_bytes(b"x" * 1000)
+    second.write_bytes(b"x" * 1000)
+
+    digest, saved = store.ingest(first)
+    assert saved == 0
+    assert digest == hash_file(first)
+    digest_b, saved = store.ingest(second)
+    assert (digest_b, saved) == (digest, 1000)
+    assert os.stat(first).st_ino == os.stat(second).st_ino == os.stat(store.blob_path(digest)).st_ino
+
+    # Ingesting a path again saves nothing and keeps one manifest entry per path
+    assert store.ingest(second) == (digest, 0)
+    assert store.manifest() == {'a.mp4': (digest, 1000), os.path.join('sub', 'b.mp4'): (digest, 1000)}
+
+
+def test_find_duplicates_compares_same_size_files(tmp_path):
+    (tmp_path / "a").write_bytes(b"1" * 100000)
+    (tmp_path / "b").write_bytes(b"1" * 100000)
+    # Same size and first 64 KB, different tail
+    (tmp_path / "c").write_bytes(b"1" * 99999 + b"2")
+    (tmp_path / "d").write_bytes(b"small")
+    os.link(tmp_path / "a", tmp_path / "a-link")
+    os.mkdir(tmp_path / ".store")
+    (tmp_path / ".store" / "e").write_bytes(b"1" * 100000)
+
+    groups = find_duplicates(tmp_path)
+    assert len(groups) == 1
+    size, paths = groups[0]
+    assert size == 100000
+    assert len(paths) == 2
+    assert os.path.basename(sorted(paths)[-1]) == "b"
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import re
+import sys
+import types
 
 def is_profile_url(url):
     """Check if URL is an Instagram profile URL"""
@@ -33,4 +35,20 @@ for url in test_urls:
     print(f"URL: {url}")
     print(f"  Is profile: {is_profile_url(url)}")
     print(f"  Username: {extract_username(url)}")
-    print()
\ No newline at end of file
+    print()
+
+def test_profile_falls_back_to_yt_dlp_when_instaloader_setup_fails(tmp_path, fake_tool, media_downloader,
+                                                                   monkeypatch):
+    class Instaloader:
+        def __init__(self, **kwargs):
+            raise RuntimeError("instaloader setup failed")
+
+    monkeypatch.setitem(sys.modules, 'instaloader', types.SimpleNamespace(Instaloader=Instaloader))
+    calls = tmp_path / "calls"
+    yt_dlp = fake_tool("yt-dlp", f"import sys\nopen({str(calls)!r}, 'a').write(sys.argv[-1] + '\\n')\n")
+    monkeypatch.setattr(media_downloader.MediaDownloader, '_ensure_yt_dlp', lambda self: yt_dlp)
+    monkeypatch.setattr(media_downloader.InstagramDownloader, '_ensure_instaloader', lambda self: True)
+
+    downloader = media_downloader.InstagramDownloader(tmp_path / "out")
+    downloader.download_profile("https://www.instagram.com/someone/")
+    assert calls.read_text() == "https://www.instagram.com/someone/\n"
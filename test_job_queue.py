@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import subprocess
+import sys
+
+from job_queue import JobQueue, YtDlpJobTracker, DONE, FAILED
+
+
+def test_claim_complete_and_retry(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.sqlite', 'profile:bob', max_attempts=2)
+    queue.add('instagram A')
+    assert queue.claim('instagram A')
+    # A leased item cannot be claimed twice
+    assert not queue.claim('instagram A')
+    queue.complete('instagram A')
+    assert queue.is_done('instagram A')
+    assert not queue.claim('instagram A')
+
+    assert queue.claim('instagram B')
+    queue.fail('instagram B', 'boom')
+    assert queue.claim_pending() == [('instagram B', None)]
+    queue.fail('instagram B', 'boom again')
+    # Out of attempts
+    assert queue.claim_pending() == []
+    assert queue.counts() == {DONE: 1, FAILED: 1}
+
+    # Jobs in the same database are independent
+    assert JobQueue(tmp_path / 'jobs.sqlite', 'profile:alice').counts() == {}
+
+
+def test_crashed_worker_items_resume(tmp_path):
+    path = tmp_path / 'jobs.sqlite'
+    # A process that claims an item and dies without finishing it
+    subprocess.run([sys.executable, '-c', (
+        "from job_queue import JobQueue; "
+        f"q = JobQueue({str(path)!r}, 'playlist:PL1'); q.claim('youtube X'); q.add('youtube Y')"
+    )], check=True)
+
+    queue = JobQueue(path, 'playlist:PL1')
+    assert sorted(item for item, _ in queue.claim_pending()) == ['youtube X', 'youtube Y']
+
+
+def test_tracker_records_yt_dlp_items(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.sqlite', 'playlist:PL1')
+    queue.add('youtube AAAAAAAAAAA')
+    queue.complete('youtube AAAAAAAAAAA')
+
+    tracker = YtDlpJobTracker(queue)
+    args = tracker.args()
+    archive = args[args.index('--download-archive') + 1]
+    with open(archive) as f:
+        assert f.read() == 'youtube AAAAAAAAAAA\n'
+
+    # What yt-dlp writes through --print-to-file during the run
+    started = args[args.index('video:%(extractor_key)s %(id)s') + 1]
+    finished = args[args.index('after_move:%(extractor_key)s %(id)s') + 1]
+    with open(started, 'w') as f:
+        f.write('Youtube BBBBBBBBBBB\nYoutube CCCCCCCCCCC\n')
+    with open(finished, 'w') as f:
+        f.write('Youtube BBBBBBBBBBB\n')
+
+    assert tracker.collect() == (1, 1)
+    tracker.cleanup()
+    assert queue.is_done('youtube BBBBBBBBBBB')
+    assert queue.items(FAILED) == ['youtube CCCCCCCCCCC']
+
+
+def test_tracker_leaves_a_user_archive_in_charge(tmp_path, media_downloader, monkeypatch):
+    monkeypatch.setattr(media_downloader.MediaDownloader, '_ensure_yt_dlp', lambda self: "yt-dlp")
+    downloader = media_downloader.MediaDownloader(tmp_path / "out")
+    for extra_args in (["--download-archive", "mine.txt"], ["--download-archive=mine.txt"]):
+        tracker = downloader._job_tracker("youtube-playlist:PL1", extra_args)
+        assert "--download-archive" not in tracker.args()
+        tracker.cleanup()
+        tracker.queue.close()
+    tracker = downloader._job_tracker("youtube-playlist:PL1", ["-q"])
+    assert "--download-archive" in tracker.args()
+    tracker.cleanup()
+    tracker.queue.close()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+
+from media_api import Downloader, DownloadError
+from ratelimit import RetryScheduler
+
+# Stand-in for yt-dlp: "writes" the URL's last path segment and reports it like
+# --print-to-file after_move would; "missing" fails with a 404, "slow" hangs
+FAKE_YT_DLP = """
+import sys, time
+args = sys.argv[1:]
+url = args[-1]
+name = url.rsplit('/', 1)[-1]
+if name == 'missing':
+    print('ERROR: [generic] Unable to download webpage: HTTP Error 404: Not Found', file=sys.stderr)
+    sys.exit(1)
+if name == 'slow':
+    time.sleep(60)
+output = args[args.index('-o') + 1].replace('%(title)s.%(ext)s', name + '.wav')
+open(output, 'w').write('audio')
+log = args[args.index('--print-to-file') + 2]
+open(log, 'a').write(f'Generic {name}\\t12.5\\t{output}\\n')
+"""
+
+
+@pytest.fixture
+def downloader(tmp_path, fake_tool):
+    yt_dlp = fake_tool("yt-dlp", FAKE_YT_DLP)
+    return Downloader(tmp_path, yt_dlp_path=yt_dlp, retry=RetryScheduler(max_retries=0))
+
+
+def test_download_returns_structured_result(downloader, tmp_path):
+    result = asyncio.run(downloader.download("http://example.com/song"))
+    assert result.ok and result.attempts == 1
+    [media] = result.files
+    assert (media.path, media.size, media.media_id, media.duration) == (str(tmp_path / "song.wav"), 5, "generic song", 12.5)
+
+
+def test_failures_are_classified(downloader):
+    with pytest.raises(DownloadError) as error:
+        asyncio.run(downloader.download("http://example.com/missing"))
+    assert error.value.kind == 'unavailable'
+    assert error.value.result.files == []
+
+    results = asyncio.run(downloader.download_many(["http://example.com/a", "http://example.com/missing"]))
+    assert [r.ok for r in results] == [True, False]
+    assert results[1].error.kind == 'unavailable'
+
+
+def test_reused_across_event_loops(downloader):
+    # One slot, so the second download of each run waits on the semaphore
+    downloader.max_concurrency = 1
+    for _ in range(2):
+        results = asyncio.run(downloader.download_many(["http://example.com/a", "http://example.com/b"]))
+        assert [r.ok for r in results] == [True, True]
+
+
+def test_timeout_kills_the_download(downloader):
+    async def run():
+        start = asyncio.get_running_loop().time()
+        with pytest.raises(DownloadError) as error:
+            await downloader.download("http://example.com/slow", timeout=0.5)
+        return error.value.kind, asyncio.get_running_loop().time() - start
+
+    kind, elapsed = asyncio.run(run())
+    assert kind == 'timeout'
+    assert elapsed < 10
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import json
+import os
+
+from media_index import MediaIndex
+
+
+def test_record_lookup_and_count(tmp_path):
+    index = MediaIndex(tmp_path)
+    (tmp_path / "bob").mkdir()
+    (tmp_path / "bobby").mkdir()
+    for name in ("bob/1.jpg", "bob/1.json", "bob/2.mp4", "bobby/3.mp4"):
+        (tmp_path / name).write_bytes(b"data")
+    index.record(tmp_path / "bob" / "1.jpg", ('Instagram', 'SC1'))
+    index.record(tmp_path / "bob" / "2.mp4", ('instagram', 'SC2'), duration=9.5, sha256="ab" * 32)
+    index.record(tmp_path / "bobby" / "3.mp4", ('instagram', 'SC3'))
+
+    assert index.lookup('instagram', 'SC1') == [tmp_path / "bob" / "1.jpg"]
+    assert index.count("bob") == 2
+    assert index.count() == 3
+    assert [row[:2] for row in index.entries("bob")] == [
+        (os.path.join("bob", "1.jpg"), "instagram SC1"),
+        (os.path.join("bob", "2.mp4"), "instagram SC2"),
+    ]
+
+    # Files removed from disk no longer count as downloaded
+    os.unlink(tmp_path / "bob" / "1.jpg")
+    assert not index.has('instagram', 'SC1')
+    index.close()
+
+
+def test_rebuild_keeps_known_entries_and_reads_info_json(tmp_path):
+    index = MediaIndex(tmp_path)
+    (tmp_path / "a.mp4").write_bytes(b"a")
+    index.record(tmp_path / "a.mp4", ('generic', 'a'), duration=3.0)
+    (tmp_path / "b.webm").write_bytes(b"bb")
+    (tmp_path / "b.info.json").write_text(json.dumps({'id': 'vid', 'extractor_key': 'Youtube', 'duration': 7}))
+    (tmp_path / "notes.txt").write_text("not media")
+    index.record(tmp_path / "notes.txt")
+    os.unlink(tmp_path / "notes.txt")
+
+    assert index.rebuild() == (2, 1)
+    entries = {row[0]: row for row in index.entries()}
+    assert entries["a.mp4"][1:] == ("generic a", 1, None, 3.0)
+    assert entries["b.webm"][1:] == ("youtube vid", 2, None, 7)
+    index.close()
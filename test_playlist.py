@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+
+import pytest
+
+from job_queue import DONE, FAILED
+from playlist import entry_filename, flatten_playlist, parse_flat_playlist
+
+CHANNEL = {
+    'extractor_key': 'YoutubeTab',
+    'entries': [
+        {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': 'https://www.youtube.com/@chan/videos'},
+        {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': 'https://www.youtube.com/@chan/shorts'},
+    ],
+}
+
+TABS = {
+    'https://www.youtube.com/@chan/videos': {'entries': [
+        {'_type': 'url', 'ie_key': 'Youtube', 'id': 'aaaaaaaaaaa', 'url': 'https://www.youtube.com/watch?v=aaaaaaaaaaa',
+         'title': 'First'},
+        {'_type': 'url', 'ie_key': 'Youtube', 'id': 'bbbbbbbbbbb', 'title': 'Second'},
+    ]},
+    'https://www.youtube.com/@chan/shorts': {'entries': [
+        {'_type': 'url', 'ie_key': 'Youtube', 'id': 'ccccccccccc', 'url': 'https://www.youtube.com/shorts/ccccccccccc'},
+        {'_type': 'url', 'ie_key': 'Youtube', 'id': 'aaaaaaaaaaa', 'url': 'https://www.youtube.com/watch?v=aaaaaaaaaaa'},
+        None,
+    ]},
+}
+
+
+def test_parse_flat_playlist_expands_tabs_in_order():
+    entries = parse_flat_playlist(CHANNEL, expand=TABS.__getitem__)
+    assert [(e.index, e.media_id, e.item) for e in entries] == [
+        (1, 'aaaaaaaaaaa', 'youtube aaaaaaaaaaa'),
+        (2, 'bbbbbbbbbbb', 'youtube bbbbbbbbbbb'),
+        (3, 'ccccccccccc', 'youtube ccccccccccc'),
+    ]
+    # Entries without a URL get the watch URL for their id
+    assert entries[1].url == 'https://www.youtube.com/watch?v=bbbbbbbbbbb'
+
+
+def test_entry_filename_sorts_by_playlist_index():
+    [entry] = parse_flat_playlist({'entries': [{'id': 'x', 'url': 'https://example.com/x'}]})
+    assert entry_filename(entry, 9) == "01 - %(title)s.%(ext)s"
+    assert entry_filename(entry, 500) == "001 - %(title)s.%(ext)s"
+
+
+def test_flatten_playlist_lists_each_tab_once(tmp_path, fake_tool):
+    listings = dict(TABS, **{'https://www.youtube.com/@chan': CHANNEL})
+    calls = tmp_path / "calls"
+    yt_dlp = fake_tool(
+        "yt-dlp",
+        "import json, sys\n"
+        f"open({str(calls)!r}, 'a').write(' '.join(sys.argv[1:]) + '\\n')\n"
+        f"print(json.dumps(json.loads({json.dumps(listings)!r})[sys.argv[-1]]))\n"
+    )
+
+    entries = flatten_playlist(yt_dlp, 'https://www.youtube.com/@chan', ['--cookies', 'c.txt', '-F'])
+    assert [e.media_id for e in entries] == ['aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc']
+    lines = calls.read_text().splitlines()
+    assert len(lines) == 3
+    assert all(line.startswith("--flat-playlist --dump-single-json --no-warnings --cookies c.txt ") for line in lines)
+
+
+def test_failing_entries_do_not_abort_the_playlist(tmp_path, fake_tool, media_downloader, monkeypatch):
+    playlist = {'entries': [{'ie_key': 'Youtube', 'id': media_id, 'title': media_id}
+                            for media_id in ('aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc')]}
+    yt_dlp = fake_tool("yt-dlp", f"print({json.dumps(json.dumps(playlist))})\n")
+    monkeypatch.setattr(media_downloader.MediaDownloader, '_ensure_yt_dlp', lambda self: yt_dlp)
+
+    def download_entry(self, entry, *args):
+        if entry.media_id == 'aaaaaaaaaaa':
+            sys.exit(1)
+        if entry.media_id == 'bbbbbbbbbbb':
+            raise OSError("disk full")
+
+    monkeypatch.setattr(media_downloader.YouTubeDownloader, '_download_entry', download_entry)
+    downloader = media_downloader.YouTubeDownloader(tmp_path / "out", playlist_workers=2)
+    url = "https://www.youtube.com/playlist?list=PLx"
+    route = media_downloader.route_url(url)
+    with pytest.raises(SystemExit):
+        downloader._download_playlist(url, route, True, "mp3", False, None)
+
+    queue = downloader._job_queue(f"youtube-playlist:{route.id}")
+    assert sorted(queue.items(FAILED)) == ['youtube aaaaaaaaaaa', 'youtube bbbbbbbbbbb']
+    assert queue.items(DONE) == ['youtube ccccccccccc']
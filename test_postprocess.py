@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+from postprocess import FileListWatcher, PostProcessPool, StageMetrics, audio_output_path
+from staging import ScratchStaging
+
+
+def test_pool_converts_and_removes_source(tmp_path, fake_tool):
+    # Stand-in for ffmpeg: copies the -i input to the last argument
+    ffmpeg = fake_tool("ffmpeg", "import shutil, sys\n"
+                                 "shutil.copy(sys.argv[sys.argv.index('-i') + 1], sys.argv[-1])\n")
+    source = tmp_path / "song.webm"
+    source.write_bytes(b"audio")
+
+    pool = PostProcessPool(ffmpeg, workers=2)
+    stored = []
+    paths = pool.submit(source, "mp3", on_done=stored.extend).result()
+    assert paths == [str(tmp_path / "song.mp3")] == stored
+    assert not source.exists()
+    assert pool.take(source) is not None and pool.take(source) is None
+    assert pool.metrics.report()['jobs'] == 1
+    pool.shutdown()
+
+    assert audio_output_path("a/b.webm", "vorbis").name == "b.ogg"
+
+
+def test_stage_metrics_and_file_watcher(tmp_path):
+    metrics = StageMetrics('download', 2)
+    metrics.queued()
+    metrics.queued()
+    metrics.started()
+    time.sleep(0.05)
+    metrics.finished()
+    stats = metrics.report()
+    assert (stats['jobs'], stats['max_depth']) == (1, 2)
+    assert 0.4 < stats['utilization'] <= 0.5
+
+    log = tmp_path / "files"
+    seen = []
+    watcher = FileListWatcher(str(log), seen.append, interval=0.01)
+    watcher.start()
+    with open(log, 'w') as f:
+        f.write("/a.webm\n/b.we")
+        f.flush()
+        time.sleep(0.05)
+        assert seen == ["/a.webm"]
+        f.write("bm\n")
+    watcher.stop()
+    assert seen == watcher.lines == ["/a.webm", "/b.webm"]
+    os.unlink(log)
+
+
+def test_failed_conversion_closes_its_scratch_job(tmp_path, fake_tool, media_downloader, monkeypatch):
+    monkeypatch.setattr(media_downloader.MediaDownloader, '_ensure_yt_dlp', lambda self: "yt-dlp")
+    ffmpeg = fake_tool("ffmpeg", "import sys\nsys.exit(1)\n")
+    pool = PostProcessPool(ffmpeg, workers=1)
+    staging = ScratchStaging(tmp_path / "scratch")
+    downloader = media_downloader.MediaDownloader(tmp_path / "out", postprocess_pool=pool, staging=staging)
+
+    job_dir = staging.open_job("https://example.com/v")
+    source = os.path.join(job_dir, "song.webm")
+    with open(source, 'wb') as f:
+        f.write(b"audio")
+    future = downloader._postprocess(source, "mp3", False, job_dir=job_dir, final_dir=str(tmp_path / "out"))
+    staging.close_job(job_dir)
+    assert not downloader._wait_postprocessing([source])
+    pool.shutdown()
+
+    # The download is left for the user and the scratch directory is gone
+    assert future.exception() is not None
+    assert os.listdir(tmp_path / "out") == ["song.webm"]
+    assert not os.path.exists(job_dir)
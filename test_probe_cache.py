@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+from probe_cache import ProbeCache, cache_key
+
+
+def test_cache_key_normalizes_urls():
+    assert cache_key('https://youtu.be/dQw4w9WgXcQ') == cache_key('https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+    assert cache_key('https://WWW.Example.com/video/#t=10') == cache_key('https://example.com/video')
+    assert cache_key('https://example.com/a?x=1') != cache_key('https://example.com/a?x=2')
+
+
+def test_cache_key_covers_extraction_args(tmp_path):
+    url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    jar = tmp_path / 'cookies.txt'
+    jar.write_text("# Netscape HTTP Cookie File\n")
+    with_cookies = cache_key(url, ["--cookies", str(jar)])
+    assert with_cookies != cache_key(url)
+    assert 'cookies' not in with_cookies
+    # Output-side options such as per-run files and rate caps do not split the cache
+    assert cache_key(url, ["--cookies", str(jar), "--limit-rate", "1M", "--print-to-file", "x", "run.log"]) \
+        == with_cookies
+    assert cache_key(url, ["--cookies=" + str(jar)]) == with_cookies
+    assert cache_key(url, ["-f", "bestaudio"]) != cache_key(url)
+    # A rewritten jar misses what was probed with the old one
+    os.utime(jar, (1, 1))
+    assert cache_key(url, ["--cookies", str(jar)]) != with_cookies
+
+    cache = ProbeCache(tmp_path / 'probe')
+    cache.put(url, '{"id": "anonymous"}')
+    assert cache.get(url, ["--cookies", str(jar)]) is None
+
+
+def test_ttl_and_lru_eviction(tmp_path):
+    cache = ProbeCache(tmp_path, ttl=60, max_bytes=25)
+    cache.put('https://example.com/a', '{"id": "a"}')
+    assert cache.get('https://example.com/a') == '{"id": "a"}'
+
+    # Entries past the TTL are misses
+    old = time.time() - 120
+    os.utime(cache.entry_path('https://example.com/a'), (old, old))
+    assert cache.lookup('https://example.com/a') is None
+
+    cache.put('https://example.com/b', '{"id": "b"}')
+    cache.put('https://example.com/c', '{"id": "c"}')
+    # Reading b makes c the least recently used once d pushes the cache over max_bytes
+    os.utime(cache.entry_path('https://example.com/c'), (time.time() - 30, time.time()))
+    cache.get('https://example.com/b')
+    cache.put('https://example.com/d', '{"id": "d"}')
+    assert not cache.entry_path('https://example.com/a').exists()
+    assert cache.lookup('https://example.com/b') is not None
+    assert cache.lookup('https://example.com/c') is None
+    assert cache.lookup('https://example.com/d') is not None
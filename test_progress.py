@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT = Path(__file__).with_name("media-downloader.py")
+
+# Stand-in for yt-dlp: one progress update, regular output on stdout and stderr, then the file
+FAKE_YT_DLP = """
+import json, sys
+args = sys.argv[1:]
+out = args[args.index('-o') + 1].replace('%(title)s', 'song').replace('%(ext)s', 'wav')
+print('[youtube] aaaaaaaaaaa: Downloading webpage')
+print('MDPROGRESS ' + json.dumps({'download': {'status': 'finished', 'filename': out, 'downloaded_bytes': 5}}))
+print('WARNING: chatty', file=sys.stderr)
+open(out, 'w').write('audio')
+for i, arg in enumerate(args):
+    if arg == '--print-to-file':
+        open(args[i + 2], 'a').write('Youtube aaaaaaaaaaa\\t1\\t' + out + '\\n')
+"""
+
+
+def test_progress_json_stdout_is_only_events(tmp_path, fake_tool):
+    yt_dlp = fake_tool("yt-dlp", FAKE_YT_DLP)
+    env = dict(os.environ, PATH=os.path.dirname(yt_dlp) + os.pathsep + os.environ['PATH'],
+               XDG_CACHE_HOME=str(tmp_path / "cache"))
+    result = subprocess.run(
+        [sys.executable, str(SCRIPT), "--progress-json", "--postprocess-workers", "0", "--probe-ttl", "0",
+         "-o", str(tmp_path / "out"), "https://www.youtube.com/watch?v=aaaaaaaaaaa"],
+        cwd=tmp_path, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    events = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [event['phase'] for event in events] == ['start', 'finished', 'done']
+    assert "Download completed successfully!" in result.stderr
+    assert "Downloading webpage" in result.stderr
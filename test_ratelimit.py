@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from ratelimit import AdaptiveRateLimiter, HostRateLimiters, RetryScheduler, classify_error, parse_host_rates
+
+
+def test_classify_error():
+    assert classify_error(["ERROR: [generic] x: HTTP Error 429: Too Many Requests"]) == 'throttled'
+    assert classify_error(["ERROR: unable to download video data: <urlopen error timed out>"]) == 'transient'
+    assert classify_error(["ERROR: [youtube] abc: Video unavailable"]) is None
+    # Warnings are ignored once there is an actual error line
+    assert classify_error(["WARNING: rate limit approaching", "ERROR: Unsupported URL"]) is None
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        AdaptiveRateLimiter(0)
+
+
+def test_adaptive_rate_halves_on_throttle_and_recovers():
+    limiter = AdaptiveRateLimiter(2.0, min_rate=0.5, max_rate=3.0, increase=0.5)
+    assert limiter.throttled() == 1.0
+    assert limiter.throttled() == 0.5
+    assert limiter.throttled() == 0.5
+    for _ in range(10):
+        limiter.succeeded()
+    assert limiter.rate == 3.0
+
+
+def test_host_limiters_are_shared_per_site():
+    limiters = HostRateLimiters(rates={'instagram.com': 0.5})
+    assert limiters.for_url('https://www.instagram.com/p/ABC/') is limiters.get('instagram.com')
+    assert limiters.get('instagram.com').rate == 0.5
+    assert limiters.for_url('https://youtu.be/x').rate == limiters.default_rate
+    assert list(limiters.report()) == ['instagram.com', 'youtu.be']
+
+    assert parse_host_rates(['www.instagram.com=0.25']) == {'instagram.com': 0.25}
+    with pytest.raises(ValueError):
+        parse_host_rates(['instagram.com=fast'])
+
+
+def test_retry_schedule():
+    retry = RetryScheduler(max_retries=2, base=1.0, throttle_base=10.0, cap=30.0)
+    assert retry.should_retry(0, 'transient')
+    assert not retry.should_retry(2, 'throttled')
+    assert not retry.should_retry(0, None)
+    assert 5.0 <= retry.delay(0, 'throttled') <= 10.0
+    assert retry.delay(5, 'throttled') <= 30.0
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import json
+import time
+
+import pytest
+
+from batch import BatchResult, BatchRunner, parse_batch_line
+from scheduler import (BandwidthBudget, ScheduledQueue, SizeEstimator, cap_rate_limit, priority_weight,
+                       split_rate_limit, upcoming_weight)
+
+
+def test_parse_batch_line():
+    assert parse_batch_line("https://youtu.be/a") == ("https://youtu.be/a", 0)
+    assert parse_batch_line("https://youtu.be/a  -2") == ("https://youtu.be/a", -2)
+    with pytest.raises(ValueError):
+        parse_batch_line("https://youtu.be/a high")
+
+
+def test_bandwidth_budget_shares():
+    budget = BandwidthBudget(1000)
+    # One of four slots filled, three queued jobs about to join it
+    first = budget.allocate(1.0, upcoming=3)
+    assert first == 250
+    urgent = budget.allocate(priority_weight(2), upcoming=0)
+    # Its 800 share, limited to what is left
+    assert urgent == 750
+    # Nothing left: half of its 166 share
+    assert budget.allocate(1.0) == 83
+    budget.release(urgent, priority_weight(2))
+    budget.release(first)
+    assert budget.allocated == 83 and budget.weights == 1.0
+
+
+def test_upcoming_weight_takes_the_highest_priorities():
+    queued = {0: 5, 2: 1, -1: 2}
+    assert upcoming_weight(queued, 0) == 0
+    assert upcoming_weight(queued, 3) == priority_weight(2) + 2 * priority_weight(0)
+    assert upcoming_weight(queued, 10) == priority_weight(2) + 5 + 2 * priority_weight(-1)
+
+
+def test_split_rate_limit():
+    assert split_rate_limit(["--limit-rate", "4M", "-x"], 4) == ["--limit-rate", str(1024 ** 2), "-x"]
+    assert split_rate_limit(["-r", "1000"], 1) == ["-r", "1000"]
+
+
+def test_cap_rate_limit_keeps_the_lower_rate():
+    assert cap_rate_limit(["-x"], 5000) == ["-x", "--limit-rate", "5000"]
+    assert cap_rate_limit(["--limit-rate", "1K"], 5000) == ["--limit-rate", "1024"]
+    assert cap_rate_limit(["-r", "1M"], 5000) == ["-r", "5000"]
+
+
+def test_scheduled_queue_rekeys_learned_sizes():
+    estimator = SizeEstimator(probe=None)
+    queue = ScheduledQueue(estimator)
+    jobs = [BatchResult(index, f"u{index}", 'youtube') for index in range(4)]
+    for job in jobs:
+        queue.push(job)
+    # Unknown sizes count as the median of the known ones (300 here)
+    for index, size in ((1, 900), (3, 10), (0, 300)):
+        estimator.learn(f"u{index}", size)
+        queue.learn(jobs[index], size)
+    assert estimator.median() == 300
+    assert [queue.pop().index for _ in range(4)] == [3, 0, 2, 1]
+    assert len(queue) == 0 and queue.peek() is None
+    estimator.close()
+
+
+class RecordingDownloader:
+    def __init__(self):
+        self.started = []
+
+    def detect_platform(self, url):
+        return 'youtube'
+
+    def download(self, url, extra_args=None, **kwargs):
+        self.started.append((url, extra_args[extra_args.index("--limit-rate") + 1]))
+
+
+def test_batch_order_and_caps():
+    sizes = {'big': 9000, 'small': 10, 'mid': 500}
+    urls = [f"https://www.youtube.com/watch?v={name:x<11}" for name in ('big', 'small', 'mid', 'urgent')]
+
+    def probe(url):
+        name = url.split('v=')[1].rstrip('x')
+        return json.dumps({'requested_formats': [{'filesize': sizes[name]}]} if name in sizes else {})
+
+    estimator = SizeEstimator(probe, audio_only=False)
+    for url in urls:
+        estimator.submit(url)
+    deadline = time.monotonic() + 5
+    while len(estimator.sizes) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    downloader = RecordingDownloader()
+    runner = BatchRunner(downloader, max_workers=1, budget=BandwidthBudget(1000), estimator=estimator)
+    results = runner.run(urls, priorities=[0, 0, 0, 1])
+    assert [r.status for r in results] == ['ok'] * 4
+    # urgent has no size (it counts as the median) but outranks the rest; then smallest first
+    assert [url.split('v=')[1].rstrip('x') for url, _ in downloader.started] == ['urgent', 'small', 'mid', 'big']
+    assert {rate for _, rate in downloader.started} == {'1000'}
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import os
+
+from session_pool import SessionPool, read_session_cookies
+
+
+class FakeCookieJar(dict):
+    def set(self, name, value, domain=None):
+        self[name] = value
+
+
+class FakeContext:
+    """The parts of instaloader's InstaloaderContext the pool touches"""
+
+    def __init__(self, logins):
+        self._session = type('Session', (), {})()
+        self._session.cookies = FakeCookieJar()
+        self._session.headers = {}
+        self.username = None
+        self.logins = logins
+
+    def test_login(self):
+        self.logins.append(self._session.cookies['sessionid'])
+        return 'alice' if self._session.cookies['sessionid'] == 'good' else None
+
+
+def make_loader(logins):
+    return type('Instaloader', (), {'context': FakeContext(logins)})()
+
+
+def write_jar(path, sessionid):
+    path.write_text(
+        "# Netscape HTTP Cookie File\n"
+        f".instagram.com\tTRUE\t/\tTRUE\t0\tsessionid\t{sessionid}\n"
+        ".instagram.com\tTRUE\t/\tTRUE\t0\tcsrftoken\ttoken\n"
+        ".youtube.com\tTRUE\t/\tTRUE\t0\tsessionid\tother\n"
+    )
+
+
+def test_read_session_cookies(tmp_path):
+    write_jar(tmp_path / 'cookies.txt', 'good')
+    assert read_session_cookies(tmp_path / 'cookies.txt') == {'sessionid': 'good', 'csrftoken': 'token'}
+
+
+def test_sessions_are_validated_once_and_persisted(tmp_path):
+    good, bad = tmp_path / 'good.txt', tmp_path / 'bad.txt'
+    write_jar(good, 'good')
+    write_jar(bad, 'bad')
+    logins = []
+
+    pool = SessionPool([bad, good], path=tmp_path / 'sessions')
+    session = pool.acquire()
+    loader = make_loader(logins)
+    assert not pool.apply(session, loader)
+    session = pool.acquire()
+    assert pool.apply(session, loader)
+    assert loader.context.username == 'alice'
+    assert logins == ['bad', 'good']
+
+    # A new run reuses the validated session and skips the rejected jar
+    pool = SessionPool([bad, good], path=tmp_path / 'sessions')
+    session = pool.acquire()
+    assert session.cookie_file == str(good.resolve())
+    assert pool.apply(session, make_loader(logins))
+    assert logins == ['bad', 'good']
+
+    # After an auth error the session is checked again on its next use
+    pool.invalidate(session)
+    assert pool.apply(pool.acquire(), make_loader(logins))
+    assert logins == ['bad', 'good', 'good']
+
+    # A rewritten jar is parsed and validated again
+    write_jar(bad, 'good')
+    os.utime(bad, (1, 1))
+    pool = SessionPool([bad], path=tmp_path / 'sessions')
+    assert pool.apply(pool.acquire(), make_loader(logins))
+    assert logins[-1] == 'good' and len(logins) == 4
+
+
+def test_network_errors_do_not_reject_a_session(tmp_path):
+    write_jar(tmp_path / 'good.txt', 'good')
+
+    class OfflineContext(FakeContext):
+        def test_login(self):
+            raise ConnectionError("Connection reset by peer")
+
+    pool = SessionPool([tmp_path / 'good.txt'], path=tmp_path / 'sessions')
+    loader = type('Instaloader', (), {'context': OfflineContext([])})()
+    assert not pool.apply(pool.acquire(), loader)
+    # Skipped for this run only; nothing was saved against it
+    assert pool.acquire() is None
+    pool = SessionPool([tmp_path / 'good.txt'], path=tmp_path / 'sessions')
+    session = pool.acquire()
+    assert not session.rejected
+    assert pool.apply(session, make_loader([]))
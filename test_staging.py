@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+import pytest
+
+import staging
+from staging import DiskGuard, InsufficientSpaceError, ScratchStaging, expected_size, parse_size
+
+
+def test_parse_size():
+    assert parse_size("512") == 512
+    assert parse_size("10M") == 10 * 1024 ** 2
+    assert parse_size("1.5gb") == int(1.5 * 1024 ** 3)
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_expected_size_from_info():
+    info = {
+        'duration': 10,
+        'requested_formats': [{'filesize': 5000}, {'filesize_approx': 1000}],
+        'formats': [{'vcodec': 'none', 'acodec': 'opus', 'filesize': 300},
+                    {'vcodec': 'none', 'acodec': 'mp4a', 'filesize': 400},
+                    {'vcodec': 'avc1', 'acodec': 'none', 'filesize': 5000}],
+    }
+    assert expected_size(info) == 6000
+    assert expected_size(info, 'best') == 400
+    assert expected_size(info, 'mp3') == 800
+    assert expected_size(info, 'wav') == 400 + 10 * staging.WAV_BYTES_PER_SECOND
+    assert expected_size({'requested_formats': [{'filesize': 5000}, {}]}) is None
+
+
+def test_redirect_publish_and_sweep(tmp_path):
+    scratch = ScratchStaging(tmp_path / "scratch")
+    final = tmp_path / "out"
+    job_dir = scratch.open_job("https://example.com/v")
+    cmd, final_dir = scratch.redirect(
+        ["yt-dlp", "--print-to-file", "after_move:filepath", "files.log", "-o", str(final / "%(title)s.%(ext)s"),
+         "https://example.com/v"], job_dir)
+    assert cmd == ["yt-dlp", "-o", os.path.join(job_dir, "%(title)s.%(ext)s"), "https://example.com/v"]
+    assert final_dir == str(final)
+
+    for name in ("video.mp4", "video.mp3", "thumb.jpg", "next.mp4.part", ".video.1234.wav"):
+        with open(os.path.join(job_dir, name), 'w') as f:
+            f.write(name)
+    assert scratch.publish([os.path.join(job_dir, "video.mp4")], final_dir) == [str(final / "video.mp4")]
+    # video.mp3 shares its stem with a conversion still queued
+    assert scratch.sweep(job_dir, final_dir, keep=[os.path.join(job_dir, "video.webm")]) == [str(final / "thumb.jpg")]
+    assert sorted(os.listdir(final)) == ["thumb.jpg", "video.mp4"]
+    assert sorted(os.listdir(job_dir)) == [".video.1234.wav", "next.mp4.part", "video.mp3"]
+
+    # Partial files stay for the next run, so the directory is kept
+    scratch.close_job(job_dir)
+    assert os.path.isdir(job_dir)
+
+
+def test_disk_guard_waits_for_running_jobs(tmp_path, monkeypatch):
+    Usage = namedtuple('Usage', 'total used free')
+    monkeypatch.setattr(staging.shutil, 'disk_usage', lambda path: Usage(1000, 900, 100))
+    guard = DiskGuard([tmp_path], min_free=20, interval=0.05)
+
+    first = guard.admit(60)
+    waits = []
+    admitted = threading.Event()
+
+    def second():
+        guard.release(guard.admit(60, on_wait=lambda *args: waits.append(args)))
+        admitted.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    time.sleep(0.2)
+    assert not admitted.is_set()
+    assert waits == [(str(tmp_path), 40, 80)]
+    guard.release(first)
+    thread.join(5)
+    assert admitted.is_set()
+
+    # Nothing running that could free space: fail instead of waiting forever
+    with pytest.raises(InsufficientSpaceError):
+        guard.admit(500)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import io
+import json
+
+from progress import ProgressReporter
+from staging import ScratchStaging
+
+URL = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+
+# Stand-in for yt-dlp -o -: the title to --print-to-file, the media to stdout
+FAKE_YT_DLP = """
+import sys
+args = sys.argv[1:]
+open(args[args.index('--print-to-file') + 2], 'w').write('song\\n')
+sys.stdout.buffer.write(b'audio')
+"""
+
+# Stand-in for ffmpeg: copies stdin to the last argument
+FAKE_FFMPEG = """
+import shutil, sys
+with open(sys.argv[-1], 'wb') as f:
+    shutil.copyfileobj(sys.stdin.buffer, f)
+"""
+
+
+def make_downloader(tmp_path, fake_tool, media_downloader, monkeypatch, yt_dlp_source):
+    yt_dlp = fake_tool("yt-dlp", yt_dlp_source)
+    ffmpeg = fake_tool("ffmpeg", FAKE_FFMPEG)
+    monkeypatch.setattr(media_downloader.MediaDownloader, '_ensure_yt_dlp', lambda self: yt_dlp)
+    monkeypatch.setattr(media_downloader, 'resolve_tool', lambda name: ffmpeg)
+    events = io.StringIO()
+    downloader = media_downloader.MediaDownloader(tmp_path / "out", stream_audio=True,
+                                                  progress=ProgressReporter(events),
+                                                  staging=ScratchStaging(tmp_path / "scratch"))
+    return downloader, events
+
+
+def test_stream_goes_through_staging_and_reports_progress(tmp_path, fake_tool, media_downloader, monkeypatch):
+    downloader, events = make_downloader(tmp_path, fake_tool, media_downloader, monkeypatch, FAKE_YT_DLP)
+    assert downloader._try_stream_audio(URL, "wav", False, None, single_item=True)
+    assert (tmp_path / "out" / "song.wav").read_bytes() == b"audio"
+    assert list((tmp_path / "scratch").iterdir()) == []
+    assert [json.loads(line)['phase'] for line in events.getvalue().splitlines()] == ['start', 'done']
+    assert downloader.rate_limiters.for_url(URL).successes == 1
+
+
+def test_throttled_stream_falls_back_and_slows_the_host(tmp_path, fake_tool, media_downloader, monkeypatch):
+    throttled = "import sys\nprint('ERROR: HTTP Error 429: Too Many Requests', file=sys.stderr)\nsys.exit(1)\n"
+    downloader, events = make_downloader(tmp_path, fake_tool, media_downloader, monkeypatch, throttled)
+    downloader.retry.throttle_base = 0
+    assert not downloader._try_stream_audio(URL, "wav", False, None, single_item=True)
+    assert downloader.rate_limiters.for_url(URL).throttles == 1
+    [start, fallback] = [json.loads(line) for line in events.getvalue().splitlines()]
+    assert fallback['phase'] == 'fallback' and fallback['reason'] == 'throttled'
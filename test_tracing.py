@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+
+from tracing import NO_SPAN, Tracer, YtDlpPhases
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    assert tracer.span("probe") is NO_SPAN
+    with tracer.url("https://example.com/a"):
+        with tracer.span("probe"):
+            pass
+    assert tracer.spans == []
+
+
+def test_spans_follow_the_url_across_threads(tmp_path):
+    tracer = Tracer()
+    tracer.enable()
+
+    def convert():
+        with tracer.span("ffmpeg", file="a.webm"):
+            pass
+
+    with tracer.url("https://example.com/a"):
+        with tracer.span("probe"):
+            pass
+        thread = threading.Thread(target=tracer.wrap(convert))
+        thread.start()
+        thread.join()
+    with tracer.span("startup"):
+        pass
+
+    summary = tracer.summary()
+    assert set(summary["https://example.com/a"]) == {"download", "probe", "ffmpeg"}
+    assert set(summary[None]) == {"startup"}
+
+    tracer.write_json(tmp_path / "trace.json")
+    data = json.loads((tmp_path / "trace.json").read_text())
+    assert data['summary']["https://example.com/a"]["probe"]["count"] == 1
+    [ffmpeg] = [span for span in data['spans'] if span['name'] == 'ffmpeg']
+    assert ffmpeg['url'] == "https://example.com/a" and ffmpeg['attrs'] == {'file': 'a.webm'}
+
+    tracer.write_chrome_trace(tmp_path / "trace.chrome.json")
+    events = json.loads((tmp_path / "trace.chrome.json").read_text())['traceEvents']
+    phases = [event for event in events if event['ph'] == 'X']
+    assert len(phases) == 4
+    assert {event['args']['name'] for event in events if event['ph'] == 'M'} == {
+        threading.current_thread().name, thread.name}
+
+
+def test_yt_dlp_phases_from_progress_statuses():
+    tracer = Tracer()
+    tracer.enable()
+    phases = YtDlpPhases(tracer, "https://example.com/v")
+    phases({'status': 'downloading', 'filename': '/out/v.f137.mp4'})
+    phases({'status': 'finished', 'filename': '/out/v.f137.mp4'})
+    phases({'status': 'started', 'postprocessor': 'Merger'}, postprocess=True)
+    phases({'status': 'finished', 'postprocessor': 'Merger'}, postprocess=True)
+    phases({'status': 'started', 'postprocessor': 'ExtractAudio'}, postprocess=True)
+    phases.close()
+
+    spans = [(span.name, span.attrs) for span in tracer.finished_spans()]
+    assert spans == [("extract", {}), ("transfer", {'file': 'v.f137.mp4'}), ("yt-dlp Merger", {}),
+                     ("yt-dlp ExtractAudio", {})]
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+from url_router import Route, URLRouter, route_url, GENERIC
+
+
+def test_youtube_routes():
+    assert route_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ') == ('youtube', 'video', 'dQw4w9WgXcQ', None)
+    assert route_url('youtu.be/dQw4w9WgXcQ') == ('youtube', 'video', 'dQw4w9WgXcQ', None)
+    assert route_url('https://m.youtube.com/shorts/dQw4w9WgXcQ') == ('youtube', 'short', 'dQw4w9WgXcQ', None)
+    assert route_url('https://youtube.com/watch?v=dQw4w9WgXcQ&list=PL123') == ('youtube', 'playlist', 'PL123', None)
+    assert route_url('https://www.youtube.com/@somechannel/videos') == ('youtube', 'channel', None, 'somechannel')
+    # Still a YouTube URL even when the path is not recognized
+    assert route_url('https://www.youtube.com/feed/trending').platform == 'youtube'
+
+
+def test_instagram_routes():
+    assert route_url('https://www.instagram.com/p/ABC123/') == ('instagram', 'post', 'ABC123', None)
+    assert route_url('instagram.com/reel/XYZ789') == ('instagram', 'reel', 'XYZ789', None)
+    assert route_url('https://www.instagram.com/stories/drmbt/3141592653/') == ('instagram', 'story', '3141592653', 'drmbt')
+    assert route_url('https://www.instagram.com/drmbt/') == ('instagram', 'profile', None, 'drmbt')
+    assert route_url('https://www.instagram.com/explore') == ('instagram', 'page', None, None)
+
+
+def test_generic_and_custom_routes():
+    assert route_url('https://example.com/video.mp4') is GENERIC
+    assert route_url('https://notyoutube.com/watch?v=dQw4w9WgXcQ') is GENERIC
+
+    router = URLRouter()
+    router.register(['vimeo.com'], lambda host, path, query: Route('vimeo', 'video', path.strip('/'), None))
+    assert router.route('https://vimeo.com/76979871') == ('vimeo', 'video', '76979871', None)
+    assert router.route('https://www.youtube.com/watch?v=dQw4w9WgXcQ') is GENERIC
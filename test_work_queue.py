@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import sqlite3
+import threading
+
+import pytest
+
+from work_queue import QueueBusyError, RemoteWorkQueue, SQLiteWorkQueue, WorkQueueServer, partition_for
+
+
+def test_partition_affinity_and_lease_expiry(tmp_path):
+    queue = SQLiteWorkQueue(tmp_path / "work.sqlite", lease=60)
+    urls = [
+        "https://www.instagram.com/alice/",
+        "https://www.youtube.com/@alice",
+        "https://www.instagram.com/stories/Alice/123/",
+        "https://youtu.be/dQw4w9WgXcQ",
+    ]
+    assert partition_for(urls[0]) == partition_for(urls[2]) == "instagram:alice"
+    assert partition_for(urls[3]) is None
+    assert queue.enqueue(urls, options={'audio_only': False}) == 4
+    assert queue.enqueue(urls[:1]) == 0
+
+    first = queue.claim("w1")
+    assert first['url'] == urls[0] and first['options'] == {'audio_only': False}
+    # w2 may not take alice's other Instagram job while w1 holds the partition
+    assert [queue.claim("w2")['url'] for _ in range(2)] == [urls[1], urls[3]]
+    assert queue.claim("w2") is None
+    assert queue.claim("w1")['url'] == urls[2]
+
+    queue.complete(first['id'], "w1", {'bytes': 10})
+    queue.fail(first['id'], "w2", "not the owner")
+    assert queue.jobs()[0]['state'] == 'done' and queue.jobs()[0]['result'] == {'bytes': 10}
+    assert not queue.drained()
+
+    # A worker that stops heartbeating loses its jobs and partitions; w2's are still leased
+    queue.lease = -1
+    queue.heartbeat("w1")
+    assert queue.claim("w3")['url'] == urls[2]
+    assert queue.counts() == {'done': 1, 'in-flight': 3}
+    queue.close()
+
+
+def test_remote_queue_through_broker(tmp_path):
+    server = WorkQueueServer(('127.0.0.1', 0), SQLiteWorkQueue(tmp_path / "work.sqlite"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        remote = RemoteWorkQueue(f"http://127.0.0.1:{server.server_address[1]}")
+        assert remote.enqueue(["https://example.com/a.mp4"]) == 1
+        job = remote.claim("w1")
+        assert job['platform'] == 'generic' and job['partition'] is None
+        remote.fail(job['id'], "w1", "HTTP Error 404")
+        assert remote.drained()
+        assert remote.jobs()[0]['error'] == "HTTP Error 404"
+    finally:
+        server.shutdown()
+
+
+def test_broker_reports_a_locked_database_as_busy(tmp_path, monkeypatch):
+    queue = SQLiteWorkQueue(tmp_path / "work.sqlite")
+
+    def claim(worker):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(queue, 'claim', claim)
+    server = WorkQueueServer(('127.0.0.1', 0), queue)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        remote = RemoteWorkQueue(f"http://127.0.0.1:{server.server_address[1]}")
+        with pytest.raises(QueueBusyError):
+            remote.claim("w1")
+    finally:
+        server.shutdown()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Memoized discovery of external tools (yt-dlp, ffmpeg) and optional modules
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "media-downloader"
+CACHE_PATH = CACHE_DIR / "tools.json"
+
+_resolved = {}
+_lock = threading.Lock()
+
+
+def _environment_key():
+    """Hash of the lookup inputs; a changed PATH or working dir invalidates the cache"""
+    raw = f"{os.environ.get('PATH', '')}\0{os.getcwd()}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('environment') != _environment_key():
+        return {}
+    return data.get('tools', {})
+
+
+def _save_cache(tools):
+    try:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = CACHE_PATH.with_name(CACHE_PATH.name + f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'environment': _environment_key(), 'tools': tools}, f, indent=2)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError:
+        # The cache is an optimization only
+        pass
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _lookup(name, local_paths):
+    found = shutil.which(name)
+    if found:
+        return found
+    for local in local_paths:
+        if Path(local).exists():
+            return str(local)
+    return None
+
+
+def resolve_tool(name, local_paths=()):
+    """Return the path of an executable, or None if it is not installed
+
+    Results are memoized for the process and persisted to a cache file that
+    is trusted only while the recorded binary still exists with the same mtime.
+    """
+    with _lock:
+        if name in _resolved:
+            return _resolved[name]
+
+        cache = _load_cache()
+        entry = cache.get(name)
+        if entry and entry.get('path') and _mtime(entry['path']) == entry.get('mtime'):
+            path = entry['path']
+        else:
+            path = _lookup(name, local_paths)
+            if path:
+                cache[name] = {'path': path, 'mtime': _mtime(path)}
+            else:
+                cache.pop(name, None)
+            _save_cache(cache)
+
+        _resolved[name] = path
+        return path
+
+
+def forget_tool(name):
+    """Drop a memoized result, e.g. after installing the tool"""
+    with _lock:
+        _resolved.pop(name, None)
+
+
+def has_module(name):
+    """Check whether a Python module is importable without importing it"""
+    key = f"module:{name}"
+    with _lock:
+        if key not in _resolved:
+            _resolved[key] = importlib.util.find_spec(name) is not None
+        return _resolved[key]
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Per-URL phase spans (JSON or Chrome trace export) and an all-threads cProfile wrapper for --profile
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+class Span:
+    """One timed phase; start and duration are seconds since the tracer started"""
+
+    __slots__ = ('name', 'url', 'thread', 'start', 'duration', 'attrs')
+
+    def __init__(self, name, url, thread, start, attrs):
+        self.name = name
+        self.url = url
+        self.thread = thread
+        self.start = start
+        self.duration = None
+        self.attrs = attrs
+
+    def to_dict(self):
+        data = {'name': self.name, 'url': self.url, 'thread': self.thread,
+                'start': round(self.start, 6), 'duration': round(self.duration or 0.0, 6)}
+        if self.attrs:
+            data['attrs'] = self.attrs
+        return data
+
+
+class _NoSpan:
+    """What span() returns while tracing is off: a context manager that does nothing"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class _ActiveSpan:
+    def __init__(self, tracer, name, url, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.url = url
+        self.attrs = attrs
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.tracer.begin(self.name, self.url, **self.attrs)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.span.attrs['error'] = exc_type.__name__
+        self.tracer.end(self.span)
+        return False
+
+
+class Tracer:
+    """Collects spans from every thread while enabled; disabled, span() costs one attribute check
+
+    Spans started inside url() on the same thread are attributed to that URL,
+    so helpers deep in a download need not know which URL they serve. Work
+    handed to other threads passes the URL on explicitly.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def current_url(self):
+        return getattr(self._local, 'url', None)
+
+    def begin(self, name, url=None, **attrs):
+        """Start a span and return it; pass it to end() when the phase is over"""
+        span = Span(name, url or self.current_url(), threading.current_thread().name,
+                    time.perf_counter() - self._origin, attrs)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def end(self, span):
+        span.duration = time.perf_counter() - self._origin - span.start
+
+    def span(self, name, url=None, **attrs):
+        """Context manager timing a phase"""
+        if not self.enabled:
+            return NO_SPAN
+        return _ActiveSpan(self, name, url, attrs)
+
+    def record(self, name, start, url=None, **attrs):
+        """Add a finished span for a phase that began at time.perf_counter() value start"""
+        if not self.enabled:
+            return
+        span = self.begin(name, url, **attrs)
+        span.start = start - self._origin
+        self.end(span)
+
+    def url(self, url):
+        """Context manager attributing the spans of this thread to url, itself timed as "download" """
+        if not self.enabled:
+            return NO_SPAN
+        return _UrlScope(self, url)
+
+    def wrap(self, func):
+        """func, bound to the current thread's URL, for running on another thread"""
+        url = self.current_url()
+        if not self.enabled or url is None:
+            return func
+
+        def bound(*args, **kwargs):
+            previous = self.current_url()
+            self._local.url = url
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.url = previous
+        return bound
+
+    def timed_iter(self, iterable, name, **attrs):
+        """Iterate, timing each step as a span (e.g. pages fetched lazily by an API iterator)"""
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(iter(iterable), name, attrs)
+
+    def _timed_iter(self, iterator, name, attrs):
+        while True:
+            span = self.begin(name, **attrs)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.end(span)
+                return
+            self.end(span)
+            yield item
+
+    def finished_spans(self):
+        with self._lock:
+            return [span for span in self.spans if span.duration is not None]
+
+    def summary(self):
+        """{url: {phase: (count, total seconds)}} over finished spans; phases outside a URL go under None"""
+        totals = {}
+        for span in self.finished_spans():
+            phases = totals.setdefault(span.url, {})
+            count, total = phases.get(span.name, (0, 0.0))
+            phases[span.name] = (count + 1, total + span.duration)
+        return totals
+
+    def write_json(self, path):
+        data = {
+            'spans': [span.to_dict() for span in self.finished_spans()],
+            'summary': {
+                url or '': {phase: {'count': count, 'seconds': round(total, 6)}
+                            for phase, (count, total) in phases.items()}
+                for url, phases in self.summary().items()
+            },
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+
+    def write_chrome_trace(self, path):
+        """Trace Event Format, viewable in chrome://tracing or ui.perfetto.dev; one track per thread"""
+        pid = os.getpid()
+        thread_ids = {}
+        events = []
+        for span in self.finished_spans():
+            tid = thread_ids.setdefault(span.thread, len(thread_ids) + 1)
+            args = dict(span.attrs)
+            if span.url:
+                args['url'] = span.url
+            events.append({'name': span.name, 'cat': 'phase', 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': round(span.start * 1e6, 1), 'dur': round(span.duration * 1e6, 1), 'args': args})
+        for name, tid in thread_ids.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def print_summary(self, out=None):
+        """Per-URL table of time spent in each phase"""
+        out = out or sys.stdout
+        print("\nPhase breakdown", file=out)
+        print("=" * 50, file=out)
+        for url, phases in self.summary().items():
+            print(url or "(startup and shared)", file=out)
+            for phase, (count, total) in sorted(phases.items(), key=lambda item: -item[1][1]):
+                print(f"  {phase:<28} {count:>5}x {total:>9.3f}s", file=out)
+
+
+class _UrlScope:
+    def __init__(self, tracer, url):
+        self.tracer = tracer
+        self.url = url
+        self.span = None
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = self.tracer.current_url()
+        self.tracer._local.url = self.url
+        self.span = self.tracer.begin("download", self.url)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.span.attrs['error'] = exc_type.__name__
+        self.tracer.end(self.span)
+        self.tracer._local.url = self.previous
+        return False
+
+
+class YtDlpPhases:
+    """yt-dlp progress hook that splits a run into extract, transfer and post-processing spans
+
+    Extraction lasts until the first download status; each file's transfer
+    lasts from its first to its final status; each yt-dlp post-processor
+    (e.g. ExtractAudio, Merger) gets its own span.
+    """
+
+    def __init__(self, tracer, url):
+        self.tracer = tracer
+        self.url = url
+        self._extract = tracer.begin("extract", url)
+        self._open = {}
+
+    def __call__(self, status, postprocess=False):
+        if self._extract is not None:
+            self.tracer.end(self._extract)
+            self._extract = None
+        if postprocess:
+            key = f"yt-dlp {status.get('postprocessor') or 'postprocess'}"
+            if key not in self._open:
+                self._open[key] = self.tracer.begin(key, self.url)
+        else:
+            key = status.get('filename') or ''
+            if key not in self._open:
+                self._open[key] = self.tracer.begin("transfer", self.url, file=os.path.basename(key))
+        if status.get('status') in ('finished', 'error'):
+            self.tracer.end(self._open.pop(key))
+
+    def close(self):
+        """End whatever the run left open (a failed or interrupted yt-dlp)"""
+        if self._extract is not None:
+            self.tracer.end(self._extract)
+            self._extract = None
+        for span in self._open.values():
+            self.tracer.end(span)
+        self._open = {}
+
+
+class ThreadProfiler:
+    """cProfile over the main thread and every thread started while it runs, merged into one report"""
+
+    def __init__(self):
+        self._main = cProfile.Profile()
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the main profiler
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def start(self):
+        threading.setprofile(self._start_thread)
+        self._main.enable()
+
+    def stop(self):
+        """Stop profiling and return the merged pstats.Stats"""
+        self._main.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(self._main)
+        with self._lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            try:
+                stats.add(profile)
+            except (TypeError, ValueError):
+                # A thread that never returned to Python after profiling started
+                pass
+        return stats
+
+    @staticmethod
+    def report(stats, limit=25):
+        """The top functions by cumulative time, as text"""
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+# Process-wide tracer; enabled by --trace or --profile
+TRACER = Tracer()
+
+
+def span(name, url=None, **attrs):
+    """Time a phase with the process-wide tracer (a no-op unless tracing is enabled)"""
+    return TRACER.span(name, url, **attrs)
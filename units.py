@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+Human-readable byte counts, shared by the batch report and disk-space messages
+"""
+
+
+def format_bytes(size):
+    """Format a byte count for display"""
+    if size < 1024:
+        return f"{size} B"
+    for unit in ['KB', 'MB', 'GB', 'TB']:
+        size /= 1024.0
+        if size < 1024 or unit == 'TB':
+            return f"{size:.1f} {unit}"
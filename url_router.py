@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Single-pass URL classification: platform, kind and media id/username
+"""
+
+import re
+from collections import namedtuple
+
+
+# platform: 'youtube', 'instagram', ... or 'generic'
+# kind:     'video', 'short', 'playlist', 'channel', 'post', 'reel', 'tv', 'story',
+#           'profile', 'page' or None when the platform is known but the path is not
+Route = namedtuple('Route', ['platform', 'kind', 'id', 'username'])
+
+GENERIC = Route('generic', None, None, None)
+
+# Scheme, host and path/query in one match; the scheme is optional like in the old patterns
+URL_PATTERN = re.compile(r'^(?:[A-Za-z][A-Za-z0-9+.-]*:)?(?://)?(?P<host>[^/?#:]*)(?::\d*)?(?P<path>[^?#]*)(?:\?(?P<query>[^#]*))?')
+
+YOUTUBE_ID = r'[A-Za-z0-9_-]{11}'
+YOUTUBE_PATH_PATTERN = re.compile(
+    r'^/(?:'
+    r'(?P<watch>watch)/?$'
+    r'|(?P<playlist>playlist)/?$'
+    r'|shorts/(?P<short_id>' + YOUTUBE_ID + r')'
+    r'|(?:embed|live|v)/(?P<video_id>' + YOUTUBE_ID + r')'
+    r'|@(?P<handle>[^/]+)'
+    r'|(?:channel|c|user)/(?P<channel>[^/]+)'
+    r')'
+)
+YOUTU_BE_PATH_PATTERN = re.compile(r'^/(?P<video_id>' + YOUTUBE_ID + r')/?$')
+# Query parameters are matched directly; parse_qs would dominate the cost of a watch URL
+VIDEO_PARAM_PATTERN = re.compile(r'(?:^|&)v=(' + YOUTUBE_ID + r')(?:&|$)')
+LIST_PARAM_PATTERN = re.compile(r'(?:^|&)list=([^&]+)')
+
+INSTAGRAM_PATH_PATTERN = re.compile(
+    r'^/(?:'
+    r'(?:(?P<owner>[^/]+)/)?(?P<kind>p|reel|reels|tv)/(?P<shortcode>[A-Za-z0-9_-]+)'
+    r'|stories/(?P<story_user>[^/]+)(?:/(?P<story_id>\d+))?'
+    r'|(?P<username>[^/]+)/?$'
+    r')'
+)
+INSTAGRAM_KINDS = {'p': 'post', 'reel': 'reel', 'reels': 'reel', 'tv': 'tv'}
+
+# Top-level Instagram paths that look like usernames but are not profiles
+INSTAGRAM_SPECIAL_PAGES = frozenset(['p', 'reel', 'reels', 'tv', 'stories', 'explore', 'accounts',
+                                     'about', 'legal', 'privacy'])
+
+
+def route_youtube(host, path, query):
+    """Classify a youtube.com / youtu.be path"""
+    if host == 'youtu.be':
+        match = YOUTU_BE_PATH_PATTERN.match(path)
+        if match:
+            return Route('youtube', 'video', match.group('video_id'), None)
+        return Route('youtube', None, None, None)
+
+    match = YOUTUBE_PATH_PATTERN.match(path)
+    if not match:
+        return Route('youtube', None, None, None)
+    if match.group('watch') or match.group('playlist'):
+        # Watch URLs with a list= parameter expand to a whole playlist
+        playlist = LIST_PARAM_PATTERN.search(query)
+        if playlist:
+            return Route('youtube', 'playlist', playlist.group(1), None)
+        video = VIDEO_PARAM_PATTERN.search(query) if match.group('watch') else None
+        if video:
+            return Route('youtube', 'video', video.group(1), None)
+        return Route('youtube', None, None, None)
+    if match.group('short_id'):
+        return Route('youtube', 'short', match.group('short_id'), None)
+    if match.group('video_id'):
+        return Route('youtube', 'video', match.group('video_id'), None)
+    return Route('youtube', 'channel', None, match.group('handle') or match.group('channel'))
+
+
+def route_instagram(host, path, query):
+    """Classify an instagram.com path; unknown paths are left to the generic downloader"""
+    match = INSTAGRAM_PATH_PATTERN.match(path)
+    if not match:
+        return GENERIC
+    if match.group('shortcode'):
+        return Route('instagram', INSTAGRAM_KINDS[match.group('kind')], match.group('shortcode'),
+                     match.group('owner'))
+    if match.group('story_user'):
+        return Route('instagram', 'story', match.group('story_id'), match.group('story_user'))
+    username = match.group('username')
+    if username in INSTAGRAM_SPECIAL_PAGES:
+        return Route('instagram', 'page', None, None)
+    return Route('instagram', 'profile', None, username)
+
+
+class URLRouter:
+    """Map URLs to a Route with one host lookup and one precompiled path match
+
+    Handlers are registered per host (without "www." / "m.") and receive
+    (host, path, query); anything unhandled routes to the generic platform.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+
+    def register(self, hosts, handler):
+        """Route URLs on the given hosts to handler(host, path, query)"""
+        for host in hosts:
+            self._handlers[host.lower()] = handler
+
+    def route(self, url):
+        """Classify a URL"""
+        match = URL_PATTERN.match(url)
+        host = match.group('host').lower()
+        handler = self._handlers.get(host)
+        if handler is None and host.startswith(('www.', 'm.')):
+            host = host.split('.', 1)[1]
+            handler = self._handlers.get(host)
+        if handler is None:
+            return GENERIC
+        return handler(host, match.group('path'), match.group('query') or '')
+
+
+default_router = URLRouter()
+default_router.register(['youtube.com', 'music.youtube.com', 'youtu.be'], route_youtube)
+default_router.register(['instagram.com'], route_instagram)
+
+
+def route_url(url):
+    """Classify a URL with the default router"""
+    return default_router.route(url)
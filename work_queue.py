@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Shared URL queue for coordinator/worker mode: a SQLite backend and an HTTP broker for remote workers
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from job_queue import DEFAULT_LEASE, DEFAULT_MAX_ATTEMPTS, DONE, FAILED, IN_FLIGHT, PENDING
+from url_router import route_url
+
+
+# Queue database the coordinator keeps in the output directory
+WORK_DB_NAME = ".work.sqlite"
+
+DEFAULT_BROKER_PORT = 8642
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    platform TEXT,
+    partition_key TEXT,
+    options TEXT,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS work_by_state ON work (state, id);
+CREATE TABLE IF NOT EXISTS partitions (
+    partition_key TEXT PRIMARY KEY,
+    worker TEXT NOT NULL,
+    lease_expires REAL NOT NULL
+);
+"""
+
+
+def partition_for(url):
+    """Affinity key for a URL: the account or channel it belongs to, or None if any worker may take it
+
+    Every URL of one Instagram profile or YouTube channel goes to the same
+    worker, so that worker's session (and IP) is the only one that account sees.
+    """
+    route = route_url(url)
+    if route.username:
+        return f"{route.platform}:{route.username.lower()}"
+    return None
+
+
+class WorkQueue:
+    """Interface of a work queue backend; see SQLiteWorkQueue for the semantics"""
+
+    def enqueue(self, urls, platform=None, options=None):
+        raise NotImplementedError
+
+    def claim(self, worker):
+        raise NotImplementedError
+
+    def complete(self, job_id, worker, result=None):
+        raise NotImplementedError
+
+    def fail(self, job_id, worker, error=None, result=None):
+        raise NotImplementedError
+
+    def heartbeat(self, worker):
+        raise NotImplementedError
+
+    def release(self, worker):
+        raise NotImplementedError
+
+    def counts(self):
+        raise NotImplementedError
+
+    def jobs(self):
+        raise NotImplementedError
+
+    def drained(self):
+        """True once no job is pending or in flight"""
+        counts = self.counts()
+        return not counts.get(PENDING) and not counts.get(IN_FLIGHT)
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue in a SQLite file, for the coordinator or workers on the same machine
+
+    A worker that claims a job also takes a lease on the job's partition.
+    While the lease holds, other workers skip that partition's jobs. Leases
+    are renewed by heartbeat(). If a worker stops sending them, its
+    in-flight jobs go back to pending and its partitions are freed.
+    """
+
+    def __init__(self, path, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = str(path)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def enqueue(self, urls, platform=None, options=None):
+        """Add URLs as pending jobs; URLs already queued (or done) are kept as they are. Returns the number added"""
+        now = time.time()
+        rows = [(url, platform or route_url(url).platform, partition_for(url),
+                 json.dumps(options or {}), PENDING, now) for url in urls]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO work (url, platform, partition_key, options, state, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            return self._db.total_changes - before
+
+    def claim(self, worker):
+        """Lease the next job this worker may run; returns a job dict or None
+
+        Jobs in partitions the worker already holds come first, then jobs
+        without a partition or in partitions nobody holds.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire(now)
+                row = self._db.execute(
+                    "SELECT w.id, w.url, w.platform, w.partition_key, w.options FROM work w "
+                    "LEFT JOIN partitions p ON p.partition_key = w.partition_key "
+                    "WHERE w.state = ? AND w.attempts < ? AND (p.worker IS NULL OR p.worker = ?) "
+                    "ORDER BY p.worker IS NULL, w.id LIMIT 1",
+                    (PENDING, self.max_attempts, worker)
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                job_id, url, platform, partition_key, options = row
+                self._db.execute(
+                    "UPDATE work SET state = ?, attempts = attempts + 1, worker = ?, lease_expires = ?, updated = ? "
+                    "WHERE id = ?", (IN_FLIGHT, worker, now + self.lease, now, job_id)
+                )
+                if partition_key is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO partitions (partition_key, worker, lease_expires) VALUES (?, ?, ?)",
+                        (partition_key, worker, now + self.lease)
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return {'id': job_id, 'url': url, 'platform': platform, 'partition': partition_key,
+                'options': json.loads(options) if options else {}}
+
+    def _expire(self, now):
+        """Return jobs of workers whose lease ran out to pending (or failed, when out of attempts)"""
+        self._db.execute(
+            "UPDATE work SET state = CASE WHEN attempts < ? THEN ? ELSE ? END, worker = NULL, "
+            "lease_expires = NULL, error = COALESCE(error, 'worker lease expired'), updated = ? "
+            "WHERE state = ? AND lease_expires < ?", (self.max_attempts, PENDING, FAILED, now, IN_FLIGHT, now)
+        )
+        self._db.execute("DELETE FROM partitions WHERE lease_expires < ?", (now,))
+
+    def _finish(self, job_id, worker, state, result, error):
+        # Ignored when the lease already expired and the job went to another worker
+        self._execute(
+            "UPDATE work SET state = ?, worker = NULL, lease_expires = NULL, result = ?, error = ?, updated = ? "
+            "WHERE id = ? AND worker = ? AND state = ?",
+            (state, json.dumps(result) if result is not None else None, error, time.time(),
+             job_id, worker, IN_FLIGHT)
+        )
+
+    def complete(self, job_id, worker, result=None):
+        self._finish(job_id, worker, DONE, result, None)
+
+    def fail(self, job_id, worker, error=None, result=None):
+        """Record a failed job; downloads retry on their own, so only jobs of vanished workers run again"""
+        self._finish(job_id, worker, FAILED, result, str(error) if error is not None else None)
+
+    def heartbeat(self, worker):
+        """Extend the leases on a worker's in-flight jobs and partitions"""
+        expires = time.time() + self.lease
+        with self._lock:
+            self._db.execute("UPDATE work SET lease_expires = ? WHERE worker = ? AND state = ?",
+                             (expires, worker, IN_FLIGHT))
+            self._db.execute("UPDATE partitions SET lease_expires = ? WHERE worker = ?", (expires, worker))
+
+    def release(self, worker):
+        """Give up a worker's partitions (and any jobs it still holds) when it shuts down"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE work SET state = ?, worker = NULL, lease_expires = NULL, updated = ? "
+                "WHERE worker = ? AND state = ?", (PENDING, time.time(), worker, IN_FLIGHT)
+            )
+            self._db.execute("DELETE FROM partitions WHERE worker = ?", (worker,))
+
+    def counts(self):
+        """Number of jobs per state"""
+        return dict(self._execute("SELECT state, COUNT(*) FROM work GROUP BY state").fetchall())
+
+    def jobs(self):
+        """Every job as a dict, in queue order"""
+        rows = self._execute(
+            "SELECT id, url, platform, partition_key, state, attempts, worker, result, error FROM work ORDER BY id"
+        ).fetchall()
+        return [
+            {'id': row[0], 'url': row[1], 'platform': row[2], 'partition': row[3], 'state': row[4],
+             'attempts': row[5], 'worker': row[6], 'result': json.loads(row[7]) if row[7] else None,
+             'error': row[8]}
+            for row in rows
+        ]
+
+
+class QueueBusyError(OSError):
+    """The coordinator could not serve a request right now (e.g. its database was locked)"""
+
+
+class RemoteWorkQueue(WorkQueue):
+    """Client for a coordinator's WorkQueueServer, for workers on other machines"""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _call(self, method, **params):
+        request = urllib.request.Request(
+            f"{self.url}/{method}", data=json.dumps(params).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                raise QueueBusyError(f"{self.url} is busy: {e.reason}")
+            raise
+
+    def enqueue(self, urls, platform=None, options=None):
+        return self._call('enqueue', urls=list(urls), platform=platform, options=options)
+
+    def claim(self, worker):
+        return self._call('claim', worker=worker)
+
+    def complete(self, job_id, worker, result=None):
+        self._call('complete', job_id=job_id, worker=worker, result=result)
+
+    def fail(self, job_id, worker, error=None, result=None):
+        self._call('fail', job_id=job_id, worker=worker, error=error, result=result)
+
+    def heartbeat(self, worker):
+        self._call('heartbeat', worker=worker)
+
+    def release(self, worker):
+        self._call('release', worker=worker)
+
+    def counts(self):
+        return self._call('counts')
+
+    def jobs(self):
+        return self._call('jobs')
+
+
+class WorkQueueServer(ThreadingHTTPServer):
+    """HTTP broker exposing a SQLiteWorkQueue to remote workers (POST /<method> with JSON arguments)
+
+    There is no authentication: bind it to a private interface or network.
+    """
+
+    daemon_threads = True
+    METHODS = ('enqueue', 'claim', 'complete', 'fail', 'heartbeat', 'release', 'counts', 'jobs')
+
+    def __init__(self, address, queue):
+        self.queue = queue
+        super().__init__(address, WorkQueueRequestHandler)
+
+
+class WorkQueueRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        method = self.path.strip('/')
+        if method not in self.server.METHODS:
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            params = json.loads(self.rfile.read(length) or b'{}')
+            body = json.dumps(getattr(self.server.queue, method)(**params)).encode('utf-8')
+        except (TypeError, ValueError) as e:
+            self.send_error(400, str(e))
+            return
+        except sqlite3.Error as e:
+            # e.g. the database is locked under load; the worker retries
+            self.send_error(503, str(e))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def open_work_queue(spec):
+    """Work queue for a coordinator URL (http://host:port) or a SQLite queue file"""
+    if spec.startswith(('http://', 'https://')):
+        return RemoteWorkQueue(spec)
+    return SQLiteWorkQueue(spec)
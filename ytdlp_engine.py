@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+In-process yt-dlp engine that reuses YoutubeDL instances across URLs
+"""
+
+import sys
+import threading
+import zipfile
+from pathlib import Path
+
+
+# Options that only affect a single run; they are stripped from the reuse key
+# and applied to the cached YoutubeDL instance before each download
+PER_RUN_OPTIONS = {
+    '--print-to-file': ('print_to_file', 2),
+    '-O': ('forceprint', 1),
+    '--print': ('forceprint', 1),
+}
+
+
+class StderrLogger:
+    """yt-dlp logger that keeps all screen output off stdout"""
+
+    def debug(self, message):
+        sys.stderr.write(message + "\n")
+
+    info = warning = error = debug
+
+
+def load_yt_dlp(yt_dlp_path=None):
+    """Import the yt_dlp module, falling back to the bundled zipapp"""
+    try:
+        import yt_dlp
+        return yt_dlp
+    except ImportError:
+        pass
+
+    # The standalone yt-dlp release is a zipapp, which zipimport can load directly
+    if yt_dlp_path and Path(yt_dlp_path).is_file() and zipfile.is_zipfile(yt_dlp_path):
+        sys.path.insert(0, str(Path(yt_dlp_path).resolve()))
+        try:
+            import yt_dlp
+            return yt_dlp
+        except ImportError:
+            sys.path.pop(0)
+    return None
+
+
+class YtDlpEngine:
+    """Run yt-dlp command lines in-process
+
+    Instances are pooled by their option set, so URLs downloaded with the same
+    options share one YoutubeDL (HTTP session, extractor instances, caches).
+    Each pooled instance serves one download at a time; concurrent callers get
+    their own instance from the pool.
+    """
+
+    def __init__(self, yt_dlp_module):
+        self.yt_dlp = yt_dlp_module
+        self._idle = {}
+        self._hooks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _reuse_key(options):
+        """Option list with per-run options removed"""
+        key = []
+        i = 0
+        while i < len(options):
+            arity = PER_RUN_OPTIONS.get(options[i], (None, 0))[1]
+            if arity:
+                i += arity + 1
+                continue
+            key.append(options[i])
+            i += 1
+        return tuple(key)
+
+    def _acquire(self, key, ydl_opts):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        ydl = self.yt_dlp.YoutubeDL(ydl_opts)
+        # Hooks stay installed for the instance's lifetime and forward to
+        # whichever callback the current run registered
+        ydl.add_progress_hook(lambda status: self._dispatch(ydl, status, False))
+        ydl.add_postprocessor_hook(lambda status: self._dispatch(ydl, status, True))
+        return ydl
+
+    def _dispatch(self, ydl, status, postprocess):
+        hook = self._hooks.get(id(ydl))
+        if hook is not None:
+            hook(status, postprocess)
+
+    def _release(self, key, ydl):
+        with self._lock:
+            self._idle.setdefault(key, []).append(ydl)
+
+    def run(self, args, progress_hook=None, log_to_stderr=False, error_tail=None):
+        """Run a yt-dlp argument list (without the executable) and return its exit code
+
+        progress_hook, if given, is called as hook(status, postprocess) for
+        every download and post-processor status update of this run. With
+        log_to_stderr, yt-dlp's screen output and progress bar are kept off
+        stdout. The message of a failed run is appended to error_tail, if given.
+        """
+        parsed = self.yt_dlp.parse_options(args)
+        opts, urls, ydl_opts = parsed.options, parsed.urls, parsed.ydl_opts
+        options = [a for a in args if a not in urls]
+
+        key = self._reuse_key(options)
+        ydl = self._acquire(key, ydl_opts)
+        for param, _ in PER_RUN_OPTIONS.values():
+            ydl.params[param] = ydl_opts.get(param)
+        ydl.params['noprogress'] = ydl_opts.get('noprogress')
+        ydl.params['logger'] = ydl_opts.get('logger')
+        if log_to_stderr:
+            ydl.params['noprogress'] = True
+            ydl.params['logger'] = StderrLogger()
+        ydl._download_retcode = 0
+        self._hooks[id(ydl)] = progress_hook
+
+        try:
+            if opts.load_info_filename is not None:
+                return ydl.download_with_info_file(opts.load_info_filename)
+            return ydl.download(urls)
+        except self.yt_dlp.utils.DownloadCancelled:
+            ydl.to_screen('Aborting remaining downloads')
+            return 101
+        except self.yt_dlp.utils.DownloadError as e:
+            if error_tail is not None:
+                error_tail.append(str(e))
+            return 1
+        finally:
+            self._hooks.pop(id(ydl), None)
+            self._release(key, ydl)
+
+    def close(self):
+        """Close all pooled YoutubeDL instances"""
+        with self._lock:
+            for instances in self._idle.values():
+                for ydl in instances:
+                    ydl.close()
+            self._idle.clear()